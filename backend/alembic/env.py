@@ -0,0 +1,47 @@
+"""
+Alembic environment
+Uses the application's engine and models, so migrations run against the
+same DATABASE_URL (with SSL handling) as the API.
+"""
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.core.config import settings
+from app.core.database import Base, engine
+import app.models.models  # noqa: F401 - register tables on Base.metadata
+import app.models.notification  # noqa: F401
+import app.models.chat_session  # noqa: F401
+import app.models.stats  # noqa: F401
+import app.models.refresh_token  # noqa: F401
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+    """Emit SQL to stdout (`alembic upgrade head --sql`)"""
+    context.configure(
+        url=settings.DATABASE_URL_WITH_SSL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,89 @@
+"""Notifications, chat session and stats rollup tables
+
+The tables migrations/001-004_*.sql used to add on top of database/init.sql,
+so `alembic upgrade head` alone brings an init.sql database up to the
+models. Each table is skipped when it already exists (databases that ran
+the SQL files, or Base.metadata.create_all deployments); the query indexes
+follow in 0001_query_indexes.
+
+Revision ID: 0000_app_tables
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0000_app_tables"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+TABLES = ["notifications", "chat_sessions", "stats_daily_disease", "stats_rollup_state", "stats_daily_segment"]
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "notifications" not in existing:
+        op.create_table(
+            "notifications",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+            sa.Column("title", sa.String, nullable=False),
+            sa.Column("message", sa.Text, nullable=False),
+            sa.Column("type", sa.String, nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("is_read", sa.Boolean),
+            sa.CheckConstraint(
+                "type IN ('personalized', 'announcement', 'direct')", name="check_notification_type"
+            ),
+        )
+        op.create_index("ix_notifications_id", "notifications", ["id"])
+
+    if "chat_sessions" not in existing:
+        op.create_table(
+            "chat_sessions",
+            sa.Column("id", sa.String(32), primary_key=True),
+            sa.Column("messages", sa.JSON, nullable=False),
+            sa.Column("turn", sa.Integer, nullable=False),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("updated_at", sa.DateTime),
+            sa.Column("expires_at", sa.DateTime, nullable=False),
+        )
+        op.create_index("ix_chat_sessions_expires_at", "chat_sessions", ["expires_at"])
+
+    if "stats_daily_disease" not in existing:
+        op.create_table(
+            "stats_daily_disease",
+            sa.Column("day", sa.Date, primary_key=True),
+            sa.Column("disease", sa.String, primary_key=True),
+            sa.Column("predictions", sa.Integer, nullable=False),
+            sa.Column("confidence_sum", sa.Float, nullable=False),
+            sa.Column("confidence_count", sa.Integer, nullable=False),
+            sa.Column("feedback", sa.Integer, nullable=False),
+            sa.Column("accurate_feedback", sa.Integer, nullable=False),
+        )
+
+    if "stats_rollup_state" not in existing:
+        op.create_table(
+            "stats_rollup_state",
+            sa.Column("name", sa.String(32), primary_key=True),
+            sa.Column("last_prediction_id", sa.Integer, nullable=False),
+            sa.Column("last_feedback_id", sa.Integer, nullable=False),
+            sa.Column("updated_at", sa.DateTime),
+        )
+
+    if "stats_daily_segment" not in existing:
+        op.create_table(
+            "stats_daily_segment",
+            sa.Column("day", sa.Date, primary_key=True),
+            sa.Column("disease", sa.String, primary_key=True),
+            sa.Column("age_band", sa.String(16), primary_key=True),
+            sa.Column("gender", sa.String(16), primary_key=True),
+            sa.Column("predictions", sa.Integer, nullable=False),
+        )
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_table(table, if_exists=True)
@@ -0,0 +1,66 @@
+"""Composite and partial indexes for the hot query paths
+
+Adds the indexes declared on the models to databases created by
+database/init.sql, migrations/*.sql or an older Base.metadata.create_all,
+and drops the single-column indexes they make redundant. Every step is
+idempotent, so it is safe on databases that already have some of them.
+
+On PostgreSQL the indexes are built CONCURRENTLY (outside a transaction) so
+predictions/notifications stay writable during the upgrade.
+
+Revision ID: 0001_query_indexes
+Revises: 0000_app_tables
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001_query_indexes"
+down_revision = "0000_app_tables"
+branch_labels = None
+depends_on = None
+
+# Superseded by the composite indexes below (same leading column)
+REDUNDANT = [
+    ("idx_predictions_user_id", "predictions", ["user_id"]),
+    ("idx_feedback_prediction_id", "feedback", ["prediction_id"]),
+    ("idx_notifications_user_id", "notifications", ["user_id"]),
+    ("idx_notifications_is_read", "notifications", ["is_read"]),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_predictions_user_id_timestamp", "predictions",
+            ["user_id", sa.text("timestamp DESC")],
+            if_not_exists=True, postgresql_concurrently=True
+        )
+        op.create_index(
+            "ix_feedback_prediction_id", "feedback", ["prediction_id"],
+            if_not_exists=True, postgresql_concurrently=True
+        )
+        op.create_index(
+            "ix_notifications_user_id_is_read_created_at", "notifications",
+            ["user_id", "is_read", sa.text("created_at DESC")],
+            if_not_exists=True, postgresql_concurrently=True
+        )
+        op.create_index(
+            "ix_notifications_unread", "notifications",
+            ["user_id", sa.text("created_at DESC")],
+            postgresql_where=sa.text("is_read = false"),
+            sqlite_where=sa.text("is_read = 0"),
+            if_not_exists=True, postgresql_concurrently=True
+        )
+        for name, table, columns in REDUNDANT:
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in REDUNDANT:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+        op.drop_index("ix_notifications_unread", table_name="notifications", if_exists=True)
+        op.drop_index("ix_notifications_user_id_is_read_created_at", table_name="notifications", if_exists=True)
+        op.drop_index("ix_feedback_prediction_id", table_name="feedback", if_exists=True)
+        op.drop_index("ix_predictions_user_id_timestamp", table_name="predictions", if_exists=True)
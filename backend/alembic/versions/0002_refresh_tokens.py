@@ -0,0 +1,40 @@
+"""Refresh tokens table
+
+Hashed, rotating refresh tokens (app/models/refresh_token.py). Skipped when
+the table already exists (Base.metadata.create_all deployments).
+
+Revision ID: 0002_refresh_tokens
+Revises: 0001_query_indexes
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_refresh_tokens"
+down_revision = "0001_query_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table("refresh_tokens"):
+        return
+    op.create_table(
+        "refresh_tokens",
+        sa.Column("id", sa.String(22), primary_key=True),
+        sa.Column("token_hash", sa.String(64), nullable=False),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("family_id", sa.String(22), nullable=False),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("expires_at", sa.DateTime, nullable=False),
+        sa.Column("revoked_at", sa.DateTime),
+        sa.Column("replaced_by", sa.String(22)),
+    )
+    op.create_index("ix_refresh_tokens_user_id", "refresh_tokens", ["user_id"])
+    op.create_index("ix_refresh_tokens_family_id", "refresh_tokens", ["family_id"])
+    op.create_index("ix_refresh_tokens_expires_at", "refresh_tokens", ["expires_at"])
+    op.create_index("ix_refresh_tokens_revoked_at", "refresh_tokens", ["revoked_at"])
+
+
+def downgrade():
+    op.drop_table("refresh_tokens")
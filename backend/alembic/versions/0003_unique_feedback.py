@@ -0,0 +1,49 @@
+"""Opt-in: one feedback per prediction, enforced by a unique index
+
+DELETES duplicate feedback rows (keeping the earliest per prediction) and
+adds ux_feedback_prediction_id, which turns the API's "Feedback already
+submitted" check into a database guarantee. Since it removes data, it only
+runs when asked for:
+    alembic -x unique_feedback=true upgrade head
+Without the flag this revision is a no-op. To opt in on a database that is
+already past it (every revision is idempotent):
+    alembic stamp 0002_refresh_tokens
+    alembic -x unique_feedback=true upgrade head
+Downgrading drops the unique index; deleted rows are not restored.
+
+Revision ID: 0003_unique_feedback
+Revises: 0002_refresh_tokens
+Create Date: 2026-10-19
+"""
+import logging
+
+from alembic import context, op
+
+revision = "0003_unique_feedback"
+down_revision = "0002_refresh_tokens"
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+
+def upgrade():
+    if context.get_x_argument(as_dictionary=True).get("unique_feedback", "").lower() != "true":
+        logger.info("Skipping the feedback dedupe and unique index (pass -x unique_feedback=true to apply)")
+        return
+    # Later rows can only come from concurrent submits racing the API's check
+    op.execute(
+        "DELETE FROM feedback WHERE EXISTS ("
+        "SELECT 1 FROM feedback AS earlier "
+        "WHERE earlier.prediction_id = feedback.prediction_id AND earlier.id < feedback.id)"
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ux_feedback_prediction_id", "feedback", ["prediction_id"], unique=True,
+            if_not_exists=True, postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ux_feedback_prediction_id", table_name="feedback", if_exists=True)
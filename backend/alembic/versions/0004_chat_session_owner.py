@@ -0,0 +1,31 @@
+"""Chat session owner
+
+chat_sessions.user_id ties a session to the logged-in user who started it
+(NULL for anonymous chats). Skipped when the column already exists.
+
+Revision ID: 0004_chat_session_owner
+Revises: 0003_unique_feedback
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_chat_session_owner"
+down_revision = "0003_unique_feedback"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("chat_sessions")}
+    if "user_id" in columns:
+        return
+    with op.batch_alter_table("chat_sessions") as batch:
+        batch.add_column(sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id", name="fk_chat_sessions_user_id")))
+        batch.create_index("ix_chat_sessions_user_id", ["user_id"])
+
+
+def downgrade():
+    with op.batch_alter_table("chat_sessions") as batch:
+        batch.drop_index("ix_chat_sessions_user_id")
+        batch.drop_column("user_id")
@@ -1,13 +1,26 @@
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from typing import List
+from typing import List, Optional
+from datetime import date
 from app.core.database import get_db
 from app.models.models import User, Disease, Prediction, Feedback
 from app.schemas.schemas import DiseaseResponse, DiseaseCreate, UserResponse
 from app.api.auth import get_current_user
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash, password_hasher
+from app.core.slow_query_log import slow_query_log
+from app.core.profiler import PROFILE_SUFFIX, profile_store
+from app.services.disease_store import disease_store
+from app.services.model_registry import model_registry
+from app.services.ml_service import predictor
+from app.services.shadow_eval import shadow_evaluator, feedback_agreement
+from app.services.online_learning import online_learner
+from app.services.stats_service import StatsService
+from app.services.export_service import TABLES, FORMATS, encode_rows, stream_export, export_filename
+from app.services.catalog_import import CatalogImportError, parse_catalog, import_catalog
+from app.services.refresh_token_service import RefreshTokenService
 import logging
 
 logger = logging.getLogger(__name__)
@@ -78,48 +91,305 @@ def create_disease(
     db.commit()
     db.refresh(new_disease)
     
+    # Keep the predictor's compiled disease info in sync with the table
+    try:
+        disease_store.rebuild(db)
+    except Exception as e:
+        logger.error(f"Failed to rebuild disease store: {str(e)}")
+    
     return new_disease
 
 
-@router.get("/stats")
-def get_statistics(
+@router.post("/catalog/import")
+def import_catalog_file(
+    file: UploadFile = File(...),
+    kind: Optional[str] = Query(None, regex="^(symptoms|diseases)$"),
+    format: Optional[str] = Query(None, regex="^(csv|json)$"),
+    on_conflict: str = Query("update", regex="^(update|skip)$"),
+    dry_run: bool = False,
     db: Session = Depends(get_db),
     admin: User = Depends(verify_admin)
 ):
-    """Get system statistics (admin only)."""
-    total_users = db.query(func.count(User.id)).scalar()
-    total_predictions = db.query(func.count(Prediction.id)).scalar()
-    total_feedback = db.query(func.count(Feedback.id)).scalar()
+    """
+    Bulk upsert symptoms/diseases from a CSV or JSON file (admin only).
+    CSV files need `kind`; `format` defaults to the file extension.
+    Returns inserted/updated/skipped counts and the first row errors.
+    Sync endpoint: the upserts and store rebuild run in the threadpool, not on the event loop.
+    """
+    file_format = format or (file.filename or "").rsplit(".", 1)[-1].lower()
+    try:
+        catalog = parse_catalog(file.file.read(), file_format, kind)
+        return import_catalog(db, catalog, on_conflict=on_conflict, dry_run=dry_run)
+    except CatalogImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/disease-store")
+def get_disease_store_info(admin: User = Depends(verify_admin)):
+    """Get the active compiled disease store version (admin only)."""
+    store = disease_store.current
+    return {
+        "version": store.version,
+        "built_at": store.built_at,
+        "disease_count": len(store),
+        "diseases": {name: store.languages(name) for name in store.names()}
+    }
+
+
+@router.post("/disease-store/rebuild")
+def rebuild_disease_store(
+    db: Session = Depends(get_db),
+    admin: User = Depends(verify_admin)
+):
+    """Recompile the disease store from seed files and the diseases table (admin only)."""
+    previous_version = disease_store.current.version
+    try:
+        store = disease_store.rebuild(db)
+    except Exception as e:
+        logger.error(f"Disease store rebuild failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Disease store rebuild failed: {str(e)}")
     
-    # Most common predicted diseases
-    top_diseases = db.query(
+    return {
+        "message": "Disease store rebuilt",
+        "previous_version": previous_version,
+        "version": store.version,
+        "disease_count": len(store)
+    }
+
+
+@router.get("/models")
+def list_models(admin: User = Depends(verify_admin)):
+    """List available model versions and the active one (admin only)."""
+    return {
+        "versions": model_registry.list_versions(),
+        **model_registry.status(),
+        "prediction_cache": predictor.cache_stats()
+    }
+
+
+@router.post("/models/{version}/load", status_code=status.HTTP_202_ACCEPTED)
+def load_model_version(version: str, admin: User = Depends(verify_admin)):
+    """
+    Load a model version in the background, warm it up and swap it in (admin only).
+    Requests keep using the current model until the new one is ready.
+    """
+    available = {v["version"] for v in model_registry.list_versions()}
+    if version not in available:
+        raise HTTPException(status_code=404, detail=f"Model version {version} not found")
+    
+    if not model_registry.load_in_background(version):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Model {model_registry.status()['loading']} is already loading"
+        )
+    
+    return {"message": f"Loading model {version}", **model_registry.status()}
+
+
+@router.post("/models/rollback")
+def rollback_model(admin: User = Depends(verify_admin)):
+    """Switch back to the previously active model (admin only)."""
+    if model_registry.rollback() is None:
+        raise HTTPException(status_code=400, detail="No previous model version to roll back to")
+    return {"message": "Rolled back", **model_registry.status()}
+
+
+@router.post("/models/deactivate")
+def deactivate_model(admin: User = Depends(verify_admin)):
+    """Stop using trained models and fall back to rule-based predictions (admin only)."""
+    model_registry.deactivate()
+    return {"message": "Using rule-based predictions", **model_registry.status()}
+
+
+@router.get("/models/shadow")
+def get_shadow_report(admin: User = Depends(verify_admin)):
+    """Live agreement/latency of shadow candidates against the primary model (admin only)."""
+    active = model_registry.active
+    return {
+        "primary_version": active.version if active else predictor.rules.version,
+        **shadow_evaluator.snapshot()
+    }
+
+
+@router.get("/models/shadow/feedback")
+def get_shadow_feedback_report(
+    limit: int = 1000,
+    db: Session = Depends(get_db),
+    admin: User = Depends(verify_admin)
+):
+    """
+    Re-score recent predictions that have user feedback with the active model,
+    the rules and every shadow candidate, and compare against the reported diagnosis (admin only).
+    """
+    rows = db.query(
+        Prediction.symptoms,
         Prediction.predicted_disease_name,
-        func.count(Prediction.id).label('count')
-    ).group_by(Prediction.predicted_disease_name).order_by(
-        func.count(Prediction.id).desc()
-    ).limit(10).all()
+        Feedback.actual_diagnosis,
+        Feedback.is_accurate
+    ).join(Feedback, Feedback.prediction_id == Prediction.id).filter(
+        (Feedback.actual_diagnosis.isnot(None)) | (Feedback.is_accurate.is_(True))
+    ).order_by(Feedback.created_at.desc()).limit(min(limit, 10000)).all()
     
-    # Average confidence score
-    avg_confidence = db.query(func.avg(Prediction.confidence_score)).scalar()
+    engines = {predictor.rules.version: predictor.rules}
+    if model_registry.active is not None:
+        engines[model_registry.active.version] = model_registry.active
+    engines.update(shadow_evaluator.candidates())
     
-    # Feedback accuracy rate
-    accurate_feedback = db.query(func.count(Feedback.id)).filter(
-        Feedback.is_accurate == True
-    ).scalar()
+    labelled = (
+        (symptoms, served, actual or served)
+        for symptoms, served, actual, _is_accurate in rows
+    )
+    return feedback_agreement(labelled, engines)
+
+
+@router.get("/models/online")
+def get_online_learning_status(admin: User = Depends(verify_admin)):
+    """State of the incremental feedback learner (admin only)."""
+    return online_learner.status()
+
+
+@router.post("/models/online/update")
+def run_online_learning(
+    activate: bool = False,
+    db: Session = Depends(get_db),
+    admin: User = Depends(verify_admin)
+):
+    """Learn from feedback received since the last run and publish a new version (admin only)."""
+    result = online_learner.run_once(db, activate=activate)
+    if result["status"] == "busy":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="An online learning run is already in progress")
+    return result
+
+
+@router.post("/models/{version}/shadow", status_code=status.HTTP_202_ACCEPTED)
+def add_shadow_candidate(version: str, admin: User = Depends(verify_admin)):
+    """Load a model version as a shadow candidate; it scores live traffic without serving it (admin only)."""
+    if version == predictor.rules.version:
+        shadow_evaluator.add_candidate(predictor.rules)
+        return {"message": "Rules added as shadow candidate"}
     
-    accuracy_rate = (accurate_feedback / total_feedback * 100) if total_feedback > 0 else 0
+    available = {v["version"] for v in model_registry.list_versions()}
+    if version not in available:
+        raise HTTPException(status_code=404, detail=f"Model version {version} not found")
     
-    return {
-        "total_users": total_users,
-        "total_predictions": total_predictions,
-        "total_feedback": total_feedback,
-        "average_confidence": round(avg_confidence or 0, 2),
-        "accuracy_rate": round(accuracy_rate, 2),
-        "top_diseases": [
-            {"disease": disease, "count": count}
-            for disease, count in top_diseases
-        ]
-    }
+    shadow_evaluator.add_candidate_async(version, model_registry.load_engine)
+    return {"message": f"Loading model {version} as shadow candidate"}
+
+
+@router.delete("/models/{version}/shadow")
+def remove_shadow_candidate(version: str, admin: User = Depends(verify_admin)):
+    """Stop shadow-scoring a model version (admin only)."""
+    if not shadow_evaluator.remove_candidate(version):
+        raise HTTPException(status_code=404, detail=f"Model {version} is not a shadow candidate")
+    return {"message": f"Removed shadow candidate {version}"}
+
+
+@router.get("/auth/hashing")
+def get_password_hashing_stats(admin: User = Depends(verify_admin)):
+    """Password hashing pool size, queue depth and timings (admin only)."""
+    return password_hasher.stats()
+
+
+@router.get("/slow-queries")
+def get_slow_queries(
+    sort: str = Query("total", regex="^(total|count|p95|max|recent)$"),
+    limit: int = Query(50, ge=1, le=500),
+    admin: User = Depends(verify_admin)
+):
+    """Slow statements grouped by fingerprint, with p95 and captured EXPLAIN plans (admin only)."""
+    return slow_query_log.report(sort=sort, limit=limit)
+
+
+@router.delete("/slow-queries")
+def reset_slow_queries(admin: User = Depends(verify_admin)):
+    """Clear the slow query log (admin only)."""
+    slow_query_log.reset()
+    return {"message": "Slow query log cleared"}
+
+
+@router.get("/profiles")
+def list_profiles(admin: User = Depends(verify_admin)):
+    """Stored request profiles, newest first (admin only)."""
+    return {"profiles": profile_store.list()}
+
+
+@router.get("/profiles/{profile_id}")
+def download_profile(profile_id: str, admin: User = Depends(verify_admin)):
+    """A stored profile in folded-stack format, for flamegraph.pl, inferno or speedscope (admin only)."""
+    try:
+        content = profile_store.read(profile_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if content is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(content, headers={
+        "Content-Disposition": f'attachment; filename="{profile_id}{PROFILE_SUFFIX}"'
+    })
+
+
+@router.get("/stats")
+def get_statistics(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(get_db),
+    admin: User = Depends(verify_admin)
+):
+    """
+    Get system statistics (admin only).
+    Served from the daily rollups; `start`/`end` (YYYY-MM-DD, inclusive) limit the range.
+    """
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must be on or before end")
+    StatsService.refresh_if_stale(db)
+    return StatsService.summary(db, start=start, end=end)
+
+
+@router.post("/stats/rebuild")
+def rebuild_statistics(
+    db: Session = Depends(get_db),
+    admin: User = Depends(verify_admin)
+):
+    """Recompute the statistics rollups from the predictions and feedback tables (admin only)."""
+    folded = StatsService.rebuild(db)
+    return {"message": "Statistics rebuilt", **folded}
+
+
+@router.get("/analytics/timeseries")
+def get_timeseries(
+    bucket: str = Query("day", regex="^(day|week|month)$"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    group_by: str = Query("disease", regex="^(none|disease|age_band|gender)$"),
+    disease: Optional[List[str]] = Query(None),
+    age_band: Optional[str] = None,
+    gender: Optional[str] = None,
+    format: str = Query("json", regex="^(json|csv|ndjson)$"),
+    db: Session = Depends(get_db),
+    admin: User = Depends(verify_admin)
+):
+    """
+    Prediction counts over time (admin only), from the daily segment rollups.
+    Defaults to the last 90 days; `disease` may be repeated. csv/ndjson are
+    streamed as downloads with one row per (bucket, group).
+    """
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must be on or before end")
+    StatsService.refresh_if_stale(db)
+    result = StatsService.timeseries(
+        db, bucket=bucket, start=start, end=end, group_by=group_by,
+        diseases=disease, age_band=age_band, gender=gender
+    )
+    if format == "json":
+        return result
+
+    rows = StatsService.timeseries_rows(result)
+    body = encode_rows(rows, ["bucket", "group", "predictions"], format)
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    filename = f"timeseries_{bucket}_{result['start']}_{result['end']}.{format}"
+    return StreamingResponse(
+        body, media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 
 @router.get("/users")
@@ -218,6 +488,28 @@ def get_all_feedback(
     return feedback_list
 
 
+@router.get("/export/{table}")
+def export_table(
+    table: str,
+    format: str = Query("csv", regex="^(csv|ndjson)$"),
+    gzip: bool = False,
+    admin: User = Depends(verify_admin)
+):
+    """
+    Stream a full export of predictions, feedback or users (admin only).
+    Rows are read through a server-side cursor, so any table size is safe;
+    `gzip=true` returns a .gz file.
+    """
+    if table not in TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown export table: {table}")
+    filename = export_filename(table, format, gzip)
+    return StreamingResponse(
+        stream_export(table, format, compress=gzip),
+        media_type="application/gzip" if gzip else FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.patch("/users/{user_id}/toggle-admin")
 def toggle_user_admin(
     user_id: int,
@@ -262,6 +554,9 @@ def toggle_user_active(
     
     user.is_active = not user.is_active
     db.commit()
+    if not user.is_active:
+        # End existing sessions instead of waiting for their refresh tokens to expire
+        RefreshTokenService.revoke_user(db, user.id)
     
     return {"message": f"User active status updated", "is_active": user.is_active}
 
@@ -1,15 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
+from typing import Optional
 from app.core.database import get_db
-from app.core.security import verify_password, get_password_hash, create_access_token, decode_access_token
+from app.core.security import create_access_token, decode_access_token, password_hasher, PasswordHasherBusy
 from app.core.config import settings
 from app.models.models import User
-from app.schemas.schemas import UserCreate, UserResponse, Token, UserLogin
+from app.schemas.schemas import UserCreate, UserResponse, Token, UserLogin, RefreshRequest
+from app.services.refresh_token_service import RefreshTokenService, InvalidRefreshToken, revocation_cache
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login", auto_error=False)
 
 
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
@@ -28,6 +35,13 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     if email is None:
         raise credentials_exception
     
+    # Logged-out sessions: answered from memory, the table is only re-read every few seconds
+    family_id = payload.get("fam")
+    if family_id:
+        revocation_cache.sync_if_stale(db)
+        if revocation_cache.is_revoked(family_id):
+            raise credentials_exception
+    
     user = db.query(User).filter(User.email == email).first()
     if user is None:
         raise credentials_exception
@@ -35,6 +49,16 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     return user
 
 
+def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme), db: Session = Depends(get_db)):
+    """Current user for a valid bearer token, None for anonymous (or invalid-token) requests."""
+    if not token:
+        return None
+    try:
+        return get_current_user(token, db)
+    except HTTPException:
+        return None
+
+
 def require_admin(current_user: User = Depends(get_current_user)):
     """Require admin privileges."""
     if not current_user.is_admin:
@@ -45,11 +69,47 @@ def require_admin(current_user: User = Depends(get_current_user)):
     return current_user
 
 
+def _find_user(db: Session, email: str):
+    return db.query(User).filter(User.email == email).first()
+
+
+def _save(db: Session, instance=None):
+    if instance is not None:
+        db.add(instance)
+    db.commit()
+    if instance is not None:
+        db.refresh(instance)
+
+
+def _token_response(user: User, family_id: str, refresh_token: str) -> dict:
+    access_token = create_access_token(
+        data={"sub": user.email, "fam": family_id},
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+
+def _hashing_busy():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+
+# register/login are async so bcrypt runs on the dedicated password pool;
+# only the short DB calls use the shared threadpool
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     """Register a new user."""
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await run_in_threadpool(_find_user, db, user_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -57,7 +117,10 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    try:
+        hashed_password = await password_hasher.hash(user_data.password)
+    except PasswordHasherBusy:
+        raise _hashing_busy()
     new_user = User(
         email=user_data.email,
         hashed_password=hashed_password,
@@ -66,19 +129,23 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
         gender=user_data.gender
     )
     
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await run_in_threadpool(_save, db, new_user)
     
     return new_user
 
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """Login and get access token."""
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = await run_in_threadpool(_find_user, db, form_data.username)
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    valid, new_hash = False, None
+    if user:
+        try:
+            valid, new_hash = await password_hasher.verify(form_data.password, user.hashed_password)
+        except PasswordHasherBusy:
+            raise _hashing_busy()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -91,12 +158,37 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
             detail="Inactive user"
         )
     
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
+    if new_hash:
+        # Stored hash used a different BCRYPT_ROUNDS; upgrade it while we have the password
+        user.hashed_password = new_hash
+        await run_in_threadpool(_save, db)
+        logger.info(f"Re-hashed password for user {user.id} with the current bcrypt cost")
+    
+    refresh_token, family_id = await run_in_threadpool(RefreshTokenService.login, db, user)
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    return _token_response(user, family_id, refresh_token)
+
+
+@router.post("/refresh", response_model=Token)
+def refresh(request: RefreshRequest, db: Session = Depends(get_db)):
+    """Exchange a refresh token for a new access token and a rotated refresh token (no password check)."""
+    try:
+        user, refresh_token, family_id = RefreshTokenService.rotate(db, request.refresh_token)
+    except InvalidRefreshToken:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    return _token_response(user, family_id, refresh_token)
+
+
+@router.post("/logout")
+def logout(request: RefreshRequest, db: Session = Depends(get_db)):
+    """Revoke the session of a refresh token; its access tokens stop working too."""
+    RefreshTokenService.revoke(db, request.refresh_token)
+    return {"message": "Logged out"}
 
 
 @router.get("/me", response_model=UserResponse)
@@ -2,10 +2,16 @@
 Chat API endpoints for AI-powered health assistant
 Handles secure chatbot interactions through backend
 """
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, status
+from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
+from datetime import datetime
+from app.core.database import get_db
+from app.api.auth import get_optional_user
+from app.models.models import User
 from app.services.llm_service import ask_health_assistant
+from app.services.chat_session_service import ChatSessionConflict, ChatSessionService, to_history
 import logging
 
 logger = logging.getLogger(__name__)
@@ -31,6 +37,28 @@ class ChatResponse(BaseModel):
     status: str = Field(default="success", description="Response status")
 
 
+class ChatSessionMessageRequest(BaseModel):
+    """Request model for appending a message to a server-side chat session"""
+    message: str = Field(..., min_length=1, max_length=2000, description="User's message")
+
+
+class ChatSessionMessageResponse(ChatResponse):
+    """Response model for a chat session turn"""
+    session_id: str = Field(..., description="Chat session id")
+    expires_at: datetime = Field(..., description="When the session expires if left idle")
+
+
+class ChatSessionResponse(BaseModel):
+    """Chat session with its stored history"""
+    session_id: str = Field(..., description="Chat session id")
+    expires_at: datetime = Field(..., description="When the session expires if left idle")
+    messages: List[ChatMessage] = Field(default_factory=list, description="Stored conversation")
+
+
+def _user_id(user: Optional[User]) -> Optional[int]:
+    return user.id if user is not None else None
+
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_assistant(request: ChatRequest):
     """
@@ -42,6 +70,9 @@ async def chat_with_assistant(request: ChatRequest):
     - **message**: User's health-related question
     - **history**: Optional previous conversation for context
     
+    Prefer `/chat/sessions` for multi-turn conversations: it keeps the history
+    on the server so each request only carries the new message.
+    
     Returns AI-generated health guidance with appropriate disclaimers.
     """
     try:
@@ -76,6 +107,122 @@ async def chat_with_assistant(request: ChatRequest):
         )
 
 
+@router.post("/chat/sessions", response_model=ChatSessionResponse, status_code=status.HTTP_201_CREATED)
+def create_chat_session(
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_optional_user)
+):
+    """
+    Start a server-side chat session
+    
+    The returned **session_id** is sent with each new message so the client
+    no longer has to upload the full conversation history. When the request
+    carries a valid bearer token the session belongs to that user and is only
+    reachable with their token.
+    """
+    chat_session = ChatSessionService.create_session(db, _user_id(current_user))
+    return ChatSessionResponse(
+        session_id=chat_session.id,
+        expires_at=chat_session.expires_at,
+        messages=[]
+    )
+
+
+@router.get("/chat/sessions/{session_id}", response_model=ChatSessionResponse)
+def get_chat_session(
+    session_id: str,
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_optional_user)
+):
+    """Fetch the stored history of a chat session"""
+    entry = ChatSessionService.load(db, session_id, _user_id(current_user))
+    if entry is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat session not found or expired"
+        )
+    
+    _turn, expires_at, messages = entry
+    return ChatSessionResponse(
+        session_id=session_id,
+        expires_at=expires_at,
+        messages=to_history(messages)
+    )
+
+
+@router.post("/chat/sessions/{session_id}/messages", response_model=ChatSessionMessageResponse)
+async def send_chat_session_message(
+    session_id: str,
+    request: ChatSessionMessageRequest,
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_optional_user)
+):
+    """
+    Send a message within a chat session
+    
+    The conversation context is rebuilt on the server from the stored session,
+    and the new exchange is appended to it.
+    """
+    user_id = _user_id(current_user)
+    entry = ChatSessionService.load(db, session_id, user_id)
+    if entry is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat session not found or expired"
+        )
+    
+    _turn, _expires_at, messages = entry
+    
+    try:
+        logger.info(f"Chat session {session_id} message received: {request.message[:50]}...")
+        ai_response = await ask_health_assistant(
+            message=request.message,
+            history=to_history(messages) or None
+        )
+    except Exception as e:
+        logger.error(f"Chat session endpoint error: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate response: {str(e)}"
+        )
+    
+    try:
+        updated = ChatSessionService.append_turn(db, session_id, request.message, ai_response, user_id)
+    except ChatSessionConflict:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Chat session was updated concurrently; please resend the message"
+        )
+    if updated is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat session not found or expired"
+        )
+    
+    _turn, expires_at, _messages = updated
+    return ChatSessionMessageResponse(
+        response=ai_response,
+        status="success",
+        session_id=session_id,
+        expires_at=expires_at
+    )
+
+
+@router.delete("/chat/sessions/{session_id}")
+def delete_chat_session(
+    session_id: str,
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_optional_user)
+):
+    """End a chat session and delete its stored history"""
+    if not ChatSessionService.delete_session(db, session_id, _user_id(current_user)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat session not found"
+        )
+    return {"message": "Chat session deleted successfully"}
+
+
 @router.get("/chat/health")
 async def health_check():
     """
@@ -85,13 +232,15 @@ async def health_check():
     """
     try:
         from app.services.llm_service import llm_service
+        from app.services.structured_output import parse_stats
         from app.core.config import settings
         
         return {
             "status": "healthy",
             "service": "chat",
             "llm_model": llm_service.model,
-            "api_key_configured": bool(settings.GROQ_API_KEY)
+            "api_key_configured": bool(settings.GROQ_API_KEY),
+            "structured_output": parse_stats.snapshot()
         }
     except Exception as e:
         logger.error(f"Chat health check failed: {str(e)}")
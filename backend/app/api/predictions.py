@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from typing import List
 from app.core.database import get_db
 from app.models.models import Prediction, User, Feedback
@@ -13,6 +14,9 @@ from app.schemas.schemas import (
 from app.api.auth import get_current_user
 from app.services.ml_service import predict_disease
 from app.services.llm_service import get_medicine_advice
+from app.services.symptom_extractor import extract_symptoms
+from app.core.config import settings
+from app.schemas.schemas import AdditionalDetailsAnalysis
 import logging
 
 router = APIRouter()
@@ -75,26 +79,40 @@ async def make_prediction(
         # Step 1: Analyze additional details if provided
         additional_analysis = None
         if prediction_data.additional_details and len(prediction_data.additional_details.strip()) > 3:
-            try:
-                logger.info(f"Analyzing additional details: {prediction_data.additional_details[:100]}...")
-                from app.services.llm_service import LLMService
-                llm_service = LLMService()
-                
-                additional_analysis = await llm_service.analyze_additional_details(
-                    additional_text=prediction_data.additional_details,
-                    selected_symptoms=prediction_data.symptoms,
-                    language=language
+            # Try the offline extractor first; only unclear text needs the LLM
+            local = extract_symptoms(prediction_data.additional_details)
+            if local.confidence >= settings.LOCAL_EXTRACTOR_MIN_CONFIDENCE:
+                logger.info(f"Additional details handled locally (confidence={local.confidence})")
+                analysis = AdditionalDetailsAnalysis.model_validate(
+                    local.to_analysis(prediction_data.symptoms, language)
                 )
-                logger.info(f"Additional details analysis complete: {additional_analysis.get('success')}")
-            except Exception as e:
-                logger.error(f"Failed to analyze additional details: {str(e)}")
-                # Continue without analysis if it fails
+                additional_analysis = {
+                    "success": True,
+                    "analysis": analysis.model_dump(),
+                    "source": "local"
+                }
+            else:
+                try:
+                    logger.info(f"Analyzing additional details: {prediction_data.additional_details[:100]}...")
+                    from app.services.llm_service import LLMService
+                    llm_service = LLMService()
+                    
+                    additional_analysis = await llm_service.analyze_additional_details(
+                        additional_text=prediction_data.additional_details,
+                        selected_symptoms=prediction_data.symptoms,
+                        language=language
+                    )
+                    logger.info(f"Additional details analysis complete: {additional_analysis.get('success')}")
+                except Exception as e:
+                    logger.error(f"Failed to analyze additional details: {str(e)}")
+                    # Continue without analysis if it fails
         
         # Call ML service for disease prediction
         result = predict_disease(
             symptoms=prediction_data.symptoms,
             age=prediction_data.age,
-            gender=prediction_data.gender
+            gender=prediction_data.gender,
+            language=language
         )
         
         # Get PERSONALIZED medicine recommendations from Groq AI
@@ -127,6 +145,7 @@ async def make_prediction(
                 "duration_days": prediction_data.duration_days,
                 "medicine_advice": medicine_advice.get("recommendations") if medicine_advice else None,
                 "language": language,
+                "model_version": result.get("model_version"),
                 "additional_details": prediction_data.additional_details,
                 "ai_analysis": additional_analysis.get("analysis") if additional_analysis and additional_analysis.get("success") else None
             }
@@ -261,7 +280,15 @@ def submit_feedback(
     
     new_feedback = Feedback(**feedback_data.dict())
     db.add(new_feedback)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # ux_feedback_prediction_id (if applied): a concurrent submit won the race
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Feedback already submitted for this prediction"
+        )
     db.refresh(new_feedback)
     
     return new_feedback
@@ -1,8 +1,9 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
 from urllib.parse import urlparse
+from typing import List
 from app.core.config import settings
 
 # Create engine with SSL support for production databases
@@ -24,6 +25,9 @@ else:
     engine_kwargs["pool_recycle"] = 300  # Recycle long-lived connections
 
 engine = create_engine(database_url, **engine_kwargs)
+if settings.SLOW_QUERY_LOG_ENABLED:
+    from app.core.slow_query_log import slow_query_log
+    slow_query_log.install(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -36,3 +40,24 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def missing_indexes(bind=None) -> List[str]:
+    """
+    Indexes declared in the models' __table_args__ that the database lacks.
+    Plain `index=True` column indexes are skipped, since older databases
+    created from database/init.sql carry those under different names.
+    """
+    inspector = inspect(bind or engine)
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            columns = list(index.columns)
+            if len(columns) == 1 and columns[0].index:
+                continue
+            if index.name not in existing:
+                missing.append(f"{table.name}.{index.name}")
+    return missing
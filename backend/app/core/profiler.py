@@ -0,0 +1,329 @@
+"""
+Request Profiler
+Stack-sampling profiles of individual requests, written in the collapsed
+("folded") stack format that flamegraph.pl, inferno and speedscope read:
+one `frame;frame;frame count` line per distinct stack.
+
+A request is profiled when
+- an admin adds `?profile=1` (profile stored, its id returned in the
+  X-Profile-Id header) or `?profile=return` (the folded stacks are returned
+  instead of the response body), or
+- it is picked by PROFILER_SAMPLE_RATE and takes at least
+  PROFILER_SAMPLE_MIN_MS (stored).
+
+Stored profiles are listed and downloaded from /api/admin/profiles.
+
+While a profile is active, a sampler thread reads sys._current_frames()
+every PROFILER_INTERVAL_MS. Event-loop samples only count while the loop
+is running this request's task (time spent awaiting shows up as
+"(suspended)"); busy worker-thread stacks are attributed by thread name,
+so under concurrent load they can include work of other requests (the
+profile header records how many requests were in flight).
+
+With the profiler disabled the middleware is not installed at all; when
+enabled, an unprofiled request costs a query-string scan, an in-flight
+counter and, with a sample rate set, one random draw.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings, resolve_backend_path
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SUFFIX = ".folded"
+MAX_STACK_DEPTH = 128
+_PROFILE_PARAM = re.compile(rb"(?:^|&)profile=(1|return)(?:&|$)")
+_SAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+_PROFILE_ID = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+# Top frames of threads that are parked waiting for work
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    # ';' separates frames and ' ' precedes the count in the folded format
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _stack(frame, stop=None) -> Tuple[List[str], bool]:
+    """Labels root-first up to (excluding) `stop`, and whether `stop` was on the stack"""
+    labels = []
+    found = stop is None
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        if frame is stop:
+            found = True
+            break
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels, found
+
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_FRAMES
+
+
+class Profile:
+    def __init__(self, loop_thread: int, request_frame, label: str):
+        self.loop_thread = loop_thread
+        self.request_frame = request_frame
+        self.label = label
+        self.counts: Dict[str, int] = {}
+        self.samples = 0
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.max_in_flight = 0
+
+    def add(self, stack: List[str]):
+        key = ";".join(stack)
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def sample(self, frames: Dict, thread_names: Dict[int, str], sampler_thread: int):
+        self.samples += 1
+        loop_frame = frames.get(self.loop_thread)
+        if loop_frame is not None:
+            stack, running = _stack(loop_frame, stop=self.request_frame)
+            if running:
+                # Frames above the middleware belong to this request
+                self.add(["event-loop"] + stack)
+            else:
+                self.add(["event-loop", "(suspended)"])
+        for ident, frame in frames.items():
+            if ident in (self.loop_thread, sampler_thread) or _is_idle(frame):
+                continue
+            self.add([thread_names.get(ident, f"thread-{ident}")] + _stack(frame)[0])
+
+    def folded(self) -> str:
+        header = (
+            f"# {self.label} {self.duration * 1000:.1f}ms, {self.samples} samples "
+            f"every {settings.PROFILER_INTERVAL_MS}ms, up to {self.max_in_flight} requests in flight\n"
+        )
+        return header + "".join(f"{stack} {count}\n" for stack, count in sorted(self.counts.items()))
+
+
+class _Sampler:
+    """One thread samples every active profile; it exits when none are left"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._profiles: List[Profile] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.in_flight = 0
+
+    def start(self, profile: Profile):
+        with self._lock:
+            self._profiles.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, profile: Profile):
+        with self._lock:
+            if profile in self._profiles:
+                self._profiles.remove(profile)
+        profile.duration = time.perf_counter() - profile.started
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                profiles = list(self._profiles)
+                if not profiles:
+                    self._thread = None
+                    return
+            frames = sys._current_frames()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for profile in profiles:
+                profile.max_in_flight = max(profile.max_in_flight, self.in_flight)
+                profile.sample(frames, names, me)
+            del frames
+            time.sleep(self.interval)
+
+
+class ProfileStore:
+    """Folded profiles on disk, newest kept up to `max_files`"""
+
+    def __init__(self, directory: str, max_files: int = 200):
+        self.directory = resolve_backend_path(directory)
+        self.max_files = max_files
+
+    def new_id(self, method: str, path: str) -> str:
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        route = _SAFE.sub("_", path.strip("/")) or "root"
+        return f"{stamp}-{method.lower()}-{route[:60]}-{uuid.uuid4().hex[:8]}"
+
+    def path(self, profile_id: str) -> str:
+        if not _PROFILE_ID.match(profile_id) or profile_id.startswith("."):
+            raise ValueError(f"Invalid profile id: {profile_id}")
+        return os.path.join(self.directory, profile_id + PROFILE_SUFFIX)
+
+    def save(self, profile_id: str, content: str):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(profile_id), "w") as f:
+            f.write(content)
+        self._prune()
+
+    def _prune(self):
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(PROFILE_SUFFIX))
+        for name in names[:max(0, len(names) - self.max_files)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def list(self) -> List[Dict]:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if name.endswith(PROFILE_SUFFIX):
+                stat = os.stat(os.path.join(self.directory, name))
+                profiles.append({
+                    "id": name[:-len(PROFILE_SUFFIX)],
+                    "bytes": stat.st_size,
+                    "created_at": datetime.utcfromtimestamp(stat.st_mtime).isoformat(),
+                })
+        return profiles
+
+    def read(self, profile_id: str) -> Optional[str]:
+        try:
+            with open(self.path(profile_id), "r") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+def _is_admin(authorization: str) -> bool:
+    """Same checks as get_current_user + verify_admin, without raising"""
+    from app.core.database import SessionLocal
+    from app.core.security import decode_access_token
+    from app.models.models import User
+    from app.services.refresh_token_service import revocation_cache
+
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    payload = decode_access_token(token.strip())
+    if not payload or not payload.get("sub"):
+        return False
+    db = SessionLocal()
+    try:
+        family_id = payload.get("fam")
+        if family_id:
+            revocation_cache.sync_if_stale(db)
+            if revocation_cache.is_revoked(family_id):
+                return False
+        user = db.query(User).filter(User.email == payload["sub"]).first()
+        return bool(user is not None and user.is_admin)
+    finally:
+        db.close()
+
+
+def _header(scope, name: bytes) -> str:
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+class ProfilerMiddleware:
+    """Pure ASGI; profiles cover the request until its last body byte"""
+
+    def __init__(self, app, store: ProfileStore, sample_rate: float = 0.0, sample_min_ms: float = 0.0,
+                 interval_ms: float = 5.0):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.sample_min = sample_min_ms / 1000.0
+        self.sampler = _Sampler(interval_ms / 1000.0)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        mode = None
+        query = scope.get("query_string", b"")
+        if b"profile=" in query:
+            match = _PROFILE_PARAM.search(query)
+            authorization = _header(scope, b"authorization")
+            if match and authorization and await run_in_threadpool(_is_admin, authorization):
+                mode = match.group(1).decode()
+        if mode is None and self.sample_rate > 0 and random.random() < self.sample_rate:
+            mode = "sampled"
+        if mode is None:
+            self.sampler.in_flight += 1
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self.sampler.in_flight -= 1
+            return
+        await self._profiled(scope, receive, send, mode)
+
+    async def _profiled(self, scope, receive, send, mode: str):
+        method = scope.get("method", "GET")
+        profile_id = self.store.new_id(method, scope.get("path", ""))
+        profile = Profile(threading.get_ident(), sys._getframe(), f"{method} {scope.get('path', '')}")
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if mode == "return":
+                    return
+                if mode == "1":
+                    message = dict(message)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-profile-id", profile_id.encode("latin-1"))
+                    ]
+            elif message["type"] == "http.response.body" and mode == "return":
+                return
+            await send(message)
+
+        self.sampler.in_flight += 1
+        self.sampler.start(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.sampler.stop(profile)
+            self.sampler.in_flight -= 1
+            profile.label += f" -> {status_code}"
+
+        if mode == "return":
+            body = profile.folded().encode("utf-8")
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+                (b"content-disposition", f'attachment; filename="{profile_id}{PROFILE_SUFFIX}"'.encode("latin-1")),
+            ]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        if mode == "sampled" and profile.duration < self.sample_min:
+            return
+        try:
+            await run_in_threadpool(self.store.save, profile_id, profile.folded())
+            logger.info(f"Stored {mode} profile {profile_id} ({profile.duration * 1000:.1f}ms)")
+        except OSError as e:
+            logger.warning(f"Could not store profile {profile_id}: {str(e)}")
+
+
+profile_store = ProfileStore(settings.PROFILER_DIR, settings.PROFILER_MAX_FILES)
@@ -1,28 +1,147 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+import asyncio
+import logging
+import os
+import threading
+import time
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
 
+# min == max == default, so hashes made with any other cost report needs_update
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS
+)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash."""
+
+def _truncate(password: str) -> str:
     # Truncate password to 72 bytes to handle bcrypt limitation
-    password_bytes = plain_password.encode('utf-8')
+    password_bytes = password.encode('utf-8')
     if len(password_bytes) > 72:
-        plain_password = password_bytes[:72].decode('utf-8', errors='ignore')
-    return pwd_context.verify(plain_password, hashed_password)
+        password = password_bytes[:72].decode('utf-8', errors='ignore')
+    return password
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash."""
+    return pwd_context.verify(_truncate(plain_password), hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password."""
-    # Truncate password to 72 bytes to handle bcrypt limitation
-    password_bytes = password.encode('utf-8')
-    if len(password_bytes) > 72:
-        password = password_bytes[:72].decode('utf-8', errors='ignore')
-    return pwd_context.hash(password)
+    return pwd_context.hash(_truncate(password))
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password; also return a fresh hash when the stored one uses an outdated cost."""
+    return pwd_context.verify_and_update(_truncate(plain_password), hashed_password)
+
+
+def _timed(fn, *args):
+    """Runs inside the pool; returns the result with the CPU-side duration"""
+    started = time.perf_counter()
+    return fn(*args), time.perf_counter() - started
+
+
+class PasswordHasherBusy(Exception):
+    """More hash jobs are waiting than PASSWORD_HASH_MAX_QUEUE allows"""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated, size-bounded pool so slow hashing neither
+    blocks the event loop nor holds Starlette's shared threadpool. bcrypt
+    releases the GIL, so threads scale with cores; "process" isolates the
+    work completely. Jobs beyond workers + max_queue are rejected up front
+    rather than piling up behind a login spike.
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 0, max_queue: int = 64):
+        self.kind = "process" if kind == "process" else "thread"
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {
+            "submitted": 0, "completed": 0, "rejected": 0, "failed": 0, "rehashed": 0,
+            "peak_queued": 0, "wait_seconds": 0.0, "run_seconds": 0.0,
+        }
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self._stats["rejected"] += 1
+                raise PasswordHasherBusy()
+            self._in_flight += 1
+            self._stats["submitted"] += 1
+            self._stats["peak_queued"] = max(self._stats["peak_queued"], self._in_flight - self.workers)
+        submitted = time.perf_counter()
+        try:
+            result, run_seconds = await asyncio.wrap_future(self._pool().submit(_timed, fn, *args))
+        except Exception:
+            with self._lock:
+                self._stats["failed"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+        with self._lock:
+            self._stats["completed"] += 1
+            self._stats["run_seconds"] += run_seconds
+            self._stats["wait_seconds"] += max(0.0, time.perf_counter() - submitted - run_seconds)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """(valid, new_hash); new_hash is set when the stored hash should be replaced"""
+        valid, new_hash = await self._run(verify_and_update_password, password, hashed_password)
+        if new_hash:
+            with self._lock:
+                self._stats["rehashed"] += 1
+        return valid, new_hash
+
+    def stats(self) -> Dict:
+        with self._lock:
+            completed = self._stats["completed"] or 1
+            return {
+                "executor": self.kind,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+                "in_flight": self._in_flight,
+                "queued": max(0, self._in_flight - self.workers),
+                **{key: value for key, value in self._stats.items() if not key.endswith("_seconds")},
+                "avg_wait_ms": round(self._stats["wait_seconds"] / completed * 1000, 2),
+                "avg_hash_ms": round(self._stats["run_seconds"] / completed * 1000, 2),
+            }
+
+
+password_hasher = PasswordHasher(
+    kind=settings.PASSWORD_HASH_EXECUTOR,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE
+)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -0,0 +1,242 @@
+"""
+Slow Query Log
+SQLAlchemy engine hooks that record statements slower than SLOW_QUERY_MS,
+grouped by a normalized fingerprint (literals and bind parameters replaced,
+IN/VALUES lists collapsed), with counts, total/max time and a p95 over the
+most recent samples. Served by GET /api/admin/slow-queries.
+
+With SLOW_QUERY_EXPLAIN on PostgreSQL, a new worst instance of a SELECT is
+re-run once in the background as EXPLAIN (ANALYZE, BUFFERS) on a separate
+connection (rolled back, bounded by a statement timeout), and the slowest
+plans per fingerprint are kept next to its stats.
+
+SLOW_QUERY_MS=0 aggregates every statement, which makes N+1 patterns show
+up as one fingerprint with a large count.
+"""
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Dict, List, Optional
+import hashlib
+import logging
+import queue
+import re
+import threading
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_FINGERPRINTS = 500
+SAMPLES = 256              # recent durations kept per fingerprint for p95
+EXPLAINS_KEPT = 3          # slowest plans kept per fingerprint
+EXPLAIN_INTERVAL = 300.0   # seconds between plans captured for one fingerprint
+EXPLAIN_TIMEOUT_MS = 10000
+EXPLAIN_QUEUE_SIZE = 16
+STATEMENT_CHARS = 2000
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDERS = re.compile(r"%\(\w+\)s|%s|(?<![:\w]):\w+|\$\d+|\?")
+_NUMBERS = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\b(in)\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.I)
+_ROW = r"\(\s*\?(?:\s*,\s*\?)*\s*\)"
+_VALUE_ROWS = re.compile(rf"({_ROW})(?:\s*,\s*{_ROW})+")
+_SPACES = re.compile(r"\s+")
+_READS = re.compile(r"\s*(select|with)\b", re.I)
+_WRITES = re.compile(r"\b(insert|update|delete|merge)\b|\bfor\s+(update|share)\b", re.I)
+
+
+def fingerprint(statement: str) -> str:
+    """Statement shape with literals, parameters and list lengths removed"""
+    text = _COMMENTS.sub(" ", statement)
+    text = _STRINGS.sub("?", text)
+    text = _PLACEHOLDERS.sub("?", text)
+    text = _NUMBERS.sub("?", text)
+    text = _IN_LISTS.sub(r"\1 (?+)", text)
+    text = _VALUE_ROWS.sub(r"\1, ...", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def _fingerprint_id(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class _Entry:
+    __slots__ = ("statement", "count", "total", "max", "samples", "first_seen", "last_seen",
+                 "explains", "last_explain")
+
+    def __init__(self, statement: str):
+        self.statement = statement[:STATEMENT_CHARS]
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLES)
+        self.first_seen = self.last_seen = datetime.utcnow()
+        self.explains: List[Dict] = []
+        self.last_explain = 0.0
+
+
+class SlowQueryLog:
+
+    def __init__(self, threshold_ms: float = 200.0, explain: bool = False):
+        self.threshold = threshold_ms / 1000.0
+        self.explain = explain
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._engine = None
+        self._explain_queue: Optional[queue.Queue] = None
+        self.dropped_explains = 0
+
+    def install(self, engine):
+        """Attach to `engine` (idempotent)"""
+        from sqlalchemy import event
+
+        if self._engine is not None:
+            return
+        self._engine = engine
+        if self.explain and engine.dialect.name != "postgresql":
+            logger.info("SLOW_QUERY_EXPLAIN needs PostgreSQL; recording timings only")
+            self.explain = False
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info.get("slow_query_started")
+            if not started:
+                return
+            duration = time.perf_counter() - started.pop()
+            if duration >= self.threshold:
+                self.record(statement, duration, None if executemany else parameters)
+
+        @event.listens_for(engine, "handle_error")
+        def _error(exception_context):
+            connection = exception_context.connection
+            started = connection.info.get("slow_query_started") if connection is not None else None
+            if started:
+                started.pop()
+
+    def record(self, statement: str, duration: float, parameters=None):
+        normalized = fingerprint(statement)
+        key = _fingerprint_id(normalized)
+        explain = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(normalized)
+                while len(self._entries) > MAX_FINGERPRINTS:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+            new_worst = duration > entry.max
+            entry.count += 1
+            entry.total += duration
+            entry.max = max(entry.max, duration)
+            entry.samples.append(duration)
+            entry.last_seen = datetime.utcnow()
+            if (self.explain and new_worst and parameters is not None
+                    and time.monotonic() - entry.last_explain >= EXPLAIN_INTERVAL
+                    and self._explainable(statement)):
+                entry.last_explain = time.monotonic()
+                explain = True
+
+        if self.threshold > 0:
+            logger.warning(f"Slow query {key} ({duration * 1000:.1f} ms): {normalized[:200]}")
+        if explain:
+            self._queue_explain(key, statement, parameters, duration)
+
+    @staticmethod
+    def _explainable(statement: str) -> bool:
+        # ANALYZE executes the statement, so only plain reads qualify
+        return bool(_READS.match(statement)) and not _WRITES.search(statement)
+
+    def _queue_explain(self, key: str, statement: str, parameters, duration: float):
+        if self._explain_queue is None:
+            with self._lock:
+                if self._explain_queue is None:
+                    self._explain_queue = queue.Queue(maxsize=EXPLAIN_QUEUE_SIZE)
+                    threading.Thread(target=self._explain_worker, name="slow-query-explain", daemon=True).start()
+        try:
+            self._explain_queue.put_nowait((key, statement, parameters, duration))
+        except queue.Full:
+            self.dropped_explains += 1
+
+    def _explain_worker(self):
+        while True:
+            key, statement, parameters, duration = self._explain_queue.get()
+            try:
+                plan = self._run_explain(statement, parameters)
+            except Exception as e:
+                logger.warning(f"EXPLAIN for slow query {key} failed: {str(e)}")
+                continue
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                entry.explains.append({
+                    "duration_ms": round(duration * 1000, 2),
+                    "captured_at": datetime.utcnow().isoformat(),
+                    "plan": plan,
+                })
+                entry.explains.sort(key=lambda item: item["duration_ms"], reverse=True)
+                del entry.explains[EXPLAINS_KEPT:]
+
+    def _run_explain(self, statement: str, parameters) -> str:
+        # Raw DBAPI connection: bypasses the engine events, so this is not recorded itself
+        connection = self._engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(f"SET LOCAL statement_timeout = {int(EXPLAIN_TIMEOUT_MS)}")
+            cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+            cursor.close()
+            return plan
+        finally:
+            connection.rollback()
+            connection.close()
+
+    def report(self, sort: str = "total", limit: int = 50) -> Dict:
+        with self._lock:
+            rows = []
+            for key, entry in self._entries.items():
+                samples = list(entry.samples)
+                rows.append({
+                    "fingerprint": key,
+                    "statement": entry.statement,
+                    "count": entry.count,
+                    "total_ms": round(entry.total * 1000, 2),
+                    "mean_ms": round(entry.total / entry.count * 1000, 2) if entry.count else 0.0,
+                    "p95_ms": round(_percentile(samples, 0.95) * 1000, 2),
+                    "max_ms": round(entry.max * 1000, 2),
+                    "first_seen": entry.first_seen.isoformat(),
+                    "last_seen": entry.last_seen.isoformat(),
+                    "explains": list(entry.explains),
+                })
+        sort_keys = {"total": "total_ms", "count": "count", "p95": "p95_ms", "max": "max_ms", "recent": "last_seen"}
+        rows.sort(key=lambda row: row[sort_keys.get(sort, "total_ms")], reverse=True)
+        return {
+            "enabled": self._engine is not None,
+            "threshold_ms": round(self.threshold * 1000, 2),
+            "explain": self.explain,
+            "fingerprints_tracked": len(rows),
+            "dropped_explains": self.dropped_explains,
+            "queries": rows[:limit],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self.dropped_explains = 0
+
+
+slow_query_log = SlowQueryLog(threshold_ms=settings.SLOW_QUERY_MS, explain=settings.SLOW_QUERY_EXPLAIN)
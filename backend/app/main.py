@@ -1,9 +1,20 @@
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import auth, symptoms, predictions, admin, chat, profile
 from app.routers import notifications
 from app.core.config import settings
+from app.core.database import engine, missing_indexes
+from app.core import metrics
+from app.core.profiler import ProfilerMiddleware, profile_store
+from app.core.security import password_hasher
+from app.services.ml_service import predictor
+from app.services.model_registry import model_registry
+from app.services.online_learning import online_learner
 import re
+import logging
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="Health Symptom Predictor API",
@@ -38,6 +49,37 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+if settings.METRICS_ENABLED:
+    metrics.instrument_engine(engine)
+    app.add_middleware(metrics.MetricsMiddleware)
+
+if settings.PROFILER_ENABLED:
+    app.add_middleware(
+        ProfilerMiddleware,
+        store=profile_store,
+        sample_rate=settings.PROFILER_SAMPLE_RATE,
+        sample_min_ms=settings.PROFILER_SAMPLE_MIN_MS,
+        interval_ms=settings.PROFILER_INTERVAL_MS
+    )
+
+
+def _runtime_gauges():
+    """Point-in-time values read on each scrape"""
+    yield ("prediction_cache_entries", "Entries in the prediction cache", "gauge", [
+        ({}, predictor.cache_stats()["size"])
+    ])
+    pool = engine.pool
+    if hasattr(pool, "checkedout"):
+        yield ("db_pool_connections", "SQLAlchemy pool connections", "gauge", [
+            ({"state": "checked_out"}, pool.checkedout()), ({"state": "idle"}, pool.checkedin())
+        ])
+    hashing = password_hasher.stats()
+    yield ("password_hash_in_flight", "Password hash jobs running or queued", "gauge", [({}, hashing["in_flight"])])
+    yield ("password_hash_rejected_total", "Password hash jobs rejected with 503", "counter", [({}, hashing["rejected"])])
+
+
+metrics.registry.add_collector(_runtime_gauges)
+
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
@@ -48,6 +90,31 @@ app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 app.include_router(chat.router, prefix="/api", tags=["Chat"])
 app.include_router(notifications.router, tags=["Notifications"])
 
+@app.on_event("startup")
+async def load_configured_model():
+    """Load MODEL_VERSION in the background; rule-based predictions serve until it is ready"""
+    model_registry.activate_on_startup(settings.MODEL_VERSION)
+    online_learner.start_scheduler(
+        settings.ONLINE_LEARNING_INTERVAL_MINUTES,
+        activate=settings.ONLINE_LEARNING_AUTO_ACTIVATE
+    )
+
+
+@app.on_event("startup")
+def check_database_indexes():
+    """Warn (without failing startup) when the database lacks indexes declared in the models"""
+    try:
+        missing = missing_indexes()
+    except Exception as e:
+        logger.warning(f"Could not check database indexes: {str(e)}")
+        return
+    if missing:
+        logger.warning(
+            f"Database is missing indexes: {', '.join(missing)}. "
+            "Run `alembic upgrade head` from the backend directory."
+        )
+
+
 @app.get("/")
 async def root():
     return {
@@ -59,3 +126,10 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    if not settings.METRICS_ENABLED:
+        return Response(status_code=404)
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
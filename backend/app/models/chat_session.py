@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey
+from datetime import datetime
+from app.core.database import Base
+
+
+class ChatSession(Base):
+    __tablename__ = "chat_sessions"
+    
+    id = Column(String(32), primary_key=True)  # Opaque URL-safe token handed to the client
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)  # Owner; NULL for anonymous chats
+    messages = Column(JSON, nullable=False, default=list)  # Compact [["u"|"a", content], ...] pairs
+    turn = Column(Integer, nullable=False, default=0)  # Bumped on every append (optimistic locking)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
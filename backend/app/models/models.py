@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, JSON, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, JSON, Boolean, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -68,6 +68,11 @@ class Prediction(Base):
     disease = relationship("Disease", back_populates="predictions")
     feedback = relationship("Feedback", back_populates="prediction", uselist=False)
 
+    __table_args__ = (
+        # History, per-user cleanup and admin listings: WHERE user_id = ? ORDER BY timestamp DESC
+        Index("ix_predictions_user_id_timestamp", user_id, timestamp.desc()),
+    )
+
 
 class Feedback(Base):
     __tablename__ = "feedback"
@@ -82,3 +87,8 @@ class Feedback(Base):
     
     # Relationships
     prediction = relationship("Prediction", back_populates="feedback")
+
+    __table_args__ = (
+        # Prediction -> feedback joins (alembic 0003_unique_feedback can add a unique index too)
+        Index("ix_feedback_prediction_id", prediction_id),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, CheckConstraint
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, CheckConstraint, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -18,4 +18,13 @@ class Notification(Base):
             "type IN ('personalized', 'announcement', 'direct')",
             name='check_notification_type'
         ),
+        # Inbox: WHERE (user_id = ? OR user_id IS NULL) [AND is_read = false] ORDER BY created_at DESC
+        Index("ix_notifications_user_id_is_read_created_at", user_id, is_read, created_at.desc()),
+        # Unread badge counts only touch the (small) unread part of the table
+        Index(
+            "ix_notifications_unread",
+            user_id, created_at.desc(),
+            postgresql_where=(is_read == False),
+            sqlite_where=(is_read == False)
+        ),
     )
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from datetime import datetime
+from app.core.database import Base
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(String(22), primary_key=True)  # Public selector: the part of the token before the "."
+    token_hash = Column(String(64), nullable=False)  # sha256 hex of the secret part; the secret itself is never stored
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    family_id = Column(String(22), nullable=False, index=True)  # One login = one family; rotation keeps the family
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, index=True)  # Set on rotation, logout or reuse detection
+    replaced_by = Column(String(22))  # Successor after rotation; NULL when revoked for good
@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, Float
+from datetime import datetime
+from app.core.database import Base
+
+
+class DailyDiseaseStat(Base):
+    """Per-day, per-disease rollup of predictions and feedback (maintained by StatsService)"""
+    __tablename__ = "stats_daily_disease"
+    
+    day = Column(Date, primary_key=True)
+    disease = Column(String, primary_key=True)  # predicted_disease_name, "Unknown" if missing
+    predictions = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+    confidence_count = Column(Integer, nullable=False, default=0)  # predictions with a confidence score
+    feedback = Column(Integer, nullable=False, default=0)
+    accurate_feedback = Column(Integer, nullable=False, default=0)
+
+
+class StatsRollupState(Base):
+    """Watermarks: rows with ids up to these have been folded into the rollups"""
+    __tablename__ = "stats_rollup_state"
+    
+    name = Column(String(32), primary_key=True)
+    last_prediction_id = Column(Integer, nullable=False, default=0)
+    last_feedback_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DailySegmentStat(Base):
+    """Per-day prediction counts by disease, age band and gender (for analytics time series)"""
+    __tablename__ = "stats_daily_segment"
+    
+    day = Column(Date, primary_key=True)
+    disease = Column(String, primary_key=True)
+    age_band = Column(String(16), primary_key=True)  # "0-12", "13-17", "18-39", "40-64", "65+" or "unknown"
+    gender = Column(String(16), primary_key=True)  # "male", "female", "other" or "unknown"
+    predictions = Column(Integer, nullable=False, default=0)
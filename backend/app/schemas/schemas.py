@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from typing import Optional, List, Any
 from datetime import datetime
 
 
@@ -42,6 +42,12 @@ class UserProfileUpdate(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str = Field(..., min_length=1, max_length=128)
 
 
 class TokenData(BaseModel):
@@ -98,6 +104,41 @@ class PredictionRequest(BaseModel):
     additional_details: Optional[str] = None  # Free-text description in any language
 
 
+class AdditionalDetailsAnalysis(BaseModel):
+    """Structured LLM analysis of free-text additional details."""
+    additional_symptoms: List[str] = Field(default_factory=list)
+    severity: Optional[str] = None
+    context: Optional[str] = None
+    red_flags: List[str] = Field(default_factory=list)
+    language_detected: Optional[str] = None
+    summary: Optional[str] = None
+    
+    @field_validator("additional_symptoms", "red_flags", mode="before")
+    @classmethod
+    def _coerce_list(cls, value: Any) -> List[str]:
+        # LLMs often answer "None" or a comma-separated string instead of a list
+        if value is None:
+            return []
+        if isinstance(value, str):
+            if value.strip().lower() in ("", "none", "n/a", "null"):
+                return []
+            return [item.strip() for item in value.split(",") if item.strip()]
+        if isinstance(value, list):
+            return [str(item) for item in value if item not in (None, "")]
+        return [str(value)]
+    
+    @field_validator("severity", "context", "language_detected", "summary", mode="before")
+    @classmethod
+    def _coerce_text(cls, value: Any) -> Optional[str]:
+        if value is None or isinstance(value, str):
+            return value
+        if isinstance(value, (list, tuple)):
+            return ", ".join(str(item) for item in value)
+        if isinstance(value, dict):
+            return "; ".join(f"{k}: {v}" for k, v in value.items())
+        return str(value)
+
+
 class PredictionResponse(BaseModel):
     id: int
     predicted_disease: str
@@ -0,0 +1,262 @@
+"""
+Catalog Bulk Import
+Loads symptoms and diseases from CSV or JSON and upserts them with
+INSERT ... ON CONFLICT (name) in batches of BATCH_SIZE rows, all inside one
+transaction. Rows whose values already match the table are left untouched
+(the DO UPDATE has a WHERE ... IS DISTINCT FROM guard), so re-importing the
+same file reports them as unchanged and writes nothing. Only columns present
+in the input are written: a CSV without `severity_level` leaves that column
+of existing rows as it is.
+
+Accepted input:
+- JSON: {"symptoms": [...], "diseases": [...]}, or a bare list with `kind`
+- CSV:  one kind per file (`kind`), header row with the column names.
+        List columns (precautions, common_symptoms) are ';'-separated or a
+        JSON array. common_symptoms may hold symptom ids or names.
+
+CLI (from the backend directory):
+    python -m app.services.catalog_import catalog.json
+    python -m app.services.catalog_import symptoms.csv --kind symptoms --on-conflict skip --dry-run
+"""
+import csv
+import io
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import JSON, Text, cast, or_, select
+from sqlalchemy.orm import Session
+
+from app.models.models import Symptom, Disease
+from app.schemas.schemas import SymptomCreate, DiseaseCreate
+from app.services.disease_store import disease_store
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+KINDS = ("symptoms", "diseases")
+FORMATS = ("csv", "json")
+ON_CONFLICT = ("update", "skip")
+MAX_REPORTED_ERRORS = 50
+
+_MODELS = {"symptoms": Symptom, "diseases": Disease}
+_SCHEMAS = {"symptoms": SymptomCreate, "diseases": DiseaseCreate}
+_LIST_COLUMNS = ("precautions", "common_symptoms")
+
+
+class CatalogImportError(ValueError):
+    """The payload could not be parsed at all (individual bad rows are only skipped)"""
+
+
+def _split_list(value):
+    if value is None or isinstance(value, list):
+        return value
+    value = str(value).strip()
+    if not value:
+        return None
+    if value.startswith("["):
+        return json.loads(value)
+    return [item.strip() for item in value.split(";") if item.strip()]
+
+
+def parse_catalog(content: bytes, file_format: str, kind: Optional[str] = None) -> Dict[str, List[dict]]:
+    """Raw rows per kind; validation happens in import_catalog"""
+    if file_format not in FORMATS:
+        raise CatalogImportError(f"format must be one of {FORMATS}")
+    if kind is not None and kind not in KINDS:
+        raise CatalogImportError(f"kind must be one of {KINDS}")
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise CatalogImportError("Catalog must be UTF-8 encoded")
+
+    if file_format == "json":
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise CatalogImportError(f"Invalid JSON: {e}")
+        if isinstance(data, list):
+            if kind is None:
+                raise CatalogImportError("A JSON list needs `kind` (symptoms or diseases)")
+            return {kind: data}
+        if not isinstance(data, dict) or not set(data) & set(KINDS):
+            raise CatalogImportError(f"JSON catalog must be a list or an object with {KINDS} keys")
+        return {k: data[k] for k in KINDS if k in data and (kind is None or k == kind)}
+
+    if kind is None:
+        raise CatalogImportError("CSV imports need `kind` (symptoms or diseases)")
+    rows = []
+    for row in csv.DictReader(io.StringIO(text)):
+        row = {key.strip(): (value.strip() if isinstance(value, str) else value) for key, value in row.items() if key}
+        rows.append({key: (value if value != "" else None) for key, value in row.items()})
+    return {kind: rows}
+
+
+def _validate(kind: str, rows: List[dict], symptom_ids: Dict[str, int], report: Dict) -> List[dict]:
+    """Validated, de-duplicated (last row wins) records; invalid rows are counted as skipped"""
+    schema = _SCHEMAS[kind]
+    records: Dict[str, dict] = {}
+    for number, row in enumerate(rows, start=1):
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("row must be an object")
+            row = dict(row)
+            for column in _LIST_COLUMNS:
+                if column in row:
+                    row[column] = _split_list(row[column])
+            if kind == "diseases" and row.get("common_symptoms"):
+                resolved = []
+                for item in row["common_symptoms"]:
+                    if isinstance(item, int) or str(item).isdigit():
+                        resolved.append(int(item))
+                    elif str(item).strip().lower() in symptom_ids:
+                        resolved.append(symptom_ids[str(item).strip().lower()])
+                    else:
+                        raise ValueError(f"unknown symptom '{item}'")
+                row["common_symptoms"] = list(dict.fromkeys(resolved))
+            # Only the columns the row provides, so omitted ones are not overwritten
+            record = schema(**row).model_dump(exclude_unset=True)
+            record["name"] = record["name"].strip()
+            if not record["name"]:
+                raise ValueError("name is empty")
+        except (ValidationError, ValueError, TypeError) as e:
+            report["skipped"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                if isinstance(e, ValidationError):
+                    error = e.errors()[0]
+                    message = f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                else:
+                    message = str(e)
+                report["errors"].append({"kind": kind, "row": number, "error": message})
+            continue
+        if record["name"] in records:
+            report["skipped"] += 1  # duplicate name in the same file
+        records[record["name"]] = record
+    return list(records.values())
+
+
+def _insert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise CatalogImportError(f"Bulk import needs INSERT ... ON CONFLICT, not available on {dialect}")
+    return insert
+
+
+def _changed(column, new_value):
+    # PostgreSQL's json type has no equality operator, so compare its text form
+    if isinstance(column.type, JSON):
+        column, new_value = cast(column, Text), cast(new_value, Text)
+    return column.is_distinct_from(new_value)
+
+
+def _upsert(db: Session, kind: str, records: List[dict], on_conflict: str) -> Tuple[int, int, int]:
+    """(inserted, updated, unchanged) for one kind, in batches of rows that share a column set"""
+    model = _MODELS[kind]
+    insert = _insert(db)
+    groups: Dict[Tuple[str, ...], List[dict]] = {}
+    for record in records:
+        groups.setdefault(tuple(sorted(record)), []).append(record)
+    inserted = updated = unchanged = 0
+
+    for keys, group in groups.items():
+        columns = [column for column in keys if column != "name"]
+        for start in range(0, len(group), BATCH_SIZE):
+            batch = group[start:start + BATCH_SIZE]
+            names = [record["name"] for record in batch]
+            existing = set(db.execute(select(model.name).where(model.name.in_(names))).scalars())
+
+            statement = insert(model).values(batch)
+            if on_conflict == "skip" or not columns:
+                statement = statement.on_conflict_do_nothing(index_elements=[model.name])
+            else:
+                excluded = statement.excluded
+                statement = statement.on_conflict_do_update(
+                    index_elements=[model.name],
+                    set_={column: excluded[column] for column in columns},
+                    where=or_(*[_changed(getattr(model, column), excluded[column]) for column in columns])
+                )
+            written = set(db.execute(statement.returning(model.name)).scalars())
+
+            inserted += len(written - existing)
+            updated += len(written & existing)
+            unchanged += len(existing) - len(written & existing)
+    return inserted, updated, unchanged
+
+
+def import_catalog(db: Session, catalog: Dict[str, List[dict]], on_conflict: str = "update",
+                   dry_run: bool = False) -> Dict:
+    """
+    Upsert a parsed catalog in a single transaction and refresh the disease
+    store when diseases changed. `skipped` counts invalid rows, in-file
+    duplicates and (with on_conflict=skip or unchanged values) existing rows.
+    """
+    if on_conflict not in ON_CONFLICT:
+        raise CatalogImportError(f"on_conflict must be one of {ON_CONFLICT}")
+    report = {"inserted": 0, "updated": 0, "skipped": 0, "kinds": {}, "errors": [], "dry_run": dry_run}
+
+    try:
+        for kind in KINDS:  # symptoms first, so diseases can reference new symptom names
+            if kind not in catalog:
+                continue
+            symptom_ids = {}
+            if kind == "diseases":
+                symptom_ids = {name.lower(): id_ for id_, name in db.execute(select(Symptom.id, Symptom.name))}
+            skipped_before = report["skipped"]
+            records = _validate(kind, catalog[kind] or [], symptom_ids, report)
+            inserted, updated, unchanged = _upsert(db, kind, records, on_conflict)
+            report["skipped"] += unchanged
+            report["inserted"] += inserted
+            report["updated"] += updated
+            report["kinds"][kind] = {
+                "rows": len(catalog[kind] or []),
+                "inserted": inserted,
+                "updated": updated,
+                "skipped": report["skipped"] - skipped_before,
+            }
+        if dry_run:
+            db.rollback()
+            return report
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    logger.info(f"Catalog import: {report['inserted']} inserted, {report['updated']} updated, {report['skipped']} skipped")
+    diseases = report["kinds"].get("diseases", {})
+    if diseases.get("inserted") or diseases.get("updated"):
+        # Predictions read disease info from the compiled store; its new version also
+        # retires the predictor's cached responses (the cache key includes it)
+        try:
+            report["disease_store_version"] = disease_store.rebuild(db).version
+        except Exception as e:
+            logger.error(f"Failed to rebuild disease store: {str(e)}")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    from app.core.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Bulk import symptoms/diseases from CSV or JSON")
+    parser.add_argument("path", help="Catalog file (.csv or .json)")
+    parser.add_argument("--kind", choices=KINDS, default=None, help="Required for CSV and bare JSON lists")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="Defaults to the file extension")
+    parser.add_argument("--on-conflict", choices=ON_CONFLICT, default="update",
+                        help="update existing rows (default) or leave them as they are")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and count, then roll back")
+    args = parser.parse_args()
+
+    file_format = args.format or os.path.splitext(args.path)[1].lstrip(".").lower()
+    with open(args.path, "rb") as f:
+        parsed = parse_catalog(f.read(), file_format, args.kind)
+    session = SessionLocal()
+    try:
+        print(json.dumps(import_catalog(session, parsed, on_conflict=args.on_conflict, dry_run=args.dry_run), indent=2))
+    finally:
+        session.close()
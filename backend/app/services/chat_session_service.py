@@ -0,0 +1,206 @@
+"""
+Chat Session Service
+Keeps chat history on the server so clients only send a session id and the
+new message on each turn instead of re-uploading the whole conversation.
+Sessions started by a logged-in user belong to that user; anonymous sessions
+are usable by whoever holds the id.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import update, or_
+from typing import List, Dict, Optional, Tuple
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import secrets
+import threading
+import logging
+
+from app.core.config import settings
+from app.core.metrics import record_cache
+from app.models.chat_session import ChatSession
+
+logger = logging.getLogger(__name__)
+
+# Compact on-disk role codes
+_ROLE_TO_CODE = {"user": "u", "assistant": "a"}
+_CODE_TO_ROLE = {code: role for role, code in _ROLE_TO_CODE.items()}
+
+
+class ChatSessionConflict(Exception):
+    """The session kept changing under an append (concurrent turns from other workers)"""
+
+
+class _SessionCache:
+    """Small thread-safe LRU of session_id -> (turn, expires_at, messages, user_id)"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict[str, Tuple[int, datetime, list, Optional[int]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Tuple[int, datetime, list, Optional[int]]]:
+        with self._lock:
+            entry = self._items.get(session_id)
+            if entry is None:
+                record_cache("chat_session", False)
+                return None
+            if entry[1] <= datetime.utcnow():
+                del self._items[session_id]
+                record_cache("chat_session", False)
+                return None
+            self._items.move_to_end(session_id)
+            record_cache("chat_session", True)
+            return entry
+
+    def put(self, session_id: str, turn: int, expires_at: datetime, messages: list, user_id: Optional[int]):
+        with self._lock:
+            self._items[session_id] = (turn, expires_at, messages, user_id)
+            self._items.move_to_end(session_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def discard(self, session_id: str):
+        with self._lock:
+            self._items.pop(session_id, None)
+
+
+_cache = _SessionCache(settings.CHAT_SESSION_CACHE_SIZE)
+
+
+def _expiry() -> datetime:
+    return datetime.utcnow() + timedelta(minutes=settings.CHAT_SESSION_TTL_MINUTES)
+
+
+def to_history(messages: list) -> List[Dict[str, str]]:
+    """Expand compact [code, content] pairs into LLM-style message dicts"""
+    return [
+        {"role": _CODE_TO_ROLE.get(code, "user"), "content": content}
+        for code, content in messages
+    ]
+
+
+def _load_entry(db: Session, session_id: str, user_id: Optional[int]) -> Optional[Tuple[int, datetime, list, Optional[int]]]:
+    """(turn, expires_at, messages, owner id) of a live session user_id may use, cache first"""
+    entry = _cache.get(session_id)
+    if entry is None:
+        chat_session = db.query(ChatSession).filter(
+            ChatSession.id == session_id,
+            ChatSession.expires_at > datetime.utcnow()
+        ).first()
+
+        if not chat_session:
+            return None
+
+        entry = (chat_session.turn, chat_session.expires_at, list(chat_session.messages or []), chat_session.user_id)
+        _cache.put(session_id, *entry)
+
+    if entry[3] is not None and entry[3] != user_id:
+        return None
+    return entry
+
+
+class ChatSessionService:
+
+    @staticmethod
+    def create_session(db: Session, user_id: Optional[int] = None) -> ChatSession:
+        """Create an empty chat session (owned by user_id, if given) and purge expired ones"""
+        ChatSessionService.purge_expired(db)
+
+        chat_session = ChatSession(
+            id=secrets.token_urlsafe(16),
+            user_id=user_id,
+            messages=[],
+            turn=0,
+            expires_at=_expiry()
+        )
+        db.add(chat_session)
+        db.commit()
+        db.refresh(chat_session)
+
+        _cache.put(chat_session.id, 0, chat_session.expires_at, [], user_id)
+        return chat_session
+
+    @staticmethod
+    def load(db: Session, session_id: str, user_id: Optional[int] = None) -> Optional[Tuple[int, datetime, list]]:
+        """
+        Return (turn, expires_at, compact messages) for a live session.
+        Served from the in-process cache when possible, otherwise from the database.
+        Returns None if the session does not exist, has expired or belongs to
+        a user other than user_id.
+        """
+        entry = _load_entry(db, session_id, user_id)
+        return entry[:3] if entry is not None else None
+
+    @staticmethod
+    def append_turn(
+        db: Session,
+        session_id: str,
+        user_message: str,
+        assistant_message: str,
+        user_id: Optional[int] = None
+    ) -> Optional[Tuple[int, datetime, list]]:
+        """
+        Append a user/assistant exchange, trim to CHAT_SESSION_MAX_MESSAGES and
+        slide the expiry window. Uses the turn counter as an optimistic lock so a
+        stale cache entry in this worker never overwrites another worker's write.
+        Returns the new (turn, expires_at, messages) or None if the session is gone
+        (or belongs to another user);
+        raises ChatSessionConflict when every retry lost the race.
+        """
+        new_pairs = [
+            [_ROLE_TO_CODE["user"], user_message],
+            [_ROLE_TO_CODE["assistant"], assistant_message],
+        ]
+
+        for _attempt in range(3):
+            entry = _load_entry(db, session_id, user_id)
+            if entry is None:
+                return None
+
+            turn, _expires_at, messages, owner_id = entry
+            messages = (messages + new_pairs)[-settings.CHAT_SESSION_MAX_MESSAGES:]
+            expires_at = _expiry()
+
+            result = db.execute(
+                update(ChatSession)
+                .where(ChatSession.id == session_id, ChatSession.turn == turn)
+                .values(
+                    messages=messages,
+                    turn=turn + 1,
+                    expires_at=expires_at,
+                    updated_at=datetime.utcnow()
+                )
+            )
+            db.commit()
+
+            if result.rowcount == 1:
+                _cache.put(session_id, turn + 1, expires_at, messages, owner_id)
+                return turn + 1, expires_at, messages
+
+            # Another worker appended first; reload from the database and retry
+            logger.info(f"Chat session {session_id} changed concurrently, retrying append")
+            _cache.discard(session_id)
+
+        logger.warning(f"Giving up appending to chat session {session_id} after concurrent updates")
+        raise ChatSessionConflict(session_id)
+
+    @staticmethod
+    def delete_session(db: Session, session_id: str, user_id: Optional[int] = None) -> bool:
+        """Delete a chat session (anonymous or owned by user_id). Returns True if a row was removed"""
+        _cache.discard(session_id)
+        count = db.query(ChatSession).filter(
+            ChatSession.id == session_id,
+            or_(ChatSession.user_id.is_(None), ChatSession.user_id == user_id)
+        ).delete()
+        db.commit()
+        return count > 0
+
+    @staticmethod
+    def purge_expired(db: Session) -> int:
+        """Delete all expired chat sessions"""
+        count = db.query(ChatSession).filter(
+            ChatSession.expires_at <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.commit()
+        if count:
+            logger.info(f"Purged {count} expired chat sessions")
+        return count
@@ -0,0 +1,336 @@
+"""
+Disease Knowledge Store
+Compiles disease information (precautions, recommendations, description,
+severity) from every source we have into one immutable, versioned index:
+
+1. app/data/disease_info.json   - base entries with recommendations and Hindi variants
+2. backend/seed_data.py         - seed script used for fresh databases
+3. database/seeds/diseases.sql  - SQL seed file
+4. the `diseases` table         - admin-managed rows (highest precedence)
+
+The index is pickled to DISEASE_STORE_PATH, loaded once per process and
+hot-reloaded when a new version is written.
+
+Build from the command line (from the backend directory):
+    python -m app.services.disease_store            # seeds + database
+    python -m app.services.disease_store --no-db    # seeds only
+"""
+import ast
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional
+
+from app.core.config import settings, BACKEND_DIR, resolve_backend_path
+
+logger = logging.getLogger(__name__)
+
+STORE_FORMAT = 1
+DEFAULT_LANGUAGE = "en"
+
+BASE_INFO_PATH = os.path.join(BACKEND_DIR, "app", "data", "disease_info.json")
+SEED_SCRIPT_PATH = os.path.join(BACKEND_DIR, "seed_data.py")
+SEED_SQL_PATH = os.path.join(os.path.dirname(BACKEND_DIR), "database", "seeds", "diseases.sql")
+
+_EMPTY = MappingProxyType({"description": None, "severity": None, "precautions": (), "recommendations": ()})
+
+
+def resolve_store_path(path: Optional[str] = None) -> str:
+    return resolve_backend_path(path or settings.DISEASE_STORE_PATH)
+
+
+class DiseaseStore:
+    """Immutable compiled index of disease info keyed by (name, language)"""
+
+    __slots__ = ("version", "built_at", "_entries")
+
+    def __init__(self, version: str, built_at: str, entries: Dict[str, Dict[str, dict]]):
+        self.version = version
+        self.built_at = built_at
+        self._entries = {
+            name: {
+                language: MappingProxyType(record)
+                for language, record in languages.items()
+            }
+            for name, languages in entries.items()
+        }
+
+    def get(self, name: str, language: str = DEFAULT_LANGUAGE) -> Mapping:
+        """Return the record for a disease, falling back to English, then to an empty record"""
+        languages = self._entries.get(name)
+        if not languages:
+            return _EMPTY
+        return languages.get(language) or languages.get(DEFAULT_LANGUAGE) or _EMPTY
+
+    def names(self) -> List[str]:
+        return list(self._entries)
+
+    def languages(self, name: str) -> List[str]:
+        return list(self._entries.get(name, {}))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+
+# ---------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------
+
+def _load_base_info(path: str = BASE_INFO_PATH) -> Dict[str, Dict[str, dict]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _load_seed_script(path: str = SEED_SCRIPT_PATH) -> List[dict]:
+    """Read the `diseases_data` literal from seed_data.py without executing it"""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "diseases_data" for target in node.targets
+        ):
+            return ast.literal_eval(node.value)
+    return []
+
+
+_SQL_COLUMNS_RE = re.compile(r"INSERT\s+INTO\s+diseases\s*\(([^)]*)\)\s*VALUES", re.IGNORECASE)
+_SQL_STRING_RE = re.compile(r"'((?:[^']|'')*)'")
+_SQL_ROW_RE = re.compile(r"\(\s*('(?:[^']|'')*'(?:\s*,\s*'(?:[^']|'')*')*)\s*\)", re.DOTALL)
+
+
+def _load_seed_sql(path: str = SEED_SQL_PATH) -> List[dict]:
+    """Parse the VALUES rows of database/seeds/diseases.sql"""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        sql = f.read()
+
+    header = _SQL_COLUMNS_RE.search(sql)
+    if not header:
+        return []
+    columns = [column.strip() for column in header.group(1).split(",")]
+
+    rows = []
+    for row in _SQL_ROW_RE.finditer(sql, header.end()):
+        values = [value.replace("''", "'") for value in _SQL_STRING_RE.findall(row.group(1))]
+        if len(values) != len(columns):
+            continue
+        record = dict(zip(columns, values))
+        if "precautions" in record:
+            try:
+                record["precautions"] = json.loads(record["precautions"])
+            except ValueError:
+                record["precautions"] = None
+        rows.append(record)
+    return rows
+
+
+def _load_database(db) -> List[dict]:
+    from app.models.models import Disease
+
+    return [
+        {
+            "name": disease.name,
+            "description": disease.description,
+            "severity": disease.severity,
+            "precautions": disease.precautions,
+        }
+        for disease in db.query(Disease).all()
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Compilation
+# ---------------------------------------------------------------------------
+
+def _merge_row(entries: Dict[str, Dict[str, dict]], row: dict):
+    """Overlay English fields from a seed/database row onto the entries"""
+    name = row.get("name")
+    if not name:
+        return
+    english = entries.setdefault(name, {}).setdefault(DEFAULT_LANGUAGE, {})
+    for field in ("description", "severity", "precautions"):
+        value = row.get(field)
+        if value:
+            english[field] = value
+
+
+def _normalize(entries: Dict[str, Dict[str, dict]]) -> Dict[str, Dict[str, dict]]:
+    """Fill every language record with all fields (English fallback) as immutable values"""
+    normalized = {}
+    for name in sorted(entries):
+        languages = entries[name]
+        english = languages.get(DEFAULT_LANGUAGE, {})
+        normalized[name] = {}
+        for language in sorted(languages):
+            record = languages[language]
+            normalized[name][language] = {
+                "description": record.get("description") or english.get("description"),
+                "severity": record.get("severity") or english.get("severity"),
+                "precautions": tuple(record.get("precautions") or english.get("precautions") or ()),
+                "recommendations": tuple(record.get("recommendations") or english.get("recommendations") or ()),
+            }
+    return normalized
+
+
+def compile_entries(db=None) -> Dict[str, Dict[str, dict]]:
+    """Merge all sources, lowest precedence first"""
+    entries = _load_base_info()
+    for row in _load_seed_script():
+        _merge_row(entries, row)
+    for row in _load_seed_sql():
+        _merge_row(entries, row)
+    if db is not None:
+        for row in _load_database(db):
+            _merge_row(entries, row)
+    return _normalize(entries)
+
+
+def build_store(db=None) -> DiseaseStore:
+    entries = compile_entries(db)
+    digest = hashlib.sha256(
+        json.dumps(entries, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    return DiseaseStore(digest[:12], datetime.utcnow().isoformat(), entries)
+
+
+def save_store(store: DiseaseStore, path: Optional[str] = None) -> str:
+    """Atomically write the compiled store"""
+    path = resolve_store_path(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = {
+        "format": STORE_FORMAT,
+        "version": store.version,
+        "built_at": store.built_at,
+        "entries": {
+            name: {language: dict(record) for language, record in store._entries[name].items()}
+            for name in store.names()
+        },
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_store(path: Optional[str] = None) -> DiseaseStore:
+    with open(resolve_store_path(path), "rb") as f:
+        payload = pickle.load(f)
+    if payload.get("format") != STORE_FORMAT:
+        raise ValueError(f"Unsupported disease store format: {payload.get('format')}")
+    return DiseaseStore(payload["version"], payload["built_at"], payload["entries"])
+
+
+# ---------------------------------------------------------------------------
+# Process-wide holder with hot reload
+# ---------------------------------------------------------------------------
+
+class DiseaseStoreHolder:
+    """
+    Holds the active DiseaseStore. Reading `current` is a plain attribute access;
+    at most every `reload_interval` seconds it stats the store file and swaps in
+    a new version if one was written (e.g. by another worker or the CLI).
+    """
+
+    def __init__(self, path: Optional[str] = None, reload_interval: float = 30.0):
+        self.path = resolve_store_path(path)
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._store = self._initial_store()
+
+    def _initial_store(self) -> DiseaseStore:
+        try:
+            store = load_store(self.path)
+            self._mtime = os.path.getmtime(self.path)
+            logger.info(f"Loaded disease store {store.version} ({len(store)} diseases)")
+            return store
+        except FileNotFoundError:
+            logger.info("No compiled disease store found, compiling from seed files")
+        except Exception as e:
+            logger.error(f"Failed to load disease store, compiling from seed files: {str(e)}")
+        return build_store()
+
+    @property
+    def current(self) -> DiseaseStore:
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.reload_interval
+            self.reload_if_changed()
+        return self._store
+
+    def reload_if_changed(self) -> bool:
+        """Swap in the on-disk store if the file changed. Returns True on swap"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+
+        with self._lock:
+            if mtime == self._mtime:
+                return False
+            try:
+                store = load_store(self.path)
+            except Exception as e:
+                logger.error(f"Failed to reload disease store: {str(e)}")
+                return False
+            self._mtime = mtime
+            if store.version == self._store.version:
+                return False
+            logger.info(f"Disease store reloaded: {self._store.version} -> {store.version}")
+            self._store = store
+            return True
+
+    def rebuild(self, db=None) -> DiseaseStore:
+        """Compile from all sources, persist and activate the new store"""
+        store = build_store(db)
+        with self._lock:
+            try:
+                save_store(store, self.path)
+                self._mtime = os.path.getmtime(self.path)
+            except OSError as e:
+                logger.warning(f"Could not persist disease store, keeping it in memory only: {str(e)}")
+            self._store = store
+        logger.info(f"Disease store rebuilt: {store.version} ({len(store)} diseases)")
+        return store
+
+
+disease_store = DiseaseStoreHolder(reload_interval=settings.DISEASE_STORE_RELOAD_SECONDS)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile the disease knowledge store")
+    parser.add_argument("--no-db", action="store_true", help="Only use seed files, skip the diseases table")
+    parser.add_argument("--output", default=None, help="Output path (defaults to DISEASE_STORE_PATH)")
+    args = parser.parse_args()
+
+    db = None
+    if not args.no_db:
+        from app.core.database import SessionLocal
+        db = SessionLocal()
+    try:
+        compiled = build_store(db)
+    finally:
+        if db is not None:
+            db.close()
+
+    output = save_store(compiled, args.output)
+    print(f"Disease store {compiled.version}: {len(compiled)} diseases -> {output}")
@@ -0,0 +1,186 @@
+"""
+Admin Bulk Export
+Streams whole tables (predictions, feedback, users) as CSV or NDJSON,
+optionally gzip-compressed, for /api/admin/export/{table}.
+
+Each export is a single joined SELECT read through a server-side cursor
+(yield_per -> stream_results on PostgreSQL) and encoded row by row into a
+generator, so memory stays flat however large the table is. Encoded rows
+are buffered into ~64 KiB chunks before being handed to the response.
+"""
+import csv
+import io
+import json
+import logging
+import zlib
+from datetime import date, datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import func, select
+
+from app.core.database import SessionLocal
+from app.models.models import User, Prediction, Feedback
+
+logger = logging.getLogger(__name__)
+
+TABLES = ("predictions", "feedback", "users")
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+YIELD_PER = 2000
+CHUNK_BYTES = 64 * 1024
+
+
+def _predictions_query():
+    return select(
+        Prediction.id,
+        Prediction.user_id,
+        User.email.label("user_email"),
+        User.full_name.label("user_name"),
+        Prediction.symptoms,
+        Prediction.symptoms_text,
+        Prediction.predicted_disease_name.label("predicted_disease"),
+        Prediction.confidence_score,
+        Prediction.created_at,
+        Prediction.additional_info,
+        Feedback.id.label("feedback_id"),
+        Feedback.is_accurate,
+        Feedback.rating,
+    ).outerjoin(User, User.id == Prediction.user_id).outerjoin(
+        Feedback, Feedback.prediction_id == Prediction.id
+    ).order_by(Prediction.id)
+
+
+def _feedback_query():
+    return select(
+        Feedback.id,
+        Feedback.prediction_id,
+        User.email.label("user_email"),
+        User.full_name.label("user_name"),
+        Prediction.predicted_disease_name.label("predicted_disease"),
+        Prediction.confidence_score,
+        Feedback.is_accurate,
+        Feedback.rating,
+        Feedback.actual_diagnosis,
+        Feedback.comments,
+        Feedback.created_at,
+    ).outerjoin(Prediction, Prediction.id == Feedback.prediction_id).outerjoin(
+        User, User.id == Prediction.user_id
+    ).order_by(Feedback.id)
+
+
+def _users_query():
+    counts = select(
+        Prediction.user_id, func.count(Prediction.id).label("prediction_count")
+    ).group_by(Prediction.user_id).subquery()
+    return select(
+        User.id,
+        User.email,
+        User.full_name,
+        User.age,
+        User.gender,
+        User.is_active,
+        User.is_admin,
+        User.created_at,
+        func.coalesce(counts.c.prediction_count, 0).label("prediction_count"),
+    ).outerjoin(counts, counts.c.user_id == User.id).order_by(User.id)
+
+
+QUERIES: Dict[str, Callable] = {
+    "predictions": _predictions_query,
+    "feedback": _feedback_query,
+    "users": _users_query,
+}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    return value
+
+
+def encode_rows(rows: Iterator, columns: List[str], file_format: str) -> Iterator[str]:
+    """Stream rows as CSV (with a header line) or NDJSON, one string per row"""
+    if file_format == "ndjson":
+        dumps = json.JSONEncoder(default=_json_default).encode
+        for row in rows:
+            yield dumps(dict(zip(columns, row))) + "\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _chunked(lines: Iterator[str], compress: bool) -> Iterator[bytes]:
+    # wbits=31 -> gzip container, so the output is a plain .gz file
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    pending: List[bytes] = []
+    size = 0
+    for line in lines:
+        data = line.encode("utf-8")
+        pending.append(data)
+        size += len(data)
+        if size >= CHUNK_BYTES:
+            chunk = b"".join(pending)
+            pending, size = [], 0
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+    chunk = b"".join(pending)
+    if compressor is not None:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def stream_export(table: str, file_format: str = "csv", compress: bool = False) -> Iterator[bytes]:
+    """
+    Encoded export of a table as a byte generator.
+    Opens its own session, since the response body is produced after the
+    request's dependencies have been torn down.
+    """
+    if table not in QUERIES:
+        raise ValueError(f"table must be one of {TABLES}")
+    if file_format not in FORMATS:
+        raise ValueError(f"format must be one of {tuple(FORMATS)}")
+
+    db = SessionLocal()
+    exported = 0
+    try:
+        result = db.execute(QUERIES[table]().execution_options(yield_per=YIELD_PER))
+        columns = list(result.keys())
+
+        def rows():
+            nonlocal exported
+            for row in result:
+                exported += 1
+                yield row
+
+        yield from _chunked(encode_rows(rows(), columns, file_format), compress)
+        logger.info(f"Exported {exported} {table} rows as {file_format}{' (gzip)' if compress else ''}")
+    except Exception as e:
+        logger.error(f"Export of {table} failed after {exported} rows: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+
+def export_filename(table: str, file_format: str, compress: bool, now: Optional[datetime] = None) -> str:
+    stamp = (now or datetime.utcnow()).strftime("%Y%m%d-%H%M%S")
+    return f"{table}_{stamp}.{file_format}{'.gz' if compress else ''}"
@@ -0,0 +1,357 @@
+"""
+Feature Store Export
+Streams the predictions table (joined with feedback) into columnar training
+files, one partition per day:
+
+    <out>/date=2024-06-01/part-0.parquet
+    <out>/_manifest.json
+
+Rows are read through a server-side cursor in fixed-size chunks. Each chunk
+becomes one Parquet row group (or Arrow record batch), so memory stays
+bounded however many rows a day has. Symptoms are one-hot encoded as uint8
+columns in feature_names.json order. The `disease` label is the user's
+actual diagnosis, or the served prediction when it was confirmed accurate,
+so the files line up with ml-model/src/train.py's columns.
+
+Runs are incremental: days that were complete (before today, UTC) when they
+were exported are skipped on the next run, unless feedback for one of their
+predictions arrived since (the manifest keeps a feedback id watermark, with
+the stats rollups' commit lag); those days are exported again so late labels
+reach the files. Point FEATURE_EXPORT_DATABASE_URL at a read replica to keep
+the load off the API database.
+
+Requires pyarrow. From the backend directory:
+    python -m app.services.feature_export --out ../ml-model/data/features
+    python -m app.services.feature_export --out exports --since 2024-01-01 --format arrow
+"""
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.models.models import Feedback, Prediction
+from app.services.ml_service import predictor
+from app.services.model_registry import model_registry
+from app.services.stats_service import COMMIT_LAG_SECONDS
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "_manifest.json"
+FORMATS = {"parquet": "parquet", "arrow": "arrow"}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Feature export requires pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+class SymptomEncoder:
+    """Maps stored symptom lists to a uint8 matrix in feature_names.json order"""
+
+    def __init__(self, feature_names: List[str]):
+        self.feature_names = list(feature_names)
+        self.feature_index = {name: i for i, name in enumerate(self.feature_names)}
+
+    def encode(self, symptom_lists: List[Optional[list]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (features, count of symptoms outside the feature space) per row"""
+        features = np.zeros((len(symptom_lists), len(self.feature_names)), dtype=np.uint8)
+        unmapped = np.zeros(len(symptom_lists), dtype=np.int16)
+        for row, symptoms in enumerate(symptom_lists):
+            mask, other = predictor.canonicalize([str(s) for s in (symptoms or [])])
+            for name in predictor.decode(mask, other):
+                index = self.feature_index.get(name.replace(" ", "_"))
+                if index is None:
+                    unmapped[row] += 1
+                else:
+                    features[row, index] = 1
+        return features, unmapped
+
+
+def _label(actual: Optional[str], is_accurate: Optional[bool], served: Optional[str]) -> Optional[str]:
+    if actual:
+        return actual.strip()
+    if is_accurate:
+        return served
+    return None
+
+
+def _int_or_none(value) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class FeatureExporter:
+    def __init__(self, out_dir: str, feature_names: List[str], chunk_size: int = 5000,
+                 file_format: str = "parquet", pause_seconds: float = 0.0):
+        if file_format not in FORMATS:
+            raise ValueError(f"Unsupported export format: {file_format}")
+        self.pa = _require_pyarrow()
+        self.out_dir = out_dir
+        self.encoder = SymptomEncoder(feature_names)
+        self.chunk_size = chunk_size
+        self.file_format = file_format
+        self.pause_seconds = pause_seconds
+        self.schema = self._schema()
+
+    # -- manifest -----------------------------------------------------------
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.out_dir, MANIFEST_FILE)
+
+    def load_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {"feature_names": self.encoder.feature_names, "partitions": {}}
+        if manifest.get("feature_names") != self.encoder.feature_names:
+            raise ValueError(
+                "Existing export was written with different feature_names; use a new --out directory"
+            )
+        return manifest
+
+    def _save_manifest(self, manifest: Dict):
+        os.makedirs(self.out_dir, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    # -- schema & rows ------------------------------------------------------
+
+    def _schema(self):
+        pa = self.pa
+        fields = [
+            pa.field("prediction_id", pa.int64()),
+            pa.field("created_at", pa.timestamp("us")),
+            pa.field("model_version", pa.string()),
+            pa.field("predicted_disease", pa.string()),
+            pa.field("confidence", pa.float32()),
+            pa.field("age", pa.int16()),
+            pa.field("gender", pa.string()),
+            pa.field("duration_days", pa.int16()),
+            pa.field("language", pa.string()),
+            pa.field("n_unmapped_symptoms", pa.int16()),
+            pa.field("feedback_is_accurate", pa.bool_()),
+            pa.field("feedback_rating", pa.int8()),
+            pa.field("actual_diagnosis", pa.string()),
+            pa.field("disease", pa.string()),
+        ]
+        fields += [pa.field(name, pa.uint8()) for name in self.encoder.feature_names]
+        return pa.schema(fields)
+
+    @staticmethod
+    def _query(start: datetime, end: datetime):
+        return select(
+            Prediction.id,
+            Prediction.created_at,
+            Prediction.symptoms,
+            Prediction.predicted_disease_name,
+            Prediction.confidence_score,
+            Prediction.additional_info,
+            Feedback.is_accurate,
+            Feedback.rating,
+            Feedback.actual_diagnosis,
+        ).outerjoin(Feedback, Feedback.prediction_id == Prediction.id).where(
+            Prediction.created_at >= start,
+            Prediction.created_at < end
+        ).order_by(Prediction.id)
+
+    def _to_batch(self, rows):
+        pa = self.pa
+        infos = [row.additional_info if isinstance(row.additional_info, dict) else {} for row in rows]
+        features, unmapped = self.encoder.encode([row.symptoms for row in rows])
+        columns = [
+            pa.array([row.id for row in rows], pa.int64()),
+            pa.array([row.created_at for row in rows], pa.timestamp("us")),
+            pa.array([info.get("model_version") for info in infos], pa.string()),
+            pa.array([row.predicted_disease_name for row in rows], pa.string()),
+            pa.array([row.confidence_score for row in rows], pa.float32()),
+            pa.array([_int_or_none(info.get("age")) for info in infos], pa.int16()),
+            pa.array([info.get("gender") for info in infos], pa.string()),
+            pa.array([_int_or_none(info.get("duration_days")) for info in infos], pa.int16()),
+            pa.array([info.get("language") for info in infos], pa.string()),
+            pa.array(unmapped, pa.int16()),
+            pa.array([row.is_accurate for row in rows], pa.bool_()),
+            pa.array([_int_or_none(row.rating) for row in rows], pa.int8()),
+            pa.array([row.actual_diagnosis for row in rows], pa.string()),
+            pa.array([
+                _label(row.actual_diagnosis, row.is_accurate, row.predicted_disease_name) for row in rows
+            ], pa.string()),
+        ]
+        columns += [pa.array(features[:, i], pa.uint8()) for i in range(features.shape[1])]
+        return pa.RecordBatch.from_arrays(columns, schema=self.schema)
+
+    def _stream(self, db: Session, start: datetime, end: datetime) -> Iterator[list]:
+        # yield_per turns on a server-side cursor (stream_results) on PostgreSQL
+        result = db.execute(self._query(start, end).execution_options(yield_per=self.chunk_size))
+        for rows in result.partitions(self.chunk_size):
+            yield rows
+            if self.pause_seconds:
+                time.sleep(self.pause_seconds)
+
+    # -- export -------------------------------------------------------------
+
+    def _open_writer(self, path: str):
+        if self.file_format == "parquet":
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(path, self.schema, compression="zstd")
+        import pyarrow.ipc as ipc
+        return ipc.new_file(path, self.schema)
+
+    def export_day(self, db: Session, day: date) -> int:
+        """Write one day's partition atomically. Returns the row count"""
+        start = datetime.combine(day, datetime.min.time())
+        partition_dir = os.path.join(self.out_dir, f"date={day.isoformat()}")
+        path = os.path.join(partition_dir, f"part-0.{FORMATS[self.file_format]}")
+        tmp_path = f"{path}.tmp"
+
+        writer = None
+        rows_written = 0
+        try:
+            for rows in self._stream(db, start, start + timedelta(days=1)):
+                if writer is None:
+                    os.makedirs(partition_dir, exist_ok=True)
+                    writer = self._open_writer(tmp_path)
+                if self.file_format == "parquet":
+                    writer.write_batch(self._to_batch(rows))
+                else:
+                    writer.write(self._to_batch(rows))
+                rows_written += len(rows)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is not None:
+            os.replace(tmp_path, path)
+        elif os.path.exists(path):
+            os.remove(path)  # the day's rows were deleted since the last export
+        return rows_written
+
+    def _first_day(self, db: Session) -> Optional[date]:
+        first = db.query(func.min(Prediction.created_at)).scalar()
+        return first.date() if first else None
+
+    @staticmethod
+    def _reopen_days_with_new_feedback(db: Session, manifest: Dict) -> int:
+        """Mark partitions whose predictions got feedback since the last run incomplete"""
+        watermark = manifest.get("feedback_watermark", 0)
+        cutoff = datetime.utcnow() - timedelta(seconds=COMMIT_LAG_SECONDS)
+        latest = db.query(func.max(Feedback.id)).filter(
+            Feedback.id > watermark,
+            Feedback.created_at <= cutoff
+        ).scalar()
+        if not latest:
+            return 0
+
+        days = db.query(func.date(Prediction.created_at)).join(
+            Feedback, Feedback.prediction_id == Prediction.id
+        ).filter(Feedback.id > watermark, Feedback.id <= latest).distinct().all()
+        reopened = 0
+        for (day,) in days:
+            info = manifest["partitions"].get(str(day)[:10])
+            if info is not None and info.get("complete"):
+                info["complete"] = False
+                reopened += 1
+        manifest["feedback_watermark"] = latest
+        return reopened
+
+    def run(self, db: Session, since: Optional[date] = None, until: Optional[date] = None,
+            force: bool = False) -> Dict:
+        """Export every day in [since, until] that is not already complete"""
+        manifest = self.load_manifest()
+        partitions = manifest["partitions"]
+        reopened = self._reopen_days_with_new_feedback(db, manifest)
+        if reopened:
+            logger.info(f"{reopened} exported days got new feedback and will be exported again")
+            self._save_manifest(manifest)
+        today = datetime.utcnow().date()
+        until = min(until or today, today)
+        if since is None:
+            # Resume from the earliest incomplete day, or the day after the last complete one
+            starts = [date.fromisoformat(day) for day, info in partitions.items() if not info.get("complete")]
+            complete = sorted(day for day, info in partitions.items() if info.get("complete"))
+            if complete:
+                starts.append(date.fromisoformat(complete[-1]) + timedelta(days=1))
+            since = min(starts) if starts else self._first_day(db)
+        if since is None:
+            return {"exported_days": 0, "rows": 0, "skipped_days": 0, "reopened_days": reopened}
+
+        exported = skipped = total_rows = 0
+        day = since
+        while day <= until:
+            key = day.isoformat()
+            if partitions.get(key, {}).get("complete") and not force:
+                skipped += 1
+            else:
+                started = time.perf_counter()
+                rows = self.export_day(db, day)
+                partitions[key] = {
+                    "rows": rows,
+                    "complete": day < today,
+                    "format": self.file_format,
+                    "exported_at": datetime.utcnow().isoformat(),
+                }
+                # Persist after every day so an interrupted run resumes where it stopped
+                self._save_manifest(manifest)
+                exported += 1
+                total_rows += rows
+                if rows:
+                    logger.info(f"Exported {rows} rows for {key} in {time.perf_counter() - started:.1f}s")
+            day += timedelta(days=1)
+
+        self._save_manifest(manifest)
+        return {"exported_days": exported, "rows": total_rows, "skipped_days": skipped, "reopened_days": reopened}
+
+
+def export_session() -> Session:
+    """Session on FEATURE_EXPORT_DATABASE_URL (e.g. a read replica), else the API database"""
+    if settings.FEATURE_EXPORT_DATABASE_URL:
+        engine = create_engine(settings.FEATURE_EXPORT_DATABASE_URL, pool_pre_ping=True)
+        return sessionmaker(bind=engine)()
+    from app.core.database import SessionLocal
+    return SessionLocal()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export predictions + feedback as columnar training data")
+    parser.add_argument("--out", required=True, help="Output directory (one date=YYYY-MM-DD partition per day)")
+    parser.add_argument("--since", type=date.fromisoformat, default=None, help="First day (default: resume)")
+    parser.add_argument("--until", type=date.fromisoformat, default=None, help="Last day (default: today)")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per cursor fetch / row group")
+    parser.add_argument("--pause-ms", type=float, default=0, help="Sleep between chunks to throttle the database")
+    parser.add_argument("--model-version", default=None, help="Encode symptoms with this version's feature_names.json")
+    parser.add_argument("--force", action="store_true", help="Re-export days that are already complete")
+    args = parser.parse_args()
+
+    version, names = model_registry.read_feature_names(args.model_version)
+    exporter = FeatureExporter(
+        args.out, names,
+        chunk_size=args.chunk_size,
+        file_format=args.format,
+        pause_seconds=args.pause_ms / 1000
+    )
+    session = export_session()
+    try:
+        summary = exporter.run(session, since=args.since, until=args.until, force=args.force)
+    finally:
+        session.close()
+    print(json.dumps({"feature_version": version, **summary}, indent=2))
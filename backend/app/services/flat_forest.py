@@ -0,0 +1,69 @@
+"""
+Flat Forest
+Runtime for forests exported by ml-model/src/artifacts.py as flat .npy tree
+arrays. The arrays are memory-mapped read-only, so all uvicorn workers on a
+host share the same pages. Traversal walks all trees at once, one level per
+step, using numpy fancy indexing.
+"""
+import json
+import os
+from typing import Dict
+
+import numpy as np
+
+FLAT_FORMAT = 1
+FOREST_DIR = "forest"
+ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+
+class FlatForest:
+    """Drop-in for RandomForestClassifier.predict_proba over flattened trees"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], manifest: Dict):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.roots = np.asarray(arrays["roots"])
+        self.n_features_in_ = manifest["n_features"]
+        self.n_classes = manifest["n_classes"]
+        self.max_depth = manifest["max_depth"]
+        self.manifest = manifest
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Leaf index for every (row, tree)"""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            left = self.left[nodes]
+            internal = left != -1
+            if not internal.any():
+                break
+            go_left = X[rows, np.maximum(self.feature[nodes], 0)] <= self.threshold[nodes]
+            nodes = np.where(internal, np.where(go_left, left, self.right[nodes]), nodes)
+        return nodes
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.value[self.apply(X)].mean(axis=1)
+
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in ("feature", "threshold", "left", "right", "value", "roots"))
+
+
+def has_flat_forest(directory: str) -> bool:
+    return os.path.isfile(os.path.join(directory, FOREST_DIR, "manifest.json"))
+
+
+def load_flat_forest(directory: str, mmap: bool = True) -> FlatForest:
+    forest_dir = os.path.join(directory, FOREST_DIR)
+    with open(os.path.join(forest_dir, "manifest.json"), "r") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FLAT_FORMAT:
+        raise ValueError(f"Unsupported flat forest format: {manifest.get('format')}")
+    arrays = {
+        name: np.load(os.path.join(forest_dir, f"{name}.npy"), mmap_mode="r" if mmap else None, allow_pickle=False)
+        for name in ARRAYS
+    }
+    return FlatForest(arrays, manifest)
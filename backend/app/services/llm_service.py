@@ -5,8 +5,12 @@ Direct HTTP requests for maximum compatibility
 """
 import requests
 from app.core.config import settings
+from app.core.metrics import LLM_REQUEST_DURATION, LLM_TOKENS, LLM_ERRORS
+from app.schemas.schemas import AdditionalDetailsAnalysis
+from app.services.structured_output import parse_structured
 from typing import List, Dict, Optional
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +20,7 @@ class LLMService:
     
     def __init__(self):
         """Initialize Groq API configuration"""
-        self.api_url = "https://api.groq.com/openai/v1/chat/completions"
+        self.api_url = settings.GROQ_API_URL
         self.model = "llama-3.3-70b-versatile"  # Latest supported model
         logger.info("LLM Service initialized (using direct HTTP requests)")
     
@@ -33,7 +37,8 @@ class LLMService:
     async def generate_health_response(
         self,
         user_message: str,
-        chat_history: Optional[List[Dict[str, str]]] = None
+        chat_history: Optional[List[Dict[str, str]]] = None,
+        json_mode: bool = False
     ) -> str:
         """
         Generate health-related response using Groq LLM
@@ -41,6 +46,7 @@ class LLMService:
         Args:
             user_message: User's health question or symptom description
             chat_history: Optional list of previous messages for context
+            json_mode: Ask the API to constrain output to a JSON object
         
         Returns:
             AI-generated response text
@@ -78,23 +84,50 @@ class LLMService:
                 "max_tokens": 1024,
                 "top_p": 0.9,
             }
+            if json_mode:
+                payload["response_format"] = {"type": "json_object"}
+                payload["temperature"] = 0.2
             
             # Call Groq API via HTTP
-            response = requests.post(
-                self.api_url,
-                headers=self._get_headers(),
-                json=payload,
-                timeout=30
+            headers = self._get_headers()
+            started = time.perf_counter()
+            try:
+                response = requests.post(
+                    self.api_url,
+                    headers=headers,
+                    json=payload,
+                    timeout=30
+                )
+            except requests.RequestException as e:
+                LLM_REQUEST_DURATION.observe(time.perf_counter() - started, model=self.model, outcome="error")
+                LLM_ERRORS.inc(model=self.model, reason="timeout" if isinstance(e, requests.Timeout) else "connection")
+                raise
+            LLM_REQUEST_DURATION.observe(
+                time.perf_counter() - started, model=self.model, outcome="ok" if response.ok else "error"
             )
             
             # Check for errors
             if not response.ok:
                 error_detail = response.json() if response.text else {}
+                
+                # In JSON mode Groq rejects output that fails validation but still
+                # returns it; salvage it instead of paying for another completion
+                failed_generation = error_detail.get('error', {}).get('failed_generation') if json_mode else None
+                if failed_generation:
+                    LLM_ERRORS.inc(model=self.model, reason="json_validation")
+                    logger.warning("Groq JSON validation failed, using failed_generation for tolerant parsing")
+                    return failed_generation
+                
+                LLM_ERRORS.inc(model=self.model, reason=f"http_{response.status_code}")
                 logger.error(f"Groq API error: {response.status_code} - {error_detail}")
                 raise Exception(f"Groq API error: {response.status_code} - {error_detail.get('error', {}).get('message', 'Unknown error')}")
             
             # Parse response
             data = response.json()
+            usage = data.get('usage') or {}
+            for kind in ("prompt_tokens", "completion_tokens"):
+                if usage.get(kind):
+                    LLM_TOKENS.inc(usage[kind], model=self.model, kind=kind.split("_")[0])
             response_text = data['choices'][0]['message']['content']
             logger.info(f"Response generated successfully ({len(response_text)} chars)")
             
@@ -387,7 +420,7 @@ Analyze the text and extract:
   "additional_symptoms": ["symptom1", "symptom2"],
   "severity": "mild/moderate/severe with details",
   "context": "important background information",
-  "red_flags": ["warning1", "warning2"] or "None",
+  "red_flags": ["warning1", "warning2"] (empty list if none),
   "language_detected": "English/Hindi/Hinglish",
   "summary": "Brief summary in {language} language for display"
 }}
@@ -402,44 +435,31 @@ Analyze the text and extract:
             
             logger.info(f"Analyzing additional details: {additional_text[:100]}...")
             
-            # Get AI response
-            response = await self.generate_health_response(prompt)
+            # Get AI response constrained to a JSON object
+            response = await self.generate_health_response(prompt, json_mode=True)
             
-            # Try to parse JSON response
-            try:
-                # Extract JSON from response if it's wrapped in markdown
-                import json
-                import re
-                
-                # Remove markdown code blocks if present
-                json_match = re.search(r'```(?:json)?\s*(\{.*\})\s*```', response, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group(1)
-                else:
-                    # Try to find JSON object in response
-                    json_match = re.search(r'\{.*\}', response, re.DOTALL)
-                    json_str = json_match.group(0) if json_match else response
-                
-                analysis = json.loads(json_str)
-                
+            # Tolerant single-pass parse (handles fences, trailing prose and truncation)
+            analysis, outcome = parse_structured(response, AdditionalDetailsAnalysis)
+            if analysis is not None:
+                if outcome == "repaired":
+                    logger.info("Recovered truncated JSON analysis")
                 return {
                     "success": True,
-                    "analysis": analysis,
-                    "raw_response": response
-                }
-                
-            except Exception as parse_error:
-                logger.warning(f"Could not parse JSON response, returning raw: {parse_error}")
-                return {
-                    "success": True,
-                    "analysis": {
-                        "summary": response[:500],  # First 500 chars
-                        "additional_symptoms": [],
-                        "red_flags": "Check raw response"
-                    },
+                    "analysis": analysis.model_dump(),
                     "raw_response": response
                 }
             
+            logger.warning(f"Could not parse JSON response ({outcome}), returning raw: {response[:500]}")
+            return {
+                "success": True,
+                "analysis": {
+                    "summary": response[:500],  # First 500 chars
+                    "additional_symptoms": [],
+                    "red_flags": []
+                },
+                "raw_response": response
+            }
+            
         except Exception as e:
             logger.error(f"Error analyzing additional details: {str(e)}")
             return {
@@ -1,16 +1,114 @@
 import joblib
 import os
-from typing import List, Dict
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple, FrozenSet
 import numpy as np
+from app.core.config import settings
+from app.core.metrics import ML_INFERENCE_DURATION, record_cache
+from app.services.disease_store import disease_store
+from app.services.model_registry import model_registry
+from app.services.shadow_eval import shadow_evaluator
+
+# Rule-based predictions are used until a trained model version is activated
+# through the model registry (see app/services/model_registry.py)
+
+RULES_VERSION = "rules"
+
+
+class RuleEngine:
+    """Hand-written rules with the same interface as ModelEngine."""
+    version = RULES_VERSION
+    load_id = 0
+    
+    def predict(self, symptom_lower: List[str]) -> Tuple[str, float]:
+        """Simple rule-based prediction used when no trained model is active."""
+        if "fever" in symptom_lower and "cough" in symptom_lower:
+            if "loss of taste" in symptom_lower or "loss of smell" in symptom_lower:
+                return "COVID-19", 0.85
+            elif "body ache" in symptom_lower and "fatigue" in symptom_lower:
+                return "Flu (Influenza)", 0.78
+            else:
+                return "Common Cold", 0.72
+        elif "nausea" in symptom_lower or "vomiting" in symptom_lower or "diarrhea" in symptom_lower:
+            return "Gastroenteritis", 0.81
+        elif "headache" in symptom_lower and len(symptom_lower) <= 2:
+            return "Migraine", 0.69
+        else:
+            return "Common Cold", 0.65
+
+
+class _PredictionCache:
+    """Thread-safe bounded LRU of canonical request key -> prediction, with hit/miss counters"""
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: tuple) -> Optional[tuple]:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                record_cache("prediction", False)
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            record_cache("prediction", True)
+            return entry
+    
+    def put(self, key: tuple, value: tuple):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+def _age_band(age: Optional[int]) -> Optional[int]:
+    """Coarse age bucket used in the cache key (None, 0-12, 13-17, 18-39, 40-64, 65+)"""
+    if age is None:
+        return None
+    for band, upper in enumerate((12, 17, 39, 64)):
+        if age <= upper:
+            return band
+    return 4
 
-# This is a placeholder ML service
-# In production, you'll load your trained model
 
 class DiseasePredictor:
     def __init__(self):
-        self.model = None
+        self.registry = model_registry
+        self.rules = RuleEngine()
+        self.shadow = shadow_evaluator
         self.symptom_mapping = self._load_symptom_mapping()
-        self.disease_info = self._load_disease_info()
+        self.disease_store = disease_store
+        self.symptom_names = sorted(self.symptom_mapping, key=self.symptom_mapping.get)
+        self.aliases = self._build_aliases(self.symptom_mapping)
+        self.cache = _PredictionCache(settings.PREDICTION_CACHE_SIZE)
         
     def _load_symptom_mapping(self) -> Dict[str, int]:
         """Load symptom to index mapping."""
@@ -33,129 +131,101 @@ class DiseasePredictor:
             "chills": 14
         }
     
-    def _load_disease_info(self) -> Dict[str, dict]:
-        """Load disease information."""
-        return {
-            "Common Cold": {
-                "precautions": [
-                    "Get plenty of rest",
-                    "Stay hydrated",
-                    "Use over-the-counter cold medications",
-                    "Avoid close contact with others"
-                ],
-                "recommendations": [
-                    "Symptoms usually resolve within 7-10 days",
-                    "Consult a doctor if symptoms worsen",
-                    "Monitor for fever above 101°F"
-                ]
-            },
-            "Flu (Influenza)": {
-                "precautions": [
-                    "Get plenty of rest",
-                    "Stay home to avoid spreading",
-                    "Take antiviral medication if prescribed",
-                    "Keep warm and hydrated"
-                ],
-                "recommendations": [
-                    "See a doctor within 48 hours for antiviral treatment",
-                    "Monitor for breathing difficulties",
-                    "Recovery typically takes 1-2 weeks"
-                ]
-            },
-            "COVID-19": {
-                "precautions": [
-                    "Self-isolate immediately",
-                    "Get tested for confirmation",
-                    "Monitor oxygen levels",
-                    "Wear a mask around others"
-                ],
-                "recommendations": [
-                    "Consult healthcare provider for guidance",
-                    "Seek emergency care if breathing becomes difficult",
-                    "Inform close contacts"
-                ]
-            },
-            "Gastroenteritis": {
-                "precautions": [
-                    "Stay hydrated with clear fluids",
-                    "Eat bland foods (BRAT diet)",
-                    "Wash hands frequently",
-                    "Rest and avoid solid foods initially"
-                ],
-                "recommendations": [
-                    "Symptoms usually improve within 48 hours",
-                    "See a doctor if symptoms persist beyond 3 days",
-                    "Watch for signs of dehydration"
-                ]
-            },
-            "Migraine": {
-                "precautions": [
-                    "Rest in a dark, quiet room",
-                    "Apply cold compress to forehead",
-                    "Take prescribed migraine medication",
-                    "Avoid triggers (bright lights, loud sounds)"
-                ],
-                "recommendations": [
-                    "Keep a headache diary",
-                    "Consider preventive medications",
-                    "Consult a neurologist for chronic migraines"
-                ]
-            }
-        }
+    @staticmethod
+    def _build_aliases(symptom_mapping: Dict[str, int]) -> Dict[str, int]:
+        """Spelling variants (case, underscores, hyphens) -> bit, precomputed once"""
+        aliases = {}
+        for name, index in symptom_mapping.items():
+            bit = 1 << index
+            for variant in (name, name.replace(" ", "_"), name.replace(" ", "-"), name.replace(" ", "")):
+                aliases[variant] = bit
+                aliases[variant.title()] = bit
+                aliases[variant.upper()] = bit
+        return aliases
+    
+    def canonicalize(self, symptoms: List[str]) -> Tuple[int, FrozenSet[str]]:
+        """
+        Reduce a symptom list to (bitmask over symptom_mapping, other symptoms).
+        Order, case, spelling variants and duplicates all map to the same key.
+        """
+        mask = 0
+        other = None
+        aliases = self.aliases
+        for symptom in symptoms:
+            bit = aliases.get(symptom)
+            if bit is None:
+                normalized = " ".join(symptom.lower().replace("_", " ").split())
+                bit = aliases.get(normalized)
+                if bit is None:
+                    if normalized:
+                        other = other or set()
+                        other.add(normalized)
+                    continue
+            mask |= bit
+        return mask, frozenset(other) if other else frozenset()
+    
+    def decode(self, mask: int, other: FrozenSet[str] = frozenset()) -> List[str]:
+        """Canonical symptom names for a key, in symptom_mapping order"""
+        names = [name for index, name in enumerate(self.symptom_names) if mask >> index & 1]
+        return names + sorted(other)
     
-    def predict(self, symptoms: List[str], age: int = None, gender: str = None) -> Dict:
+    def predict(self, symptoms: List[str], age: int = None, gender: str = None, language: str = "en") -> Dict:
         """
         Make a disease prediction based on symptoms.
         
+        Results are memoized per (symptom bitmask, age band, gender, language)
+        and the loaded engine/disease-store versions, so repeated symptom combinations
+        cost a dictionary lookup.
+        
         Args:
             symptoms: List of symptom names
             age: Patient age (optional)
             gender: Patient gender (optional)
+            language: Language for precautions/recommendations ('en' or 'hi')
             
         Returns:
             Dictionary with prediction results
         """
-        # Simple rule-based prediction for demo
-        # In production, replace with actual ML model prediction
+        mask, other = self.canonicalize(symptoms)
         
-        symptom_lower = [s.lower() for s in symptoms]
+        # Take the active engine once so a concurrent swap cannot affect this request
+        engine = self.registry.active or self.rules
+        store = self.disease_store.current
+        # load_id, not just the name: a model reloaded under the same version must not reuse old results
+        key = (engine.version, engine.load_id, store.version, mask, other, _age_band(age), gender, language)
         
-        # Rule-based logic (simplified)
-        if "fever" in symptom_lower and "cough" in symptom_lower:
-            if "loss of taste" in symptom_lower or "loss of smell" in symptom_lower:
-                disease = "COVID-19"
-                confidence = 0.85
-            elif "body ache" in symptom_lower and "fatigue" in symptom_lower:
-                disease = "Flu (Influenza)"
-                confidence = 0.78
-            else:
-                disease = "Common Cold"
-                confidence = 0.72
-        elif "nausea" in symptom_lower or "vomiting" in symptom_lower or "diarrhea" in symptom_lower:
-            disease = "Gastroenteritis"
-            confidence = 0.81
-        elif "headache" in symptom_lower and len(symptom_lower) <= 2:
-            disease = "Migraine"
-            confidence = 0.69
-        else:
-            disease = "Common Cold"
-            confidence = 0.65
+        cached = self.cache.get(key)
+        if cached is None:
+            canonical = self.decode(mask, other)
+            started = time.perf_counter()
+            disease, confidence = engine.predict(canonical)
+            ML_INFERENCE_DURATION.observe(time.perf_counter() - started, model_version=engine.version)
+            disease_data = store.get(disease, language)
+            cached = (disease, confidence, tuple(disease_data["precautions"]), tuple(disease_data["recommendations"]))
+            self.cache.put(key, cached)
+        disease, confidence, precautions, recommendations = cached
         
-        disease_data = self.disease_info.get(disease, {})
+        # Candidate models score the same input off the request path
+        if self.shadow.active:
+            self.shadow.submit(self.decode(mask, other), engine.version, disease)
         
         return {
             "disease": disease,
             "confidence": confidence,
-            "precautions": disease_data.get("precautions", []),
-            "recommendations": disease_data.get("recommendations", [])
+            "precautions": list(precautions),
+            "recommendations": list(recommendations),
+            "model_version": engine.version
         }
+    
+    def cache_stats(self) -> Dict:
+        return self.cache.stats()
 
 
 # Global predictor instance
 predictor = DiseasePredictor()
 
 
-def predict_disease(symptoms: List[str], age: int = None, gender: str = None) -> Dict:
+def predict_disease(symptoms: List[str], age: int = None, gender: str = None, language: str = "en") -> Dict:
     """
     Wrapper function to make predictions.
     
@@ -163,8 +233,9 @@ def predict_disease(symptoms: List[str], age: int = None, gender: str = None) ->
         symptoms: List of symptom names
         age: Patient age (optional)
         gender: Patient gender (optional)
+        language: Language for precautions/recommendations (optional)
         
     Returns:
         Prediction results dictionary
     """
-    return predictor.predict(symptoms, age, gender)
+    return predictor.predict(symptoms, age, gender, language)
@@ -0,0 +1,431 @@
+"""
+Model Registry
+Versioned trained-model artifacts with background loading, warm-up and an
+atomic swap, so a retrained model can go live (or be rolled back) without a
+redeploy or blocking requests.
+
+Layout (written by ml-model/src/train.py):
+    <MODEL_REGISTRY_DIR>/<version>/disease_predictor.pkl
+                                   label_encoder.pkl
+                                   feature_names.json
+                                   metadata.json
+                                   forest/            (optional, flat mmap-able trees)
+                                   distilled.npz/json (optional, ml-model/src/distill.py)
+The flat files next to MODEL_PATH are exposed as the "legacy" version.
+
+With MODEL_ARTIFACT_MODE=auto (default) a version that has a forest/ export
+is memory-mapped instead of unpickled, so workers share its pages. A version
+with a distilled lookup table whose fidelity meets DISTILLED_MIN_FIDELITY is
+served from the table instead of walking the trees, as long as the table
+was built from the model file now on disk (source_checksum).
+"""
+import hashlib
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+
+from app.core.config import settings, resolve_backend_path
+from app.services.flat_forest import has_flat_forest, load_flat_forest
+
+logger = logging.getLogger(__name__)
+
+LEGACY_VERSION = "legacy"
+MODEL_FILE = "disease_predictor.pkl"
+ENCODER_FILE = "label_encoder.pkl"
+FEATURES_FILE = "feature_names.json"
+METADATA_FILE = "metadata.json"
+DISTILLED_FILE = "distilled.npz"
+DISTILLED_REPORT_FILE = "distilled.json"
+DISTILLED_FORMAT = 1
+ARTIFACT_MODES = ("auto", "mmap", "pickle")
+
+
+# Distinguishes engines loaded under the same version name (e.g. "legacy" after a retrain)
+_load_ids = itertools.count(1)
+
+# Training labels that differ from the names used by the disease store
+DISEASE_ALIASES = {"Flu": "Flu (Influenza)"}
+
+
+def source_checksum(path: str) -> str:
+    """sha256 of the model and label encoder files (ml-model/src/artifacts.py computes the same)"""
+    digest = hashlib.sha256()
+    for name in (MODEL_FILE, ENCODER_FILE):
+        with open(os.path.join(path, name), "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process (Linux), None where unavailable"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return round(resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class ModelEngine:
+    """A loaded, immutable model version ready to score symptom vectors"""
+
+    def __init__(self, version: str, model, label_encoder, feature_names: List[str], metadata: Dict):
+        self.version = version
+        self.model = model
+        self.feature_names = list(feature_names)
+        self.feature_index = {name: i for i, name in enumerate(self.feature_names)}
+        self.labels = [str(DISEASE_ALIASES.get(label, label)) for label in label_encoder.classes_]
+        self.metadata = metadata
+        self.loaded_at = datetime.utcnow().isoformat()
+        self.load_id = next(_load_ids)
+        self.load_stats: Dict = {}
+
+    @staticmethod
+    def feature_key(symptom: str) -> str:
+        return symptom.strip().lower().replace(" ", "_")
+
+    def vectorize(self, symptoms: List[str]) -> np.ndarray:
+        vector = np.zeros((1, len(self.feature_names)), dtype=np.float32)
+        for symptom in symptoms:
+            index = self.feature_index.get(self.feature_key(symptom))
+            if index is not None:
+                vector[0, index] = 1.0
+        return vector
+
+    def predict_vector(self, vector: np.ndarray) -> Tuple[str, float]:
+        probabilities = self.model.predict_proba(vector)[0]
+        best = int(np.argmax(probabilities))
+        return self.labels[best], round(float(probabilities[best]), 4)
+
+    def predict(self, symptoms: List[str]) -> Tuple[str, float]:
+        return self.predict_vector(self.vectorize(symptoms))
+
+    def warm_up(self, samples: int = 64, seed: int = 0) -> float:
+        """Score synthetic inputs so the first real request is not slow. Returns seconds taken"""
+        started = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        batch = (rng.random((samples, len(self.feature_names))) < 0.25).astype(np.float32)
+        self.model.predict_proba(batch)
+        for row in batch[:8]:
+            self.predict_vector(row.reshape(1, -1))
+        return time.perf_counter() - started
+
+
+class DistilledEngine(ModelEngine):
+    """
+    Serves predictions from a distilled lookup table keyed by the symptom
+    bitmask, falling back to a linear scorer for combinations that are not in
+    the table. The forest stays loaded for warm-up and batch scoring.
+    """
+
+    def __init__(self, version: str, model, label_encoder, feature_names: List[str], metadata: Dict,
+                 distilled, report: Dict):
+        super().__init__(version, model, label_encoder, feature_names, metadata)
+        self.report = report
+        self.exhaustive = report["mode"] == "exhaustive"
+        entries = [
+            (self.labels[label], round(float(confidence), 4))
+            for label, confidence in zip(distilled["labels"].tolist(), distilled["confidence"].tolist())
+        ]
+        if self.exhaustive:
+            self._table = entries
+        else:
+            self._table = {
+                int.from_bytes(key.tobytes(), "little"): entry
+                for key, entry in zip(distilled["keys"], entries)
+            }
+        self._weights = np.asarray(distilled["W"], dtype=np.float64)
+        self._bias = np.asarray(distilled["b"], dtype=np.float64)
+
+    def mask(self, symptoms: List[str]) -> int:
+        mask = 0
+        for symptom in symptoms:
+            index = self.feature_index.get(self.feature_key(symptom))
+            if index is not None:
+                mask |= 1 << index
+        return mask
+
+    def _predict_linear(self, mask: int) -> Tuple[str, float]:
+        indices = [i for i in range(len(self.feature_names)) if mask >> i & 1]
+        scores = self._bias + self._weights[indices].sum(axis=0)
+        probabilities = np.exp(scores - scores.max())
+        best = int(np.argmax(probabilities))
+        return self.labels[best], round(float(probabilities[best] / probabilities.sum()), 4)
+
+    def predict(self, symptoms: List[str]) -> Tuple[str, float]:
+        mask = self.mask(symptoms)
+        if self.exhaustive:
+            return self._table[mask]
+        entry = self._table.get(mask)
+        return entry if entry is not None else self._predict_linear(mask)
+
+
+class ModelRegistry:
+    """
+    Tracks available model versions and the active engine.
+    Readers take `registry.active` once per request; swaps replace that single
+    reference, so in-flight requests finish on the engine they started with.
+    """
+
+    def __init__(self, root: str, legacy_model_path: Optional[str] = None, history_size: int = 5,
+                 artifact_mode: str = "auto", use_distilled: bool = True, min_fidelity: float = 0.99):
+        if artifact_mode not in ARTIFACT_MODES:
+            raise ValueError(f"Invalid model artifact mode: {artifact_mode}")
+        self.artifact_mode = artifact_mode
+        self.use_distilled = use_distilled
+        self.min_fidelity = min_fidelity
+        self.root = resolve_backend_path(root)
+        self.legacy_dir = os.path.dirname(resolve_backend_path(legacy_model_path)) if legacy_model_path else None
+        self.history_size = history_size
+        self.active: Optional[ModelEngine] = None
+        self._history: List[ModelEngine] = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")
+        self._loading: Optional[str] = None
+        self._last_error: Optional[str] = None
+
+    # -- discovery ----------------------------------------------------------
+
+    def _version_dir(self, version: str) -> str:
+        if version == LEGACY_VERSION and self.legacy_dir:
+            return self.legacy_dir
+        if os.path.basename(version) != version or version.startswith("."):
+            raise ValueError(f"Invalid model version: {version}")
+        return os.path.join(self.root, version)
+
+    def list_versions(self) -> List[Dict]:
+        versions = []
+        if os.path.isdir(self.root):
+            for name in sorted(os.listdir(self.root)):
+                if name.startswith(".") or name.endswith(".tmp"):
+                    continue  # staging directories of a publish in progress (or one that crashed)
+                path = os.path.join(self.root, name)
+                if os.path.isfile(os.path.join(path, MODEL_FILE)):
+                    versions.append({"version": name, "metadata": self._read_metadata(path)})
+        if self.legacy_dir and os.path.isfile(os.path.join(self.legacy_dir, MODEL_FILE)):
+            versions.append({"version": LEGACY_VERSION, "metadata": self._read_metadata(self.legacy_dir)})
+        return versions
+
+    def latest_version(self) -> Optional[str]:
+        """Most recently created version; names are not comparable (timestamps vs "online-...")"""
+        versions = [v for v in self.list_versions() if v["version"] != LEGACY_VERSION]
+        if not versions:
+            return None
+        return max(versions, key=lambda v: (self._created_at(v), v["version"]))["version"]
+
+    def _created_at(self, version: Dict) -> str:
+        created_at = version["metadata"].get("created_at")
+        if created_at:
+            return str(created_at)
+        # Versions without metadata: fall back to when the directory was written
+        modified = os.path.getmtime(os.path.join(self.root, version["version"], MODEL_FILE))
+        return datetime.utcfromtimestamp(modified).isoformat()
+
+    def read_feature_names(self, version: Optional[str] = None) -> Tuple[str, List[str]]:
+        """(version, feature names) of a version; defaults to the active, then latest, then legacy model"""
+        if version is None:
+            active = self.active
+            if active is not None:
+                return active.version, list(active.feature_names)
+            version = self.latest_version() or LEGACY_VERSION
+        with open(os.path.join(self._version_dir(version), FEATURES_FILE), "r") as f:
+            return version, json.load(f)
+
+    @staticmethod
+    def _read_metadata(path: str) -> Dict:
+        try:
+            with open(os.path.join(path, METADATA_FILE), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    # -- loading ------------------------------------------------------------
+
+    def _load_model(self, path: str, mode: str):
+        """Returns (model, artifact format actually used)"""
+        if mode != "pickle" and has_flat_forest(path):
+            return load_flat_forest(path, mmap=True), "mmap"
+        if mode == "mmap":
+            raise ValueError(f"No flat forest export in {path}")
+        return joblib.load(os.path.join(path, MODEL_FILE)), "pickle"
+
+    def load_engine(self, version: str, mode: Optional[str] = None) -> ModelEngine:
+        """Load and warm up a version without activating it"""
+        path = self._version_dir(version)
+        rss_before = current_rss_mb()
+        started = time.perf_counter()
+        model, artifact_format = self._load_model(path, mode or self.artifact_mode)
+        label_encoder = joblib.load(os.path.join(path, ENCODER_FILE))
+        with open(os.path.join(path, FEATURES_FILE), "r") as f:
+            feature_names = json.load(f)
+
+        if model.n_features_in_ != len(feature_names):
+            raise ValueError("feature_names.json does not match the model's feature count")
+        # Models fitted on DataFrames check column names on every call; we always
+        # pass arrays in feature_names.json order, so drop the names after checking
+        fitted_names = getattr(model, "feature_names_in_", None)
+        if fitted_names is not None:
+            if list(fitted_names) != list(feature_names):
+                raise ValueError("feature_names.json does not match the model's training columns")
+            del model.feature_names_in_
+        load_seconds = time.perf_counter() - started
+
+        engine = self._build_engine(path, version, model, label_encoder, feature_names)
+        warm_up_seconds = engine.warm_up()
+        rss_after = current_rss_mb()
+        engine.load_stats = {
+            "artifact_format": artifact_format,
+            "distilled": engine.report if isinstance(engine, DistilledEngine) else None,
+            "load_ms": round(load_seconds * 1000, 1),
+            "warm_up_ms": round(warm_up_seconds * 1000, 1),
+            "rss_mb": rss_after,
+            "rss_delta_mb": round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None,
+        }
+        logger.info(
+            f"Model {version} loaded ({artifact_format}) in {load_seconds * 1000:.1f}ms, "
+            f"warmed up in {warm_up_seconds * 1000:.1f}ms, RSS {rss_after} MB"
+        )
+        return engine
+
+    def _build_engine(self, path: str, version: str, model, label_encoder, feature_names: List[str]) -> ModelEngine:
+        """Prefer the distilled table when one exists and is faithful enough to the forest"""
+        metadata = self._read_metadata(path)
+        report_path = os.path.join(path, DISTILLED_REPORT_FILE)
+        if not self.use_distilled or not os.path.isfile(report_path):
+            return ModelEngine(version, model, label_encoder, feature_names, metadata)
+
+        with open(report_path, "r") as f:
+            report = json.load(f)
+        fidelity = report.get("fidelity")
+        if report.get("format") != DISTILLED_FORMAT or report.get("n_features") != len(feature_names):
+            logger.warning(f"Ignoring incompatible distilled artifact for model {version}")
+            return ModelEngine(version, model, label_encoder, feature_names, metadata)
+        if report.get("source_checksum") != source_checksum(path):
+            logger.warning(f"Ignoring distilled artifact for model {version}: built from a different model file")
+            return ModelEngine(version, model, label_encoder, feature_names, metadata)
+        if fidelity is None or fidelity < self.min_fidelity:
+            logger.info(f"Distilled model {version} fidelity {fidelity} < {self.min_fidelity}, serving the forest")
+            return ModelEngine(version, model, label_encoder, feature_names, metadata)
+
+        with np.load(os.path.join(path, DISTILLED_FILE), allow_pickle=False) as distilled:
+            return DistilledEngine(version, model, label_encoder, feature_names, metadata, distilled, report)
+
+    def activate(self, engine: ModelEngine):
+        """Atomically make an engine the active one"""
+        with self._lock:
+            if self.active is not None:
+                self._history.append(self.active)
+                self._history = self._history[-self.history_size:]
+            self.active = engine
+        logger.info(f"Model {engine.version} is now active")
+
+    def _load_and_activate(self, version: str):
+        try:
+            self.activate(self.load_engine(version))
+            self._last_error = None
+        except Exception as e:
+            logger.error(f"Failed to load model {version}: {str(e)}")
+            self._last_error = f"{version}: {str(e)}"
+        finally:
+            self._loading = None
+
+    def load_in_background(self, version: str) -> bool:
+        """Queue a version for background load + swap. Returns False if a load is already running"""
+        self._version_dir(version)  # validate the name before queueing
+        with self._lock:
+            if self._loading is not None:
+                return False
+            self._loading = version
+        self._executor.submit(self._load_and_activate, version)
+        return True
+
+    def rollback(self) -> Optional[ModelEngine]:
+        """Re-activate the previously active engine (kept warm in memory)"""
+        with self._lock:
+            if not self._history:
+                return None
+            previous = self._history.pop()
+            self.active = previous
+        logger.info(f"Rolled back to model {previous.version}")
+        return previous
+
+    def deactivate(self):
+        """Stop using trained models; the predictor falls back to its rules"""
+        with self._lock:
+            if self.active is not None:
+                self._history.append(self.active)
+                self._history = self._history[-self.history_size:]
+            self.active = None
+        logger.info("Model registry deactivated, using rule-based predictions")
+
+    def status(self) -> Dict:
+        active = self.active
+        return {
+            "active_version": active.version if active else None,
+            "active_loaded_at": active.loaded_at if active else None,
+            "active_load_stats": active.load_stats if active else None,
+            "artifact_mode": self.artifact_mode,
+            "loading": self._loading,
+            "last_error": self._last_error,
+            "rollback_versions": [engine.version for engine in reversed(self._history)],
+        }
+
+    def activate_on_startup(self, version: str):
+        """Start loading the configured version; requests use rules until it is ready"""
+        if not version:
+            return
+        if version == "latest":
+            version = self.latest_version()
+            if version is None:
+                logger.warning("MODEL_VERSION=latest but the model registry is empty")
+                return
+        try:
+            self.load_in_background(version)
+        except ValueError as e:
+            logger.error(str(e))
+
+
+model_registry = ModelRegistry(
+    settings.MODEL_REGISTRY_DIR,
+    legacy_model_path=settings.MODEL_PATH,
+    artifact_mode=settings.MODEL_ARTIFACT_MODE,
+    use_distilled=settings.DISTILLED_ENABLED,
+    min_fidelity=settings.DISTILLED_MIN_FIDELITY
+)
+
+
+def _report_load(version: str, mode: str) -> Dict:
+    # The label encoder unpickle imports sklearn in either mode; do that first
+    # so the figures only cover the model artifact itself
+    import sklearn.ensemble  # noqa: F401
+    engine = model_registry.load_engine(version, mode=mode)
+    return {"version": version, **engine.load_stats}
+
+
+if __name__ == "__main__":
+    import argparse
+    from multiprocessing import get_context
+
+    parser = argparse.ArgumentParser(description="Report model artifact load time and resident memory")
+    parser.add_argument("version", nargs="?", default=None, help="Registry version (defaults to the latest)")
+    args = parser.parse_args()
+
+    version = args.version or model_registry.latest_version() or LEGACY_VERSION
+    # Each mode loads in a fresh process so RSS figures are not shared between them
+    context = get_context("spawn")
+    for mode in ("pickle", "mmap"):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            try:
+                print(executor.submit(_report_load, version, mode).result())
+            except Exception as e:
+                print({"version": version, "artifact_format": mode, "error": str(e)})
@@ -0,0 +1,366 @@
+"""
+Online Learning from Feedback
+Incrementally updates a Bernoulli naive Bayes model with `partial_fit` as
+users report whether a prediction was right, and publishes the result as a
+new model registry version without a full retrain.
+
+Each run streams feedback rows newer than the stored watermark (feedback id)
+in fixed-size batches, so memory stays bounded however much feedback has
+accumulated. Like the stats rollups, it leaves feedback younger than
+COMMIT_LAG_SECONDS for the next run, so a lower id committed late is not
+skipped by the watermark. Every batch is scored before it is learned from,
+so the published metadata carries a progressive (test-then-train) accuracy.
+
+Labels:
+- `actual_diagnosis` when the user gave one (matched to a known disease)
+- the served prediction when `is_accurate` is true
+- rows marked inaccurate without a diagnosis carry no label and are skipped
+
+Run on a schedule, either in-process (ONLINE_LEARNING_INTERVAL_MINUTES > 0)
+or from cron (from the backend directory):
+    python -m app.services.online_learning
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import warnings
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+from sklearn.naive_bayes import BernoulliNB
+from sklearn.preprocessing import LabelEncoder
+from sqlalchemy import func
+
+from app.core.config import settings
+from app.services.disease_store import disease_store
+from app.services.ml_service import predictor
+from app.services.model_registry import (
+    DISEASE_ALIASES, ENCODER_FILE, FEATURES_FILE, LEGACY_VERSION, METADATA_FILE, MODEL_FILE, model_registry
+)
+from app.services.shadow_eval import diagnosis_keys
+from app.services.stats_service import COMMIT_LAG_SECONDS
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+STATE_DIR = "_online"
+STATE_FILE = "state.joblib"
+LOCK_FILE = "update.lock"
+VERSION_PREFIX = "online-"
+
+
+class OnlineState:
+    """Learner plus everything needed to resume it"""
+
+    def __init__(self, base_version: str, feature_names: List[str], classes: List[str]):
+        self.base_version = base_version
+        self.feature_names = list(feature_names)
+        self.feature_index = {name: i for i, name in enumerate(self.feature_names)}
+        self.label_encoder = LabelEncoder().fit(classes)
+        self.model = BernoulliNB(alpha=1.0)
+        self.watermark = 0
+        self.n_samples = 0
+        self.n_skipped = 0
+        self.n_scored = 0
+        self.n_correct = 0
+        self.published_version: Optional[str] = None
+        self.created_at = datetime.utcnow().isoformat()
+
+    @property
+    def classes(self) -> List[str]:
+        return list(self.label_encoder.classes_)
+
+    def progressive_accuracy(self) -> Optional[float]:
+        return round(self.n_correct / self.n_scored, 4) if self.n_scored else None
+
+
+class OnlineLearner:
+    def __init__(self, batch_size: int = 500, max_rows_per_run: int = 50000, min_samples: int = 50):
+        self.batch_size = batch_size
+        self.max_rows_per_run = max_rows_per_run
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._scheduler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.last_run: Optional[Dict] = None
+
+    # -- paths & state ------------------------------------------------------
+
+    @property
+    def state_dir(self) -> str:
+        return os.path.join(model_registry.root, STATE_DIR)
+
+    def load_state(self) -> Optional[OnlineState]:
+        try:
+            return joblib.load(os.path.join(self.state_dir, STATE_FILE))
+        except FileNotFoundError:
+            return None
+
+    def _save_state(self, state: OnlineState):
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = os.path.join(self.state_dir, STATE_FILE)
+        joblib.dump(state, f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+
+    def _new_state(self) -> OnlineState:
+        """Start from the feature space of the active (or latest) model"""
+        engine = model_registry.active
+        if engine is not None:
+            base_version, feature_names, labels = engine.version, engine.feature_names, engine.labels
+        else:
+            base_version = model_registry.latest_version() or LEGACY_VERSION
+            path = model_registry._version_dir(base_version)
+            with open(os.path.join(path, FEATURES_FILE), "r") as f:
+                feature_names = json.load(f)
+            labels = list(joblib.load(os.path.join(path, ENCODER_FILE)).classes_)
+        # Aliases apply to both sides, so "Flu" and "Flu (Influenza)" are one class
+        classes = sorted({DISEASE_ALIASES.get(name, name) for name in list(labels) + disease_store.current.names()})
+        logger.info(f"Starting online learner from {base_version}: {len(feature_names)} features, {len(classes)} classes")
+        return OnlineState(base_version, feature_names, classes)
+
+    # -- data ---------------------------------------------------------------
+
+    @staticmethod
+    def _resolve_label(actual: Optional[str], is_accurate: Optional[bool], served: Optional[str],
+                       class_keys: Dict[str, str]) -> Optional[str]:
+        name = actual if actual else (served if is_accurate else None)
+        for key in diagnosis_keys(name):
+            if key in class_keys:
+                return class_keys[key]
+        return None
+
+    def _vectorize(self, state: OnlineState, symptoms) -> np.ndarray:
+        row = np.zeros(len(state.feature_names), dtype=np.uint8)
+        mask, other = predictor.canonicalize([str(s) for s in (symptoms or [])])
+        for name in predictor.decode(mask, other):
+            index = state.feature_index.get(name.replace(" ", "_"))
+            if index is not None:
+                row[index] = 1
+        return row
+
+    def _batches(self, db, state: OnlineState):
+        """Keyset-paginated feedback newer than the watermark, up to the commit-lag cutoff"""
+        from app.models.models import Feedback, Prediction
+
+        cutoff = datetime.utcnow() - timedelta(seconds=COMMIT_LAG_SECONDS)
+        max_id = db.query(func.max(Feedback.id)).filter(
+            Feedback.id > state.watermark,
+            Feedback.created_at <= cutoff
+        ).scalar()
+        if not max_id:
+            return
+
+        last_id = state.watermark
+        remaining = self.max_rows_per_run
+        while remaining > 0:
+            rows = db.query(
+                Feedback.id,
+                Feedback.actual_diagnosis,
+                Feedback.is_accurate,
+                Prediction.predicted_disease_name,
+                Prediction.symptoms
+            ).join(Prediction, Prediction.id == Feedback.prediction_id).filter(
+                Feedback.id > last_id,
+                Feedback.id <= max_id
+            ).order_by(Feedback.id).limit(min(self.batch_size, remaining)).all()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+            remaining -= len(rows)
+
+    # -- update -------------------------------------------------------------
+
+    def _learn(self, state: OnlineState, rows) -> Tuple[int, int]:
+        class_keys = {}
+        for name in state.classes:
+            for key in diagnosis_keys(name):
+                class_keys.setdefault(key, name)
+
+        X, y = [], []
+        for _id, actual, is_accurate, served, symptoms in rows:
+            label = self._resolve_label(actual, is_accurate, served, class_keys)
+            if label is None:
+                continue
+            X.append(self._vectorize(state, symptoms))
+            y.append(label)
+        skipped = len(rows) - len(y)
+        if not y:
+            return 0, skipped
+
+        X = np.vstack(X)
+        y = state.label_encoder.transform(y)
+        if state.n_samples:
+            # Test-then-train: score the batch before learning from it
+            state.n_correct += int((state.model.predict(X) == y).sum())
+            state.n_scored += len(y)
+        with warnings.catch_warnings():
+            # Classes with no samples yet get a log prior of -inf, which is intended
+            warnings.simplefilter("ignore", RuntimeWarning)
+            state.model.partial_fit(X, y, classes=np.arange(len(state.classes)))
+        return len(y), skipped
+
+    def _publish(self, state: OnlineState) -> str:
+        base = f"{VERSION_PREFIX}{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}"
+        version, suffix = base, 1
+        while os.path.exists(os.path.join(model_registry.root, version)):
+            suffix += 1
+            version = f"{base}-{suffix}"
+        version_dir = os.path.join(model_registry.root, version)
+        # Hidden staging dir on the same filesystem, so the final rename stays atomic
+        tmp_dir = os.path.join(model_registry.root, f".{version}.tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        joblib.dump(state.label_encoder, os.path.join(tmp_dir, ENCODER_FILE))
+        with open(os.path.join(tmp_dir, FEATURES_FILE), "w") as f:
+            json.dump(state.feature_names, f)
+        with open(os.path.join(tmp_dir, METADATA_FILE), "w") as f:
+            json.dump({
+                "version": version,
+                "created_at": datetime.utcnow().isoformat(),
+                "learner": "online-bernoulli-nb",
+                "base_version": state.base_version,
+                "previous_version": state.published_version,
+                "n_samples": state.n_samples,
+                "feedback_watermark": state.watermark,
+                "progressive_accuracy": state.progressive_accuracy(),
+                "classes": state.classes,
+            }, f, indent=2)
+        # The model file goes last: the registry only lists directories that
+        # contain it (and skips staging dirs), and the rename is atomic
+        joblib.dump(state.model, os.path.join(tmp_dir, MODEL_FILE))
+        os.replace(tmp_dir, version_dir)
+        return version
+
+    def _acquire_file_lock(self):
+        """Keep several workers (or cron + a worker) from updating at once"""
+        os.makedirs(self.state_dir, exist_ok=True)
+        handle = open(os.path.join(self.state_dir, LOCK_FILE), "w")
+        if fcntl is not None:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                return None
+        return handle
+
+    def run_once(self, db, publish: bool = True, activate: bool = False) -> Dict:
+        """Learn from new feedback and publish a version if anything changed"""
+        if not self._lock.acquire(blocking=False):
+            return {"status": "busy"}
+        lock_handle = None
+        try:
+            lock_handle = self._acquire_file_lock()
+            if lock_handle is None:
+                return {"status": "busy"}
+
+            started = time.perf_counter()
+            state = self.load_state() or self._new_state()
+            learned = skipped = 0
+            for rows in self._batches(db, state):
+                n_learned, n_skipped = self._learn(state, rows)
+                learned += n_learned
+                skipped += n_skipped
+                state.n_samples += n_learned
+                state.n_skipped += n_skipped
+                state.watermark = rows[-1][0]
+
+            result = {
+                "status": "ok",
+                "learned": learned,
+                "skipped": skipped,
+                "watermark": state.watermark,
+                "n_samples": state.n_samples,
+                "progressive_accuracy": state.progressive_accuracy(),
+                "published_version": None,
+            }
+            if publish and learned and state.n_samples >= self.min_samples:
+                state.published_version = self._publish(state)
+                result["published_version"] = state.published_version
+                if activate:
+                    model_registry.load_in_background(state.published_version)
+            self._save_state(state)
+
+            result["seconds"] = round(time.perf_counter() - started, 3)
+            self.last_run = {"finished_at": datetime.utcnow().isoformat(), **result}
+            logger.info(f"Online learning run: {result}")
+            return result
+        finally:
+            if lock_handle is not None:
+                lock_handle.close()
+            self._lock.release()
+
+    def status(self) -> Dict:
+        state = self.load_state()
+        return {
+            "initialized": state is not None,
+            "base_version": state.base_version if state else None,
+            "watermark": state.watermark if state else 0,
+            "n_samples": state.n_samples if state else 0,
+            "n_skipped": state.n_skipped if state else 0,
+            "progressive_accuracy": state.progressive_accuracy() if state else None,
+            "published_version": state.published_version if state else None,
+            "scheduled": self._scheduler is not None and self._scheduler.is_alive(),
+            "last_run": self.last_run,
+        }
+
+    # -- scheduling ---------------------------------------------------------
+
+    def _run_scheduled(self, interval_seconds: float, activate: bool):
+        from app.core.database import SessionLocal
+
+        while not self._stop.wait(interval_seconds):
+            db = SessionLocal()
+            try:
+                self.run_once(db, activate=activate)
+            except Exception as e:
+                logger.error(f"Online learning run failed: {str(e)}")
+            finally:
+                db.close()
+
+    def start_scheduler(self, interval_minutes: float, activate: bool = False):
+        if interval_minutes <= 0 or self._scheduler is not None:
+            return
+        self._scheduler = threading.Thread(
+            target=self._run_scheduled,
+            args=(interval_minutes * 60, activate),
+            name="online-learning",
+            daemon=True
+        )
+        self._scheduler.start()
+        logger.info(f"Online learning scheduled every {interval_minutes} minutes")
+
+    def stop_scheduler(self):
+        self._stop.set()
+
+
+online_learner = OnlineLearner(
+    batch_size=settings.ONLINE_LEARNING_BATCH_SIZE,
+    max_rows_per_run=settings.ONLINE_LEARNING_MAX_ROWS,
+    min_samples=settings.ONLINE_LEARNING_MIN_SAMPLES
+)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.core.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Update the online model from new feedback")
+    parser.add_argument("--no-publish", action="store_true", help="Update the learner state without publishing a version")
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        print(json.dumps(online_learner.run_once(session, publish=not args.no_publish), indent=2))
+    finally:
+        session.close()
@@ -0,0 +1,213 @@
+"""
+Refresh Token Service
+Long-lived sessions without re-entering (and re-bcrypting) the password.
+
+A refresh token is "<id>.<secret>": `id` is the row's primary key and only
+sha256(secret) is stored, so a leaked table cannot be replayed. Every
+/api/auth/refresh rotates the token: the presented one is revoked and a
+successor is issued in the same family (one family per login). Presenting a
+token that was already rotated means it was copied, so the whole family is
+revoked.
+
+Access tokens carry their family id ("fam"). get_current_user rejects
+families in the in-process revocation cache, which is re-synced from the
+table every TOKEN_REVOCATION_SYNC_SECONDS so logouts handled by other
+workers apply too, without a database lookup per request.
+"""
+from sqlalchemy.orm import Session
+from typing import Dict, Optional, Tuple
+from datetime import datetime, timedelta
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+import logging
+
+from app.core.config import settings
+from app.models.models import User
+from app.models.refresh_token import RefreshToken
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidRefreshToken(Exception):
+    """Unknown, expired, revoked or reused refresh token"""
+
+
+class _RevocationCache:
+    """Families revoked within the access-token lifetime, family -> forget-after (monotonic)"""
+
+    def __init__(self, ttl_seconds: float, sync_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.sync_seconds = sync_seconds
+        self._families: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._last_sync = 0.0
+        self._synced_to: Optional[datetime] = None
+
+    def add(self, family_id: str):
+        with self._lock:
+            self._families[family_id] = time.monotonic() + self.ttl_seconds
+
+    def is_revoked(self, family_id: str) -> bool:
+        with self._lock:
+            forget_after = self._families.get(family_id)
+            if forget_after is None:
+                return False
+            if forget_after < time.monotonic():
+                del self._families[family_id]
+                return False
+            return True
+
+    def sync_if_stale(self, db: Session):
+        """Pull families revoked by other processes since the last sync"""
+        if time.monotonic() - self._last_sync < self.sync_seconds:
+            return
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            now = datetime.utcnow()
+            since = self._synced_to or now - timedelta(seconds=self.ttl_seconds)
+            rows = db.query(RefreshToken.family_id).filter(
+                RefreshToken.revoked_at >= since - timedelta(seconds=1),
+                RefreshToken.replaced_by.is_(None)
+            ).distinct().all()
+            for (family_id,) in rows:
+                self.add(family_id)
+            self._synced_to = now
+            self._last_sync = time.monotonic()
+            with self._lock:
+                expired = [f for f, forget_after in self._families.items() if forget_after < self._last_sync]
+                for family_id in expired:
+                    del self._families[family_id]
+        except Exception as e:
+            logger.warning(f"Token revocation sync failed: {str(e)}")
+        finally:
+            self._sync_lock.release()
+
+    def __len__(self) -> int:
+        return len(self._families)
+
+
+revocation_cache = _RevocationCache(
+    ttl_seconds=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    sync_seconds=settings.TOKEN_REVOCATION_SYNC_SECONDS
+)
+
+
+def _hash_secret(secret: str) -> str:
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()
+
+
+def _split(token: str) -> Tuple[str, str]:
+    token_id, _, secret = (token or "").partition(".")
+    if not token_id or not secret or len(token_id) > 22:
+        raise InvalidRefreshToken()
+    return token_id, secret
+
+
+class RefreshTokenService:
+
+    @staticmethod
+    def issue(db: Session, user_id: int, family_id: Optional[str] = None) -> Tuple[str, str]:
+        """Create a refresh token (new family unless given). Returns (token, family_id); caller commits"""
+        token_id = secrets.token_urlsafe(16)
+        secret = secrets.token_urlsafe(32)
+        family_id = family_id or secrets.token_urlsafe(16)
+        db.add(RefreshToken(
+            id=token_id,
+            token_hash=_hash_secret(secret),
+            user_id=user_id,
+            family_id=family_id,
+            expires_at=datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        ))
+        return f"{token_id}.{secret}", family_id
+
+    @staticmethod
+    def login(db: Session, user: User) -> Tuple[str, str]:
+        """Start a new token family for a password login"""
+        RefreshTokenService.purge_expired(db)
+        token, family_id = RefreshTokenService.issue(db, user.id)
+        db.commit()
+        return token, family_id
+
+    @staticmethod
+    def rotate(db: Session, token: str) -> Tuple[User, str, str]:
+        """Exchange a refresh token for its successor. Returns (user, new_token, family_id)"""
+        token_id, secret = _split(token)
+        record = db.query(RefreshToken).filter(RefreshToken.id == token_id).with_for_update().first()
+        if record is None or not hmac.compare_digest(record.token_hash, _hash_secret(secret)):
+            raise InvalidRefreshToken()
+        if revocation_cache.is_revoked(record.family_id):
+            raise InvalidRefreshToken()
+
+        now = datetime.utcnow()
+        if record.revoked_at is not None:
+            rotated_recently = (
+                record.replaced_by is not None
+                and (now - record.revoked_at).total_seconds() < settings.REFRESH_TOKEN_REUSE_GRACE_SECONDS
+            )
+            if not rotated_recently:
+                # An old token came back: someone else holds a copy of this session
+                logger.warning(f"Refresh token reuse detected for user {record.user_id}; revoking family")
+                RefreshTokenService.revoke_family(db, record.family_id)
+            # else: a concurrent refresh (e.g. two tabs) already rotated it; just refuse
+            raise InvalidRefreshToken()
+        if record.expires_at <= now:
+            raise InvalidRefreshToken()
+
+        user = db.query(User).filter(User.id == record.user_id).first()
+        if user is None or not user.is_active:
+            RefreshTokenService.revoke_family(db, record.family_id)
+            raise InvalidRefreshToken()
+
+        new_token, _ = RefreshTokenService.issue(db, user.id, record.family_id)
+        record.revoked_at = now
+        record.replaced_by = new_token.partition(".")[0]
+        db.commit()
+        return user, new_token, record.family_id
+
+    @staticmethod
+    def revoke_family(db: Session, family_id: str):
+        """Revoke every token of a login session (logout, reuse, deactivated user)"""
+        db.query(RefreshToken).filter(
+            RefreshToken.family_id == family_id,
+            RefreshToken.revoked_at.is_(None)
+        ).update({RefreshToken.revoked_at: datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        revocation_cache.add(family_id)
+
+    @staticmethod
+    def revoke(db: Session, token: str) -> bool:
+        """Logout: revoke the family of a refresh token. False if the token is unknown"""
+        try:
+            token_id, secret = _split(token)
+        except InvalidRefreshToken:
+            return False
+        record = db.query(RefreshToken).filter(RefreshToken.id == token_id).first()
+        if record is None or not hmac.compare_digest(record.token_hash, _hash_secret(secret)):
+            return False
+        RefreshTokenService.revoke_family(db, record.family_id)
+        return True
+
+    @staticmethod
+    def revoke_user(db: Session, user_id: int) -> int:
+        """Revoke all sessions of a user. Returns the number of families revoked"""
+        families = [row[0] for row in db.query(RefreshToken.family_id).filter(
+            RefreshToken.user_id == user_id,
+            RefreshToken.revoked_at.is_(None)
+        ).distinct().all()]
+        for family_id in families:
+            RefreshTokenService.revoke_family(db, family_id)
+        return len(families)
+
+    @staticmethod
+    def purge_expired(db: Session) -> int:
+        deleted = db.query(RefreshToken).filter(
+            RefreshToken.expires_at < datetime.utcnow()
+        ).delete(synchronize_session=False)
+        if deleted:
+            logger.info(f"Purged {deleted} expired refresh tokens")
+        return deleted
@@ -0,0 +1,231 @@
+"""
+Shadow Model Evaluation
+Candidate models score the same symptoms as the primary model on a background
+thread, so comparing engines on live traffic adds no request latency.
+Agreement and latency are aggregated in memory and flushed to the log every
+SHADOW_FLUSH_SECONDS.
+"""
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+
+
+class CandidateStats:
+    """Running comparison of one candidate against the primary model"""
+
+    def __init__(self, latency_window: int = 1000, top_pairs: int = 10):
+        self.compared = 0
+        self.agreed = 0
+        self.errors = 0
+        self.disagreements: Counter = Counter()
+        self.latencies_ms = deque(maxlen=latency_window)
+        self.top_pairs = top_pairs
+
+    def record(self, primary: str, candidate: str, latency_ms: float):
+        self.compared += 1
+        if primary == candidate:
+            self.agreed += 1
+        else:
+            self.disagreements[(primary, candidate)] += 1
+        self.latencies_ms.append(latency_ms)
+
+    def snapshot(self) -> Dict:
+        latencies = list(self.latencies_ms)
+        return {
+            "compared": self.compared,
+            "agreement_rate": round(self.agreed / self.compared, 4) if self.compared else None,
+            "errors": self.errors,
+            "latency_ms_p50": _percentile(latencies, 0.50),
+            "latency_ms_p95": _percentile(latencies, 0.95),
+            "top_disagreements": [
+                {"primary": primary, "candidate": candidate, "count": count}
+                for (primary, candidate), count in self.disagreements.most_common(self.top_pairs)
+            ],
+        }
+
+
+class ShadowEvaluator:
+    """
+    Holds candidate engines (anything with `.version` and
+    `.predict(symptoms) -> (disease, confidence)`) and scores them off the
+    request path. Work beyond `max_pending` queued jobs is dropped rather
+    than letting the backlog grow.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, max_pending: int = 1000, flush_seconds: float = 300.0):
+        self.sample_rate = sample_rate
+        self.max_pending = max_pending
+        self.flush_seconds = flush_seconds
+        self._candidates: Dict[str, object] = {}
+        self._window: Dict[str, CandidateStats] = {}
+        self._totals: Dict[str, CandidateStats] = {}
+        self._last_window: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow-eval")
+        self._pending = 0
+        self._dropped = 0
+        self._next_flush = time.monotonic() + flush_seconds
+
+    # -- candidate management ----------------------------------------------
+
+    def add_candidate(self, engine):
+        with self._lock:
+            self._candidates[engine.version] = engine
+            self._window.setdefault(engine.version, CandidateStats())
+            self._totals.setdefault(engine.version, CandidateStats())
+        logger.info(f"Shadow candidate {engine.version} added")
+
+    def add_candidate_async(self, version: str, loader: Callable[[str], object]):
+        """Load a candidate on the shadow thread (e.g. ModelRegistry.load_engine)"""
+        def _load():
+            try:
+                self.add_candidate(loader(version))
+            except Exception as e:
+                logger.error(f"Failed to load shadow candidate {version}: {str(e)}")
+        self._executor.submit(_load)
+
+    def remove_candidate(self, version: str) -> bool:
+        with self._lock:
+            return self._candidates.pop(version, None) is not None
+
+    def candidates(self) -> Dict[str, object]:
+        return dict(self._candidates)
+
+    @property
+    def active(self) -> bool:
+        return bool(self._candidates)
+
+    # -- scoring ------------------------------------------------------------
+
+    def submit(self, symptoms: List[str], primary_version: str, primary_disease: str):
+        """Queue candidates to score this request. Cheap no-op when there are no candidates"""
+        if not self._candidates:
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._dropped += 1
+                return
+            self._pending += 1
+        self._executor.submit(self._score, list(symptoms), primary_version, primary_disease)
+
+    def _score(self, symptoms: List[str], primary_version: str, primary_disease: str):
+        try:
+            for version, engine in list(self._candidates.items()):
+                if version == primary_version:
+                    continue
+                started = time.perf_counter()
+                try:
+                    disease, _confidence = engine.predict(symptoms)
+                except Exception as e:
+                    logger.warning(f"Shadow candidate {version} failed: {str(e)}")
+                    with self._lock:
+                        self._window.setdefault(version, CandidateStats()).errors += 1
+                        self._totals.setdefault(version, CandidateStats()).errors += 1
+                    continue
+                latency_ms = (time.perf_counter() - started) * 1000
+                with self._lock:
+                    self._window.setdefault(version, CandidateStats()).record(primary_disease, disease, latency_ms)
+                    self._totals.setdefault(version, CandidateStats()).record(primary_disease, disease, latency_ms)
+        finally:
+            with self._lock:
+                self._pending -= 1
+            if time.monotonic() >= self._next_flush:
+                self.flush()
+
+    def flush(self) -> Dict[str, Dict]:
+        """Log and reset the current window of stats"""
+        with self._lock:
+            self._next_flush = time.monotonic() + self.flush_seconds
+            window = {version: stats.snapshot() for version, stats in self._window.items()}
+            self._window = {version: CandidateStats() for version in self._candidates}
+            self._last_window = window
+        for version, stats in window.items():
+            if stats["compared"]:
+                logger.info(
+                    f"Shadow {version}: compared={stats['compared']} agreement={stats['agreement_rate']} "
+                    f"p95={stats['latency_ms_p95']}ms errors={stats['errors']}"
+                )
+        return window
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "candidates": list(self._candidates),
+                "sample_rate": self.sample_rate,
+                "pending": self._pending,
+                "dropped": self._dropped,
+                "totals": {version: stats.snapshot() for version, stats in self._totals.items()},
+                "current_window": {version: stats.snapshot() for version, stats in self._window.items()},
+                "last_window": self._last_window,
+            }
+
+
+# -- feedback agreement --------------------------------------------------------
+
+_PARENS_RE = re.compile(r"\(([^)]*)\)")
+
+
+def diagnosis_keys(name: Optional[str]) -> set:
+    """Comparable keys for a diagnosis: 'Flu (Influenza)' -> {'flu (influenza)', 'flu', 'influenza'}"""
+    if not name:
+        return set()
+    name = name.strip().lower()
+    keys = {name, _PARENS_RE.sub("", name).strip()}
+    keys.update(inner.strip() for inner in _PARENS_RE.findall(name))
+    return {key for key in keys if key}
+
+
+def matches_diagnosis(predicted: Optional[str], actual: Optional[str]) -> bool:
+    return bool(diagnosis_keys(predicted) & diagnosis_keys(actual))
+
+
+def feedback_agreement(rows: Iterable[Tuple[List[str], str, str]], engines: Dict[str, object]) -> Dict:
+    """
+    Score engines against user-reported diagnoses.
+    `rows` yields (symptoms, served prediction, actual diagnosis).
+    """
+    report = {"served": {"matched": 0}}
+    report.update({version: {"matched": 0, "errors": 0} for version in engines})
+    total = 0
+    for symptoms, served, actual in rows:
+        total += 1
+        if matches_diagnosis(served, actual):
+            report["served"]["matched"] += 1
+        lowered = [str(s).lower() for s in (symptoms or [])]
+        for version, engine in engines.items():
+            try:
+                disease, _confidence = engine.predict(lowered)
+            except Exception:
+                report[version]["errors"] += 1
+                continue
+            if matches_diagnosis(disease, actual):
+                report[version]["matched"] += 1
+
+    for stats in report.values():
+        stats["accuracy"] = round(stats["matched"] / total, 4) if total else None
+    return {"feedback_rows": total, "engines": report}
+
+
+shadow_evaluator = ShadowEvaluator(
+    sample_rate=settings.SHADOW_SAMPLE_RATE,
+    max_pending=settings.SHADOW_MAX_PENDING,
+    flush_seconds=settings.SHADOW_FLUSH_SECONDS
+)
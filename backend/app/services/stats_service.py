@@ -0,0 +1,426 @@
+"""
+Admin Statistics Rollups
+Maintains per-day, per-disease counters (predictions, confidence sums,
+feedback, accurate feedback) in stats_daily_disease so the dashboard reads a
+few hundred precomputed rows instead of aggregating the predictions table.
+stats_daily_segment additionally splits daily predictions by age band and
+gender for the analytics time series.
+
+Rollups are advanced incrementally from id watermarks: each refresh only
+aggregates predictions/feedback inserted since the previous one. Refreshes
+run lazily before a read when the last one is older than
+STATS_REFRESH_SECONDS, or from cron (from the backend directory):
+    python -m app.services.stats_service            # incremental
+    python -m app.services.stats_service --rebuild  # recompute from scratch
+
+Rollups count every prediction ever made, including ones later trimmed
+from a user's history by the per-user cleanup.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case
+from typing import Dict, Iterator, List, Optional, Tuple
+from collections import Counter, OrderedDict
+from datetime import date, datetime, timedelta
+import threading
+import time
+import logging
+
+from app.core.config import settings
+from app.core.metrics import record_cache
+from app.models.models import User, Prediction, Feedback
+from app.models.stats import DailyDiseaseStat, DailySegmentStat, StatsRollupState
+
+logger = logging.getLogger(__name__)
+
+STATE_NAME = "daily_disease"
+SEGMENT_STATE_NAME = "daily_segment"
+UNKNOWN_DISEASE = "Unknown"
+UNKNOWN = "unknown"
+AGE_BANDS = ((12, "0-12"), (17, "13-17"), (39, "18-39"), (64, "40-64"))
+GENDERS = {"m": "male", "f": "female", "o": "other"}
+BUCKETS = ("day", "week", "month")
+GROUP_BY = ("none", "disease", "age_band", "gender")
+# Rows younger than this are left for the next refresh, so a transaction that
+# committed a lower id slightly later is not skipped by the watermark
+COMMIT_LAG_SECONDS = 5
+
+_refresh_lock = threading.Lock()
+_last_refresh = 0.0
+
+
+def _as_date(value) -> date:
+    if value is None:
+        return date(1970, 1, 1)
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])  # SQLite returns date() as text
+
+
+def age_band(age) -> str:
+    try:
+        age = int(age)
+    except (TypeError, ValueError):
+        return UNKNOWN
+    for upper, label in AGE_BANDS:
+        if age <= upper:
+            return label
+    return "65+"
+
+
+def gender_group(gender) -> str:
+    if not gender:
+        return UNKNOWN
+    return GENDERS.get(str(gender).strip()[:1].lower(), UNKNOWN)
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())  # ISO weeks start on Monday
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _bucket_starts(start: date, end: date, bucket: str) -> List[date]:
+    starts = []
+    current = bucket_start(start, bucket)
+    while current <= end:
+        starts.append(current)
+        if bucket == "month":
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            current += timedelta(days=7 if bucket == "week" else 1)
+    return starts
+
+
+class _TimeseriesCache:
+    """LRU of recent time-series results; entries carry the rollup watermark they were built at"""
+
+    def __init__(self, max_size: int = 256, ttl_seconds: float = 300.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._items: "OrderedDict[tuple, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[Dict]:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                record_cache("analytics", False)
+                return None
+            self._items.move_to_end(key)
+            record_cache("analytics", True)
+            return entry[1]
+
+    def put(self, key: tuple, value: Dict):
+        with self._lock:
+            self._items[key] = (time.monotonic(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+_timeseries_cache = _TimeseriesCache(
+    max_size=settings.ANALYTICS_CACHE_SIZE,
+    ttl_seconds=settings.ANALYTICS_CACHE_SECONDS
+)
+
+
+class StatsService:
+
+    @staticmethod
+    def _bucket(db: Session, cache: Dict, day, disease: Optional[str]) -> DailyDiseaseStat:
+        key = (_as_date(day), disease or UNKNOWN_DISEASE)
+        stat = cache.get(key)
+        if stat is None:
+            stat = db.get(DailyDiseaseStat, key)
+            if stat is None:
+                stat = DailyDiseaseStat(
+                    day=key[0], disease=key[1], predictions=0, confidence_sum=0.0,
+                    confidence_count=0, feedback=0, accurate_feedback=0
+                )
+                db.add(stat)
+            cache[key] = stat
+        return stat
+
+    @staticmethod
+    def _state(db: Session, name: str) -> StatsRollupState:
+        """Watermark row, locked so concurrent refreshes cannot fold the same rows twice"""
+        state = db.query(StatsRollupState).filter(
+            StatsRollupState.name == name
+        ).with_for_update().first()
+        if state is None:
+            state = StatsRollupState(name=name, last_prediction_id=0, last_feedback_id=0)
+            db.add(state)
+            db.flush()
+        return state
+
+    @staticmethod
+    def _fold_segments(db: Session, cutoff: datetime) -> int:
+        """Age band and gender live in additional_info JSON, so new rows are bucketed in Python"""
+        state = StatsService._state(db, SEGMENT_STATE_NAME)
+        max_prediction_id = db.query(func.max(Prediction.id)).filter(
+            Prediction.id > state.last_prediction_id,
+            Prediction.created_at <= cutoff
+        ).scalar()
+        if not max_prediction_id:
+            return 0
+
+        counts: Counter = Counter()
+        rows = db.query(
+            Prediction.created_at,
+            Prediction.predicted_disease_name,
+            Prediction.additional_info
+        ).filter(
+            Prediction.id > state.last_prediction_id,
+            Prediction.id <= max_prediction_id
+        ).execution_options(yield_per=5000)
+        for created_at, disease, info in rows:
+            info = info if isinstance(info, dict) else {}
+            counts[(
+                _as_date(created_at),
+                disease or UNKNOWN_DISEASE,
+                age_band(info.get("age")),
+                gender_group(info.get("gender"))
+            )] += 1
+
+        for key, count in counts.items():
+            stat = db.get(DailySegmentStat, key)
+            if stat is None:
+                stat = DailySegmentStat(day=key[0], disease=key[1], age_band=key[2], gender=key[3], predictions=0)
+                db.add(stat)
+            stat.predictions += count
+        state.last_prediction_id = max_prediction_id
+        return sum(counts.values())
+
+    @staticmethod
+    def refresh(db: Session) -> Dict[str, int]:
+        """Fold predictions and feedback newer than the watermarks into the rollups"""
+        global _last_refresh
+
+        state = StatsService._state(db, STATE_NAME)
+
+        cutoff = datetime.utcnow() - timedelta(seconds=COMMIT_LAG_SECONDS)
+        buckets: Dict = {}
+        folded = {"predictions": 0, "feedback": 0}
+
+        max_prediction_id = db.query(func.max(Prediction.id)).filter(
+            Prediction.id > state.last_prediction_id,
+            Prediction.created_at <= cutoff
+        ).scalar()
+        if max_prediction_id:
+            day = func.date(Prediction.created_at)
+            rows = db.query(
+                day,
+                Prediction.predicted_disease_name,
+                func.count(Prediction.id),
+                func.sum(Prediction.confidence_score),
+                func.count(Prediction.confidence_score)
+            ).filter(
+                Prediction.id > state.last_prediction_id,
+                Prediction.id <= max_prediction_id
+            ).group_by(day, Prediction.predicted_disease_name).all()
+            for row_day, disease, count, confidence_sum, confidence_count in rows:
+                stat = StatsService._bucket(db, buckets, row_day, disease)
+                stat.predictions += count
+                stat.confidence_sum += confidence_sum or 0.0
+                stat.confidence_count += confidence_count
+                folded["predictions"] += count
+            state.last_prediction_id = max_prediction_id
+
+        max_feedback_id = db.query(func.max(Feedback.id)).filter(
+            Feedback.id > state.last_feedback_id,
+            Feedback.created_at <= cutoff
+        ).scalar()
+        if max_feedback_id:
+            day = func.date(Feedback.created_at)
+            rows = db.query(
+                day,
+                Prediction.predicted_disease_name,
+                func.count(Feedback.id),
+                func.sum(case((Feedback.is_accurate == True, 1), else_=0))
+            ).outerjoin(Prediction, Prediction.id == Feedback.prediction_id).filter(
+                Feedback.id > state.last_feedback_id,
+                Feedback.id <= max_feedback_id
+            ).group_by(day, Prediction.predicted_disease_name).all()
+            for row_day, disease, count, accurate in rows:
+                stat = StatsService._bucket(db, buckets, row_day, disease)
+                stat.feedback += count
+                stat.accurate_feedback += accurate or 0
+                folded["feedback"] += count
+            state.last_feedback_id = max_feedback_id
+
+        folded["segments"] = StatsService._fold_segments(db, cutoff)
+        db.commit()
+        _last_refresh = time.monotonic()
+        if any(folded.values()):
+            logger.info(f"Stats rollups advanced: {folded}")
+        return folded
+
+    @staticmethod
+    def refresh_if_stale(db: Session, max_age_seconds: Optional[float] = None):
+        """Refresh at most once per STATS_REFRESH_SECONDS per process"""
+        max_age = settings.STATS_REFRESH_SECONDS if max_age_seconds is None else max_age_seconds
+        if time.monotonic() - _last_refresh < max_age:
+            return
+        if not _refresh_lock.acquire(blocking=False):
+            return  # another request in this process is already refreshing
+        try:
+            StatsService.refresh(db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Stats rollup refresh failed, serving previous values: {str(e)}")
+        finally:
+            _refresh_lock.release()
+
+    @staticmethod
+    def rebuild(db: Session) -> Dict[str, int]:
+        """Drop and recompute all rollups"""
+        db.query(DailyDiseaseStat).delete(synchronize_session=False)
+        db.query(DailySegmentStat).delete(synchronize_session=False)
+        db.query(StatsRollupState).filter(
+            StatsRollupState.name.in_([STATE_NAME, SEGMENT_STATE_NAME])
+        ).delete(synchronize_session=False)
+        db.commit()
+        return StatsService.refresh(db)
+
+    @staticmethod
+    def summary(db: Session, start: Optional[date] = None, end: Optional[date] = None, top: int = 10) -> Dict:
+        """Dashboard statistics from the rollups for days in [start, end]"""
+        query = db.query(
+            DailyDiseaseStat.disease,
+            func.sum(DailyDiseaseStat.predictions),
+            func.sum(DailyDiseaseStat.confidence_sum),
+            func.sum(DailyDiseaseStat.confidence_count),
+            func.sum(DailyDiseaseStat.feedback),
+            func.sum(DailyDiseaseStat.accurate_feedback)
+        )
+        if start is not None:
+            query = query.filter(DailyDiseaseStat.day >= start)
+        if end is not None:
+            query = query.filter(DailyDiseaseStat.day <= end)
+        rows = query.group_by(DailyDiseaseStat.disease).all()
+
+        total_predictions = sum(row[1] or 0 for row in rows)
+        confidence_sum = sum(row[2] or 0.0 for row in rows)
+        confidence_count = sum(row[3] or 0 for row in rows)
+        total_feedback = sum(row[4] or 0 for row in rows)
+        accurate_feedback = sum(row[5] or 0 for row in rows)
+
+        users = db.query(func.count(User.id))
+        if start is not None:
+            users = users.filter(User.created_at >= datetime.combine(start, datetime.min.time()))
+        if end is not None:
+            users = users.filter(User.created_at < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+
+        top_diseases = sorted(
+            ((row[0], int(row[1] or 0)) for row in rows if row[1]),
+            key=lambda item: (-item[1], item[0])
+        )[:top]
+
+        return {
+            "total_users": users.scalar(),
+            "total_predictions": int(total_predictions),
+            "total_feedback": int(total_feedback),
+            "average_confidence": round(confidence_sum / confidence_count, 2) if confidence_count else 0,
+            "accuracy_rate": round(accurate_feedback / total_feedback * 100, 2) if total_feedback else 0,
+            "top_diseases": [
+                {"disease": disease, "count": count}
+                for disease, count in top_diseases
+            ],
+            "range": {
+                "start": start.isoformat() if start else None,
+                "end": end.isoformat() if end else None
+            }
+        }
+
+
+    @staticmethod
+    def timeseries(db: Session, bucket: str = "day", start: Optional[date] = None, end: Optional[date] = None,
+                   group_by: str = "disease", diseases: Optional[List[str]] = None,
+                   age_band: Optional[str] = None, gender: Optional[str] = None) -> Dict:
+        """
+        Prediction counts per time bucket, optionally split by one dimension.
+        Series are dense (zero-filled) and aligned with `buckets`. Results are
+        cached per query until the rollups advance or the TTL expires.
+        """
+        if bucket not in BUCKETS:
+            raise ValueError(f"bucket must be one of {BUCKETS}")
+        if group_by not in GROUP_BY:
+            raise ValueError(f"group_by must be one of {GROUP_BY}")
+        end = end or datetime.utcnow().date()
+        start = start or end - timedelta(days=89)
+
+        state = db.get(StatsRollupState, SEGMENT_STATE_NAME)
+        watermark = state.last_prediction_id if state else 0
+        key = (bucket, start, end, group_by, tuple(sorted(diseases or ())), age_band, gender, watermark)
+        cached = _timeseries_cache.get(key)
+        if cached is not None:
+            return cached
+
+        group_column = {
+            "disease": DailySegmentStat.disease,
+            "age_band": DailySegmentStat.age_band,
+            "gender": DailySegmentStat.gender,
+        }.get(group_by)
+        columns = [DailySegmentStat.day, func.sum(DailySegmentStat.predictions)]
+        if group_column is not None:
+            columns.insert(1, group_column)
+        query = db.query(*columns).filter(DailySegmentStat.day >= start, DailySegmentStat.day <= end)
+        if diseases:
+            query = query.filter(DailySegmentStat.disease.in_(diseases))
+        if age_band:
+            query = query.filter(DailySegmentStat.age_band == age_band)
+        if gender:
+            query = query.filter(DailySegmentStat.gender == gender)
+        query = query.group_by(DailySegmentStat.day, group_column) if group_column is not None else query.group_by(DailySegmentStat.day)
+
+        counts: Counter = Counter()
+        for row in query.all():
+            group = row[1] if group_column is not None else "all"
+            counts[(bucket_start(_as_date(row[0]), bucket), group)] += int(row[-1] or 0)
+
+        buckets = _bucket_starts(start, end, bucket)
+        index = {day: i for i, day in enumerate(buckets)}
+        series: Dict[str, List[int]] = {}
+        for (day, group), count in counts.items():
+            series.setdefault(group, [0] * len(buckets))[index[day]] += count
+
+        result = {
+            "bucket": bucket,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "group_by": group_by,
+            "buckets": [day.isoformat() for day in buckets],
+            "series": dict(sorted(series.items(), key=lambda item: (-sum(item[1]), item[0]))),
+            "total": sum(counts.values()),
+        }
+        _timeseries_cache.put(key, result)
+        return result
+
+    @staticmethod
+    def timeseries_rows(result: Dict) -> Iterator[Tuple[str, str, int]]:
+        """Flatten a time-series result into (bucket_start, group, count) rows"""
+        for group, counts in result["series"].items():
+            for bucket, count in zip(result["buckets"], counts):
+                yield bucket, group, count
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.core.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Advance or rebuild the admin statistics rollups")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute all rollups from scratch")
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        result = StatsService.rebuild(session) if args.rebuild else StatsService.refresh(session)
+        print(f"Folded {result['predictions']} predictions and {result['feedback']} feedback rows "
+              f"({result['segments']} into segments)")
+    finally:
+        session.close()
@@ -0,0 +1,162 @@
+"""
+Structured Output Parsing
+Extracts JSON objects from LLM replies in a single pass.
+Tolerates markdown fences, leading/trailing prose and output that was cut off
+mid-object (e.g. by max_tokens), and keeps success/failure counters so the
+parse-failure rate can be monitored.
+"""
+import json
+import threading
+from typing import Optional, Dict, Tuple, Type, TypeVar
+from pydantic import BaseModel, ValidationError
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=BaseModel)
+
+_decoder = json.JSONDecoder()
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class ParseStats:
+    """Thread-safe counters for structured-output parsing outcomes"""
+
+    OUTCOMES = ("parsed", "repaired", "invalid", "failed")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {outcome: 0 for outcome in self.OUTCOMES}
+
+    def record(self, outcome: str):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            counts = dict(self._counts)
+        total = sum(counts.values())
+        failures = counts["invalid"] + counts["failed"]
+        counts["total"] = total
+        counts["failure_rate"] = round(failures / total, 4) if total else 0.0
+        return counts
+
+
+parse_stats = ParseStats()
+
+
+def _scan(text: str, start: int) -> Tuple[list, bool, list]:
+    """
+    Walk text from the opening brace at `start` and return
+    (open bracket stack at end, still inside a string, safe cut points).
+    A cut point is (index, stack) where text[start:index] can be closed with
+    the stack's closers to form valid JSON.
+    """
+    stack = []
+    in_string = False
+    escaped = False
+    cut_points = []
+
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(ch)
+            cut_points.append((i + 1, list(stack)))
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                break
+            cut_points.append((i + 1, list(stack)))
+        elif ch == ",":
+            cut_points.append((i, list(stack)))
+
+    return stack, in_string, cut_points
+
+
+def _close(fragment: str, stack: list) -> str:
+    return fragment + "".join(_CLOSERS[opener] for opener in reversed(stack))
+
+
+def _repair_truncated(text: str, start: int) -> Optional[dict]:
+    """Best-effort completion of a JSON object that was cut off"""
+    stack, in_string, cut_points = _scan(text, start)
+    if not stack:
+        return None
+
+    candidates = []
+    # Keep a partially written string value if possible
+    tail = text[start:].rstrip()
+    if in_string:
+        candidates.append(_close(tail + '"', stack))
+    else:
+        candidates.append(_close(tail.rstrip(",:"), stack))
+    # Fall back to dropping the incomplete trailing member
+    for index, cut_stack in reversed(cut_points[-4:]):
+        candidates.append(_close(text[start:index], cut_stack))
+
+    for candidate in candidates:
+        try:
+            value = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(value, dict):
+            return value
+    return None
+
+
+def extract_json_object(text: str) -> Tuple[Optional[dict], str]:
+    """
+    Extract the first JSON object from an LLM reply.
+
+    Returns (object or None, outcome) where outcome is 'parsed' for a complete
+    object, 'repaired' for a truncated one that was closed, or 'failed'.
+    """
+    if not text:
+        return None, "failed"
+
+    start = text.find("{")
+    while start != -1:
+        try:
+            value, _end = _decoder.raw_decode(text, start)
+            if isinstance(value, dict):
+                return value, "parsed"
+        except ValueError:
+            repaired = _repair_truncated(text, start)
+            if repaired is not None:
+                return repaired, "repaired"
+        start = text.find("{", start + 1)
+
+    return None, "failed"
+
+
+def parse_structured(text: str, model: Type[T]) -> Tuple[Optional[T], str]:
+    """
+    Extract and validate a JSON object against a Pydantic model.
+    Records the outcome in `parse_stats`.
+    """
+    data, outcome = extract_json_object(text)
+    if data is None:
+        parse_stats.record("failed")
+        return None, "failed"
+
+    try:
+        parsed = model.model_validate(data)
+    except ValidationError as e:
+        logger.warning(f"Structured output failed validation: {e.error_count()} errors")
+        parse_stats.record("invalid")
+        return None, "invalid"
+
+    parse_stats.record(outcome)
+    return parsed, outcome
@@ -0,0 +1,370 @@
+"""
+Local Symptom Extractor
+Deterministic, offline extraction of symptoms, duration and severity from short
+Hindi / English / Hinglish free text (e.g. "3 din se bukhar", "सिर दर्द और उल्टी").
+Used before falling back to the LLM so simple inputs never need a network call.
+"""
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app.services.ml_service import predictor
+
+# Synonyms per canonical symptom (keys match DiseasePredictor.symptom_mapping),
+# grouped by language. Latin entries are folded with _fold(), so spelling
+# variants such as "bukhaar" / "bukhar" or "khaansi" / "khansi" only need to be
+# listed once.
+SYMPTOM_LEXICON: Dict[str, Dict[str, List[str]]] = {
+    "fever": {
+        "en": ["fever", "temperature", "high temperature", "feverish", "pyrexia"],
+        "hinglish": ["bukhar", "bukhar hai", "jvar", "jwar"],
+        "hi": ["बुखार", "ज्वर", "ताप", "बुख़ार"],
+    },
+    "cough": {
+        "en": ["cough", "coughing", "dry cough", "wet cough"],
+        "hinglish": ["khansi", "khasi", "khaansi", "kaansi", "sukhi khansi"],
+        "hi": ["खांसी", "खाँसी", "खासी", "सूखी खांसी"],
+    },
+    "fatigue": {
+        "en": ["fatigue", "tired", "tiredness", "weakness", "weak", "exhausted", "exhaustion", "lethargy"],
+        "hinglish": ["thakan", "thakaan", "thakavat", "kamjori", "kamzori", "kamzor", "kamjor"],
+        "hi": ["थकान", "थकावट", "कमजोरी", "कमज़ोरी"],
+    },
+    "headache": {
+        "en": ["headache", "head ache", "head pain", "migraine"],
+        "hinglish": ["sir dard", "sar dard", "sirdard", "sardard", "sir me dard", "sir mein dard", "sar me dard", "sar mein dard"],
+        "hi": ["सिरदर्द", "सिर दर्द", "सर दर्द", "सिर में दर्द", "सर में दर्द"],
+    },
+    "sore throat": {
+        "en": ["sore throat", "throat pain", "throat infection", "scratchy throat"],
+        "hinglish": ["gala kharab", "gala dard", "gale me dard", "gale mein dard", "gale me kharash", "gale mein kharash", "kharash"],
+        "hi": ["गला खराब", "गले में दर्द", "गले में खराश", "खराश", "गला दर्द"],
+    },
+    "runny nose": {
+        "en": ["runny nose", "running nose", "blocked nose", "stuffy nose", "nasal congestion", "sneezing", "cold"],
+        "hinglish": ["naak behna", "nak behna", "behti naak", "bahti naak", "naak band", "zukam", "jukam", "zukaam", "jukaam", "sardi"],
+        "hi": ["नाक बहना", "बहती नाक", "नाक बंद", "जुकाम", "ज़ुकाम", "सर्दी"],
+    },
+    "body ache": {
+        "en": ["body ache", "body pain", "bodyache", "muscle pain", "muscle ache", "joint pain", "aches"],
+        "hinglish": ["badan dard", "badan me dard", "badan mein dard", "sharir dard", "sharir me dard", "jodo me dard", "hath pair me dard"],
+        "hi": ["बदन दर्द", "बदन में दर्द", "शरीर में दर्द", "शरीर दर्द", "जोड़ों में दर्द"],
+    },
+    "difficulty breathing": {
+        "en": ["difficulty breathing", "shortness of breath", "breathlessness", "breathless", "short of breath", "trouble breathing", "cant breathe", "can't breathe"],
+        "hinglish": ["saans lene me taklif", "saans lene mein taklif", "saans lene me dikkat", "saans lene mein dikkat", "saans phoolna", "saans fulna", "sans fulna", "saans ki taklif", "dam ghutna"],
+        "hi": ["सांस लेने में तकलीफ", "साँस लेने में तकलीफ", "सांस लेने में दिक्कत", "सांस फूलना", "साँस फूलना", "दम घुटना"],
+    },
+    "chest pain": {
+        "en": ["chest pain", "chest tightness", "pain in chest", "chest discomfort"],
+        "hinglish": ["seene me dard", "seene mein dard", "sine me dard", "chhati me dard", "chhati mein dard", "chati me dard"],
+        "hi": ["सीने में दर्द", "छाती में दर्द", "सीने में जकड़न"],
+    },
+    "nausea": {
+        "en": ["nausea", "nauseous", "queasy", "feel like vomiting"],
+        "hinglish": ["jee machalna", "ji machalna", "ji machla", "matli", "ji ghabrana", "ulti jaisa"],
+        "hi": ["जी मिचलाना", "मतली", "जी घबराना", "उल्टी जैसा"],
+    },
+    "vomiting": {
+        "en": ["vomiting", "vomit", "vomited", "throwing up", "threw up", "puking"],
+        "hinglish": ["ulti", "ultiyan", "ulti ho rahi", "ulti hona"],
+        "hi": ["उल्टी", "उलटी", "उल्टियां", "उल्टियाँ"],
+    },
+    "diarrhea": {
+        "en": ["diarrhea", "diarrhoea", "loose motion", "loose motions", "loose stools", "watery stool"],
+        "hinglish": ["dast", "patle dast", "pet kharab", "pait kharab"],
+        "hi": ["दस्त", "पतले दस्त", "पेट खराब"],
+    },
+    "loss of taste": {
+        "en": ["loss of taste", "no taste", "cant taste", "can't taste", "lost taste", "lost my taste"],
+        "hinglish": ["swad nahi", "swaad nahi", "swad nahi aa raha", "taste nahi", "taste nahi aa raha", "munh ka swad"],
+        "hi": ["स्वाद नहीं", "स्वाद नहीं आ रहा", "स्वाद चला गया"],
+    },
+    "loss of smell": {
+        "en": ["loss of smell", "no smell", "cant smell", "can't smell", "lost smell", "lost my smell"],
+        "hinglish": ["gandh nahi", "smell nahi", "smell nahi aa rahi", "khushboo nahi", "sungh nahi"],
+        "hi": ["गंध नहीं", "महक नहीं", "खुशबू नहीं", "सूंघ नहीं"],
+    },
+    "chills": {
+        "en": ["chills", "shivering", "shivers", "rigors", "feeling cold"],
+        "hinglish": ["thand lagna", "thand lag rahi", "thand lagti", "kapkapi", "kanpkanpi", "thithurna"],
+        "hi": ["ठंड लगना", "ठंड लग रही", "कंपकंपी", "कँपकँपी"],
+    },
+}
+
+# Hindi display names for summaries
+HINDI_NAMES: Dict[str, str] = {
+    "fever": "बुखार", "cough": "खांसी", "fatigue": "थकान", "headache": "सिरदर्द",
+    "sore throat": "गले में खराश", "runny nose": "नाक बहना", "body ache": "बदन दर्द",
+    "difficulty breathing": "सांस लेने में तकलीफ", "chest pain": "सीने में दर्द",
+    "nausea": "मतली", "vomiting": "उल्टी", "diarrhea": "दस्त",
+    "loss of taste": "स्वाद न आना", "loss of smell": "गंध न आना", "chills": "ठंड लगना",
+}
+
+RED_FLAG_LEXICON: Dict[str, List[str]] = {
+    "blood": ["blood", "bleeding", "khoon", "khun", "खून", "रक्त"],
+    "unconsciousness": ["unconscious", "fainted", "fainting", "behosh", "behoshi", "बेहोश", "बेहोशी"],
+    "seizure": ["seizure", "fits", "mirgi", "daura", "दौरा", "मिर्गी"],
+    "confusion": ["confusion", "confused", "disoriented"],
+    "severe dehydration": ["no urine", "peshab nahi", "पेशाब नहीं"],
+}
+
+SEVERITY_LEXICON: Dict[str, List[str]] = {
+    "severe": [
+        "severe", "very", "extreme", "extremely", "unbearable", "intense", "worse", "worsening", "high",
+        "bahut", "bohot", "bahot", "tez", "jyada", "zyada", "jada", "bhayankar", "asahniya",
+        "बहुत", "तेज", "तेज़", "ज्यादा", "ज़्यादा", "भयंकर", "असहनीय",
+    ],
+    "mild": [
+        "mild", "slight", "slightly", "little", "bit", "low",
+        "halka", "halki", "thoda", "thodi", "kam",
+        "हल्का", "हल्की", "थोड़ा", "थोड़ी", "कम",
+    ],
+}
+
+# English negators (and "bina") precede what they negate ("no fever", "not severe");
+# Hindi / Hinglish ones follow it ("bukhar nahi", "खांसी नहीं")
+NEGATION_PREFIXES = {"no", "not", "without", "bina", "बिना"}
+NEGATION_SUFFIXES = {"nahi", "nahin", "nhi", "na", "mat", "नहीं", "नही", "ना"}
+NEGATIONS = NEGATION_PREFIXES | NEGATION_SUFFIXES
+# Negation is easy to misread, so any negator scales confidence below the default
+# LOCAL_EXTRACTOR_MIN_CONFIDENCE and the text goes to the LLM
+NEGATION_CONFIDENCE_FACTOR = 0.7
+
+# Function words that carry no clinical meaning; they count towards coverage
+STOPWORDS = {
+    # English
+    "i", "im", "i'm", "me", "my", "have", "has", "had", "having", "been", "am", "is", "are", "was", "were",
+    "a", "an", "the", "and", "or", "with", "since", "for", "from", "also", "some", "feel", "feeling",
+    "getting", "got", "of", "in", "on", "at", "to", "it", "there", "past", "last", "ago", "days", "day",
+    "but", "too", "again", "now", "today", "yesterday", "this", "morning", "night", "evening",
+    # Hinglish
+    "mujhe", "muje", "mere", "mera", "meri", "hai", "he", "hain", "ho", "raha", "rahi", "rahe", "tha", "thi",
+    "hun", "hoon", "aa", "lekin", "par", "se", "me", "mein", "aur", "bhi", "ka", "ki", "ke", "ko",
+    "kal", "parso", "aaj", "abhi", "sath", "saath",
+    "lag", "lagta", "lagti", "bhut", "ek", "do", "teen", "char", "paanch", "din", "hafte", "hafta", "raat", "subah",
+    # Hindi
+    "मुझे", "मेरे", "मेरा", "मेरी", "है", "हैं", "हो", "रहा", "रही", "रहे", "था", "थी", "से", "में", "और",
+    "भी", "का", "की", "के", "को", "कल", "परसों", "आज", "अभी", "साथ", "दिन", "हफ्ते", "हफ़्ते", "रात", "सुबह",
+}
+
+_NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "ten": 10,
+    "ek": 1, "do": 2, "teen": 3, "char": 4, "chaar": 4, "paanch": 5, "panch": 5, "che": 6, "saat": 7, "das": 10,
+    "एक": 1, "दो": 2, "तीन": 3, "चार": 4, "पांच": 5, "पाँच": 5, "छह": 6, "सात": 7, "दस": 10,
+}
+_UNIT_DAYS = {
+    "day": 1, "days": 1, "din": 1, "दिन": 1, "dino": 1, "दिनों": 1,
+    "week": 7, "weeks": 7, "hafte": 7, "hafta": 7, "हफ्ते": 7, "हफ़्ते": 7, "हफ्ता": 7, "saptah": 7, "सप्ताह": 7,
+    "month": 30, "months": 30, "mahina": 30, "mahine": 30, "महीना": 30, "महीने": 30,
+}
+_RELATIVE_DAYS = {"kal": 1, "कल": 1, "yesterday": 1, "parso": 2, "परसों": 2}
+
+_TOKEN_RE = re.compile(r"[^\s,.;:!?।()\[\]{}\"/\\-]+")
+_DEVANAGARI_RE = re.compile(r"[ऀ-ॿ]")
+_NUMBER_RE = re.compile(r"^\d+$")
+_DEVANAGARI_DIGITS = str.maketrans("०१२३४५६७८९", "0123456789")
+_REPEATS_RE = re.compile(r"([a-z])\1+")
+
+
+def _fold(token: str) -> str:
+    """Normalise a token so common transliteration variants compare equal"""
+    token = unicodedata.normalize("NFC", token.lower()).translate(_DEVANAGARI_DIGITS)
+    token = token.replace("़", "").replace("'", "")  # nukta, apostrophes
+    if token.isascii():
+        token = token.replace("ee", "i").replace("oo", "u")
+        token = _REPEATS_RE.sub(r"\1", token)
+    return token
+
+
+def _tokenize(text: str) -> List[str]:
+    return [_fold(token) for token in _TOKEN_RE.findall(text)]
+
+
+def _build_phrase_table(lexicon: Dict[str, List[str]]) -> Tuple[Dict[Tuple[str, ...], str], int]:
+    table: Dict[Tuple[str, ...], str] = {}
+    longest = 1
+    for canonical, phrases in lexicon.items():
+        for phrase in [canonical] + phrases:
+            key = tuple(_tokenize(phrase))
+            if key:
+                table.setdefault(key, canonical)
+                longest = max(longest, len(key))
+    return table, longest
+
+
+# Only symptoms the predictor knows about are extracted
+_KNOWN_SYMPTOMS = {
+    name: variants for name, variants in SYMPTOM_LEXICON.items()
+    if name in predictor.symptom_mapping
+}
+_SYMPTOM_TABLE, _SYMPTOM_MAX_LEN = _build_phrase_table({
+    name: [phrase for phrases in variants.values() for phrase in phrases]
+    for name, variants in _KNOWN_SYMPTOMS.items()
+})
+_RED_FLAG_TABLE, _RED_FLAG_MAX_LEN = _build_phrase_table(RED_FLAG_LEXICON)
+_SEVERITY_WORDS = {_fold(word): level for level, words in SEVERITY_LEXICON.items() for word in words}
+_NEGATIONS = {_fold(word) for word in NEGATIONS}
+_NEGATION_PREFIXES = {_fold(word) for word in NEGATION_PREFIXES}
+_NEGATION_SUFFIXES = {_fold(word) for word in NEGATION_SUFFIXES}
+_STOPWORDS = {_fold(word) for word in STOPWORDS}
+_NUMBER_WORDS_FOLDED = {_fold(word): value for word, value in _NUMBER_WORDS.items()}
+_UNIT_DAYS_FOLDED = {_fold(word): value for word, value in _UNIT_DAYS.items()}
+_RELATIVE_DAYS_FOLDED = {_fold(word): value for word, value in _RELATIVE_DAYS.items()}
+_ENGLISH_TOKENS = {
+    token for name, variants in _KNOWN_SYMPTOMS.items()
+    for phrase in [name] + variants["en"] for token in _tokenize(phrase)
+}
+_HINGLISH_MARKERS = {
+    token for variants in _KNOWN_SYMPTOMS.values()
+    for phrase in variants["hinglish"] for token in _tokenize(phrase)
+} | {_fold(word) for word in (
+    "mujhe", "hai", "hain", "se", "raha", "rahi", "nahi", "nahin", "aur", "bhi", "mein", "din", "bahut", "thoda"
+)}
+# Short tokens that are also common English words never mark text as Hinglish
+_HINGLISH_MARKERS -= _ENGLISH_TOKENS | {_fold(word) for word in ("a", "i", "me", "he", "do", "to", "in", "on")}
+
+
+@dataclass
+class LocalExtraction:
+    """Result of local symptom extraction"""
+    symptoms: List[str] = field(default_factory=list)
+    negated: List[str] = field(default_factory=list)
+    red_flags: List[str] = field(default_factory=list)
+    severity: Optional[str] = None
+    duration_days: Optional[int] = None
+    language: str = "English"
+    confidence: float = 0.0
+
+    def to_analysis(self, selected_symptoms: List[str], language: str = "en") -> Dict:
+        """Shape the result like the LLM analysis (see AdditionalDetailsAnalysis)"""
+        selected = {s.strip().lower() for s in selected_symptoms}
+        additional = [s for s in self.symptoms if s not in selected]
+
+        severity_parts = []
+        if self.severity:
+            severity_parts.append(self.severity)
+        if self.duration_days:
+            severity_parts.append(f"{self.duration_days} day{'s' if self.duration_days != 1 else ''}")
+
+        if language == "hi":
+            names = ", ".join(HINDI_NAMES.get(s, s) for s in self.symptoms) or "कोई नया लक्षण नहीं"
+            summary = f"बताए गए लक्षण: {names}"
+            if self.duration_days:
+                summary += f" ({self.duration_days} दिन से)"
+        else:
+            names = ", ".join(self.symptoms) or "no new symptoms"
+            summary = f"Reported symptoms: {names}"
+            if self.duration_days:
+                summary += f" for {self.duration_days} day{'s' if self.duration_days != 1 else ''}"
+
+        return {
+            "additional_symptoms": additional,
+            "severity": ", ".join(severity_parts) or None,
+            "context": None,
+            "red_flags": self.red_flags,
+            "language_detected": self.language,
+            "summary": summary,
+        }
+
+
+def _match(tokens: List[str], start: int, table: Dict[Tuple[str, ...], str], max_len: int) -> Tuple[Optional[str], int]:
+    for length in range(min(max_len, len(tokens) - start), 0, -1):
+        canonical = table.get(tuple(tokens[start:start + length]))
+        if canonical is not None:
+            return canonical, length
+    return None, 0
+
+
+def _negated(tokens: List[str], start: int, end: int) -> bool:
+    """Whether tokens[start:end] is negated; a prefix may sit before a severity word ("no severe headache")"""
+    while start > 0 and tokens[start - 1] in _SEVERITY_WORDS:
+        start -= 1
+    before = tokens[start - 1] if start > 0 else None
+    after = tokens[end] if end < len(tokens) else None
+    return before in _NEGATION_PREFIXES or after in _NEGATION_SUFFIXES
+
+
+def extract_symptoms(text: str) -> LocalExtraction:
+    """
+    Extract symptoms, red flags, severity and duration from free text.
+    Confidence is the share of tokens the extractor could account for, scaled
+    by NEGATION_CONFIDENCE_FACTOR when the text contains a negator; it is 0
+    when nothing clinically relevant was found.
+    """
+    result = LocalExtraction()
+    tokens = _tokenize(text or "")
+    if not tokens:
+        return result
+
+    covered = [False] * len(tokens)
+    severities = []
+    has_negation = False
+    i = 0
+    while i < len(tokens):
+        symptom, length = _match(tokens, i, _SYMPTOM_TABLE, _SYMPTOM_MAX_LEN)
+        if symptom:
+            target = result.negated if _negated(tokens, i, i + length) else result.symptoms
+            if symptom not in target:
+                target.append(symptom)
+            for j in range(i, i + length):
+                covered[j] = True
+            i += length
+            continue
+
+        flag, length = _match(tokens, i, _RED_FLAG_TABLE, _RED_FLAG_MAX_LEN)
+        if flag:
+            if flag not in result.red_flags and not _negated(tokens, i, i + length):
+                result.red_flags.append(flag)
+            for j in range(i, i + length):
+                covered[j] = True
+            i += length
+            continue
+
+        token = tokens[i]
+        if token in _SEVERITY_WORDS:
+            # A run such as "very high" is negated as a whole ("not very high")
+            end = i
+            while end < len(tokens) and tokens[end] in _SEVERITY_WORDS:
+                covered[end] = True
+                end += 1
+            if not _negated(tokens, i, end):
+                severities.extend(_SEVERITY_WORDS[word] for word in tokens[i:end])
+            i = end
+            continue
+        if token in _UNIT_DAYS_FOLDED and i > 0:
+            previous = tokens[i - 1]
+            count = int(previous) if _NUMBER_RE.match(previous) else _NUMBER_WORDS_FOLDED.get(previous)
+            if count:
+                result.duration_days = count * _UNIT_DAYS_FOLDED[token]
+                covered[i - 1] = covered[i] = True
+        elif token in _RELATIVE_DAYS_FOLDED and result.duration_days is None:
+            result.duration_days = _RELATIVE_DAYS_FOLDED[token]
+            covered[i] = True
+
+        if token in _NEGATIONS:
+            has_negation = True
+        if token in _STOPWORDS or token in _NEGATIONS or _NUMBER_RE.match(token):
+            covered[i] = True
+        i += 1
+
+    # Symptoms mentioned both ways ("fever, no cough... cough nahi") keep the positive mention
+    result.negated = [s for s in result.negated if s not in result.symptoms]
+
+    if "severe" in severities:
+        result.severity = "severe"
+    elif "mild" in severities:
+        result.severity = "mild"
+
+    if _DEVANAGARI_RE.search(text):
+        result.language = "Hindi" if not re.search(r"[a-zA-Z]", text) else "Hinglish"
+    elif any(token in _HINGLISH_MARKERS for token in tokens):
+        result.language = "Hinglish"
+
+    if result.symptoms or result.negated or result.red_flags:
+        confidence = sum(covered) / len(tokens)
+        if has_negation:
+            confidence *= NEGATION_CONFIDENCE_FACTOR
+        result.confidence = round(confidence, 3)
+    return result
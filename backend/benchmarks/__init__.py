@@ -0,0 +1,6 @@
+"""
+Local benchmarks (run from the backend directory):
+- benchmarks.load_test: end-to-end load test against a local database and a fake Groq server
+- benchmarks.fake_groq: the OpenAI-compatible Groq stand-in on its own
+- benchmarks.ml_inference: prediction engine micro-benchmarks (also a pytest-benchmark suite)
+"""
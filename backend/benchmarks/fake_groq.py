@@ -0,0 +1,209 @@
+"""
+Fake Groq Server
+Local OpenAI-compatible stand-in for Groq's chat completions endpoint, so
+benchmarks measure the backend instead of a remote LLM. Each request sleeps
+for a configurable latency (plus jitter) and answers with canned text, a JSON
+object when `response_format` asks for one, or an SSE stream when
+`"stream": true`. Usage is reported roughly like the real API (~4 chars per
+token), and a share of requests can fail with 429/500.
+
+Run standalone (from the backend directory) and point GROQ_API_URL at it:
+    python -m benchmarks.fake_groq --port 8999 --latency-ms 400 --jitter-ms 150
+    GROQ_API_URL=http://127.0.0.1:8999/openai/v1/chat/completions
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+CANNED_TEXT = (
+    "**Over-the-Counter Medicines:**\n"
+    "- Paracetamol 500mg - 1 tablet, 3 times daily after meals, for 3 days\n\n"
+    "**Home Remedies:**\n"
+    "- Drink plenty of warm fluids and rest well\n\n"
+    "**Precautions:**\n"
+    "- Avoid cold drinks and crowded places until the fever settles\n\n"
+    "**When to See a Doctor:**\n"
+    "- High fever for more than 3 days, difficulty breathing or chest pain\n\n"
+    "**Disclaimer:** This information is for educational purposes only."
+)
+
+CANNED_JSON = {
+    "additional_symptoms": ["fatigue"],
+    "severity": "moderate",
+    "context": "Symptoms started two days ago",
+    "red_flags": [],
+    "language_detected": "en",
+    "summary": "Mild viral illness pattern without warning signs",
+}
+
+
+class FakeGroqConfig:
+    def __init__(self, latency_ms: float = 300.0, jitter_ms: float = 100.0, stream_chunk_ms: float = 20.0,
+                 error_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.stream_chunk_ms = stream_chunk_ms
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def delay(self) -> float:
+        with self.lock:
+            jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000.0
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            self.requests += 1
+            failed = self.error_rate > 0 and self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return failed
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _handler(config: FakeGroqConfig):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, body: Dict):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self._send_json(400, {"error": {"message": "invalid JSON body"}})
+                return
+            if self.path != COMPLETIONS_PATH:
+                self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+                return
+
+            time.sleep(config.delay())
+            if config.should_fail():
+                status = config.random.choice((429, 500))
+                self._send_json(status, {"error": {"message": "simulated failure", "type": "fake_groq"}})
+                return
+
+            json_mode = (payload.get("response_format") or {}).get("type") == "json_object"
+            text = json.dumps(CANNED_JSON) if json_mode else CANNED_TEXT
+            prompt = " ".join(str(message.get("content", "")) for message in payload.get("messages", []))
+            model = payload.get("model", "fake")
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+            usage = {
+                "prompt_tokens": _tokens(prompt),
+                "completion_tokens": _tokens(text),
+                "total_tokens": _tokens(prompt) + _tokens(text),
+            }
+
+            if payload.get("stream"):
+                self._stream(completion_id, model, text)
+                return
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        def _stream(self, completion_id: str, model: str, text: str):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            words = text.split(" ")
+            for index, word in enumerate(words):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word + (" " if index < len(words) - 1 else "")},
+                                 "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(config.stream_chunk_ms / 1000.0)
+            done = {"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+
+class FakeGroqServer:
+    """Threaded server; use as a context manager or start()/stop()"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: Optional[FakeGroqConfig] = None):
+        self.config = config or FakeGroqConfig()
+        self._server = ThreadingHTTPServer((host, port), _handler(self.config))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{COMPLETIONS_PATH}"
+
+    def start(self) -> "FakeGroqServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-groq", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeGroqServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible Groq stand-in for local benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8999)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Mean time before the response starts")
+    parser.add_argument("--jitter-ms", type=float, default=100.0, help="Uniform +/- jitter around the latency")
+    parser.add_argument("--stream-chunk-ms", type=float, default=20.0, help="Delay between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 429/500")
+    args = parser.parse_args()
+
+    server = FakeGroqServer(args.host, args.port, FakeGroqConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        stream_chunk_ms=args.stream_chunk_ms, error_rate=args.error_rate
+    ))
+    print(f"Fake Groq listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
@@ -0,0 +1,482 @@
+"""
+Local Load Test
+Starts the API (uvicorn subprocess) against a local SQLite file or a given
+PostgreSQL URL, with Groq replaced by benchmarks.fake_groq, then drives a
+weighted mix of register/login/predict/history/chat/notification calls from
+N concurrent virtual users. Every virtual user registers and logs in first,
+then picks actions by weight until the run ends.
+
+The report has RPS, p50/p95/p99 latency and error counts per endpoint, plus
+the SQL statements per request each route executed (from the server's
+/metrics). It is written as JSON so runs can be compared across commits:
+
+    python -m benchmarks.load_test --concurrency 20 --duration 60 --output baseline.json
+    python -m benchmarks.load_test --compare baseline.json --fail-on-regression 15
+    python -m benchmarks.load_test --database-url postgresql+psycopg2://postgres:pw@localhost/bench
+
+Run from the backend directory. The database should be a throwaway one:
+tables are created if missing and the run adds users and predictions.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+from benchmarks.fake_groq import FakeGroqConfig, FakeGroqServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FEATURE_NAMES = os.path.join(BACKEND_DIR, "..", "ml-model", "models", "feature_names.json")
+PASSWORD = "bench-password-123"
+
+# action -> (method, route template); the template matches the server's metric labels
+ENDPOINTS = {
+    "register": ("POST", "/api/auth/register"),
+    "login": ("POST", "/api/auth/login"),
+    "refresh": ("POST", "/api/auth/refresh"),
+    "me": ("GET", "/api/auth/me"),
+    "predict": ("POST", "/api/predictions/predict"),
+    "history": ("GET", "/api/predictions/history"),
+    "notifications": ("GET", "/api/notifications"),
+    "notification_stats": ("GET", "/api/notifications/stats"),
+    "chat": ("POST", "/api/chat"),
+    "chat_session": ("POST", "/api/chat/sessions/{session_id}/messages"),
+}
+
+DEFAULT_MIX = {
+    "predict": 30, "history": 20, "notifications": 12, "notification_stats": 5,
+    "chat_session": 12, "chat": 5, "me": 8, "refresh": 5, "login": 3,
+}
+
+_SAMPLE = re.compile(r'^(\w+)\{(.*)\} ([0-9.eE+-]+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def _symptom_names() -> List[str]:
+    try:
+        with open(FEATURE_NAMES) as f:
+            return [name.replace("_", " ") for name in json.load(f)]
+    except (OSError, ValueError):
+        return ["fever", "cough", "fatigue", "headache", "sore throat", "body ache", "nausea"]
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    # Nearest rank
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_mix(text: Optional[str]) -> Dict[str, int]:
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS or name == "register":
+            raise SystemExit(f"Unknown action '{name}' (choose from {', '.join(a for a in ENDPOINTS if a != 'register')})")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def scrape_route_metrics(text: str) -> Dict[Tuple[str, str], Dict[str, float]]:
+    """(method, route) -> {"requests", "statements"} from the Prometheus text"""
+    routes: Dict[Tuple[str, str], Dict[str, float]] = defaultdict(lambda: {"requests": 0.0, "statements": 0.0})
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        labels = dict(_LABEL.findall(labels))
+        key = (labels.get("method"), labels.get("route"))
+        if name == "http_request_duration_seconds_count":
+            routes[key]["requests"] += float(value)
+        elif name == "http_request_db_statements_total":
+            routes[key]["statements"] += float(value)
+    return routes
+
+
+# ---------------------------------------------------------------------------
+# Environment: database, fake Groq and the API server
+# ---------------------------------------------------------------------------
+
+def prepare_database(database_url: str):
+    """Create missing tables (the app itself relies on migrations)"""
+    env = dict(os.environ, DATABASE_URL=database_url, DEBUG="false")
+    script = (
+        "from app.core.database import Base, engine\n"
+        "import app.models.models, app.models.notification, app.models.chat_session\n"
+        "import app.models.stats, app.models.refresh_token\n"
+        "Base.metadata.create_all(engine)\n"
+    )
+    subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, env=env, check=True)
+
+
+def start_server(database_url: str, groq_url: str, port: int, workers: int, bcrypt_rounds: Optional[int],
+                 log_path: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        GROQ_API_KEY="fake-benchmark-key",
+        GROQ_API_URL=groq_url,
+        DEBUG="false",
+        METRICS_ENABLED="true",
+    )
+    if bcrypt_rounds:
+        env["BCRYPT_ROUNDS"] = str(bcrypt_rounds)
+    log = open(log_path, "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 90.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"API server not ready after {timeout:.0f}s")
+
+
+# ---------------------------------------------------------------------------
+# Virtual users
+# ---------------------------------------------------------------------------
+
+class Recorder:
+    def __init__(self):
+        self.measuring = False
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.status_codes: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, action: str, seconds: float, status_code: int):
+        if not self.measuring:
+            return
+        self.latencies[action].append(seconds)
+        self.status_codes[action][status_code] += 1
+        if status_code >= 400 or status_code == 0:
+            self.errors[action] += 1
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, mix: Dict[str, int], rng: random.Random,
+                 symptoms: List[str]):
+        self.client = client
+        self.recorder = recorder
+        self.actions = list(mix)
+        self.weights = [mix[action] for action in self.actions]
+        self.rng = rng
+        self.symptoms = symptoms
+        self.email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+        self.access_token: Optional[str] = None
+        self.refresh_token: Optional[str] = None
+        self.session_id: Optional[str] = None
+
+    async def _call(self, action: str, path: Optional[str] = None, auth: bool = True, **kwargs) -> Optional[httpx.Response]:
+        method, route = ENDPOINTS[action]
+        headers = {"Authorization": f"Bearer {self.access_token}"} if auth and self.access_token else None
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path or route, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(action, time.perf_counter() - started, 0)
+            return None
+        self.recorder.record(action, time.perf_counter() - started, response.status_code)
+        return response
+
+    def _store_tokens(self, response: Optional[httpx.Response]):
+        if response is not None and response.status_code == 200:
+            data = response.json()
+            self.access_token = data["access_token"]
+            self.refresh_token = data.get("refresh_token") or self.refresh_token
+
+    async def setup(self):
+        await self._call("register", auth=False, json={
+            "email": self.email, "password": PASSWORD, "full_name": "Bench User",
+            "age": self.rng.randint(5, 85), "gender": self.rng.choice(["M", "F", "O"]),
+            "weight": round(self.rng.uniform(20, 100), 1),
+        })
+        await self.login()
+
+    async def login(self):
+        self._store_tokens(await self._call("login", auth=False, data={"username": self.email, "password": PASSWORD}))
+
+    async def refresh(self):
+        if not self.refresh_token:
+            return await self.login()
+        self._store_tokens(await self._call("refresh", auth=False, json={"refresh_token": self.refresh_token}))
+
+    async def me(self):
+        await self._call("me")
+
+    async def predict(self):
+        # Skewed like real traffic: a few symptoms dominate
+        count = min(len(self.symptoms), self.rng.choice([1, 2, 2, 3, 3, 4, 5]))
+        weights = [1.0 / (rank + 1) for rank in range(len(self.symptoms))]
+        chosen = set()
+        while len(chosen) < count:
+            chosen.add(self.rng.choices(self.symptoms, weights=weights)[0])
+        await self._call("predict", json={
+            "symptoms": sorted(chosen),
+            "age": self.rng.randint(5, 85),
+            "gender": self.rng.choice(["M", "F"]),
+            "duration_days": self.rng.randint(1, 10),
+        })
+
+    async def history(self):
+        await self._call("history")
+
+    async def notifications(self):
+        await self._call("notifications")
+
+    async def notification_stats(self):
+        await self._call("notification_stats")
+
+    async def chat(self):
+        await self._call("chat", auth=False, json={"message": "I have a mild fever and headache, what should I do?"})
+
+    async def chat_session(self):
+        if self.session_id is None:
+            response = await self.client.post("/api/chat/sessions")
+            if response.status_code != 201:
+                return
+            self.session_id = response.json()["session_id"]
+        response = await self._call(
+            "chat_session", path=f"/api/chat/sessions/{self.session_id}/messages", auth=False,
+            json={"message": "Is it safe to take paracetamol twice a day?"}
+        )
+        if response is not None and response.status_code == 404:
+            self.session_id = None
+
+    async def run(self, deadline: float):
+        await self.setup()
+        while time.monotonic() < deadline:
+            action = self.rng.choices(self.actions, weights=self.weights)[0]
+            await getattr(self, action)()
+
+
+async def drive(base_url: str, concurrency: int, duration: float, warmup: float, mix: Dict[str, int],
+                seed: int) -> Tuple[Recorder, float, Dict, Dict]:
+    recorder = Recorder()
+    symptoms = _symptom_names()
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        deadline = time.monotonic() + warmup + duration
+        users = [VirtualUser(client, recorder, mix, random.Random(seed + index), symptoms)
+                 for index in range(concurrency)]
+        tasks = [asyncio.create_task(user.run(deadline)) for user in users]
+
+        await asyncio.sleep(warmup)
+        before = scrape_route_metrics((await client.get("/metrics")).text)
+        recorder.measuring = True
+        started = time.monotonic()
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - started
+        recorder.measuring = False
+        after = scrape_route_metrics((await client.get("/metrics")).text)
+    return recorder, elapsed, before, after
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+def build_report(recorder: Recorder, elapsed: float, before: Dict, after: Dict, meta: Dict) -> Dict:
+    endpoints = {}
+    all_latencies: List[float] = []
+    for action, latencies in sorted(recorder.latencies.items()):
+        method, route = ENDPOINTS[action]
+        ordered = sorted(latencies)
+        all_latencies.extend(ordered)
+        server_after, server_before = after.get((method, route)), before.get((method, route))
+        statements = None
+        if server_after:
+            requests = server_after["requests"] - (server_before or {}).get("requests", 0.0)
+            executed = server_after["statements"] - (server_before or {}).get("statements", 0.0)
+            statements = round(executed / requests, 2) if requests else None
+        endpoints[f"{method} {route}"] = {
+            "requests": len(ordered),
+            "errors": recorder.errors.get(action, 0),
+            "status_codes": {str(code): count for code, count in sorted(recorder.status_codes[action].items())},
+            "rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(_percentile(ordered, 0.50) * 1000, 2),
+            "p95_ms": round(_percentile(ordered, 0.95) * 1000, 2),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+            "db_statements_per_request": statements,
+        }
+    all_latencies.sort()
+    return {
+        "meta": meta,
+        "total": {
+            "requests": len(all_latencies),
+            "errors": sum(recorder.errors.values()),
+            "rps": round(len(all_latencies) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(_percentile(all_latencies, 0.50) * 1000, 2),
+            "p95_ms": round(_percentile(all_latencies, 0.95) * 1000, 2),
+            "p99_ms": round(_percentile(all_latencies, 0.99) * 1000, 2),
+        },
+        "endpoints": endpoints,
+    }
+
+
+def print_report(report: Dict):
+    header = f"{'endpoint':<50} {'req':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'sql/req':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, row in list(report["endpoints"].items()) + [("TOTAL", report["total"])]:
+        statements = row.get("db_statements_per_request")
+        print(f"{name:<50} {row['requests']:>7} {row['errors']:>5} {row['rps']:>8.1f} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} "
+              f"{'' if statements is None else statements:>8}")
+
+
+def compare(report: Dict, baseline: Dict, threshold_percent: float) -> List[str]:
+    """Print deltas against a baseline; returns regressions beyond the threshold"""
+    regressions = []
+    print(f"\nCompared with {baseline['meta'].get('commit') or 'baseline'} ({baseline['meta'].get('started_at')}):")
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    for name, row in rows:
+        old = baseline["total"] if name == "TOTAL" else baseline["endpoints"].get(name)
+        if not old:
+            continue
+        deltas = []
+        for metric, higher_is_worse in (("rps", False), ("p95_ms", True), ("p99_ms", True),
+                                        ("db_statements_per_request", True)):
+            new_value, old_value = row.get(metric), old.get(metric)
+            if new_value is None or not old_value:
+                continue
+            change = (new_value - old_value) / old_value * 100
+            deltas.append(f"{metric} {change:+.1f}%")
+            worse = change if higher_is_worse else -change
+            if metric != "p99_ms" and worse > threshold_percent:
+                regressions.append(f"{name} {metric} {change:+.1f}%")
+        print(f"  {name:<50} {', '.join(deltas)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local load test with a fake Groq server")
+    parser.add_argument("--database-url", default=None, help="Defaults to a fresh SQLite file")
+    parser.add_argument("--concurrency", type=int, default=10, help="Virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds first (includes sign-ups)")
+    parser.add_argument("--mix", default=None,
+                        help="Action weights, e.g. predict=30,history=20,chat_session=10 (default: realistic mix)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--bcrypt-rounds", type=int, default=None, help="Override BCRYPT_ROUNDS for the server")
+    parser.add_argument("--groq-latency-ms", type=float, default=300.0)
+    parser.add_argument("--groq-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--groq-error-rate", type=float, default=0.0)
+    parser.add_argument("--base-url", default=None, help="Benchmark an already running server instead")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--compare", default=None, help="Baseline JSON report to compare against")
+    parser.add_argument("--fail-on-regression", type=float, default=None, metavar="PERCENT",
+                        help="Exit 1 when RPS, p95 or SQL/request is this much worse than the baseline")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    groq = None
+    server = None
+    temp_dir = tempfile.mkdtemp(prefix="loadtest-")
+    database_url = args.database_url or f"sqlite:///{os.path.join(temp_dir, 'bench.db')}"
+    log_path = os.path.join(temp_dir, "server.log")
+    base_url = args.base_url
+    try:
+        if base_url is None:
+            groq = FakeGroqServer(config=FakeGroqConfig(
+                latency_ms=args.groq_latency_ms, jitter_ms=args.groq_jitter_ms,
+                error_rate=args.groq_error_rate, seed=args.seed
+            )).start()
+            prepare_database(database_url)
+            port = _free_port()
+            server = start_server(database_url, groq.url, port, args.workers, args.bcrypt_rounds, log_path)
+            base_url = f"http://127.0.0.1:{port}"
+            wait_until_ready(base_url, server)
+
+        started_at = datetime.utcnow().isoformat()
+        print(f"Load test: {args.concurrency} users for {args.duration:.0f}s against {base_url}")
+        recorder, elapsed, before, after = asyncio.run(
+            drive(base_url, args.concurrency, args.duration, args.warmup, mix, args.seed)
+        )
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        if groq is not None:
+            groq.stop()
+
+    meta = {
+        "commit": _git_commit(),
+        "started_at": started_at,
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 2),
+        "workers": args.workers,
+        "database": database_url.split(":", 1)[0],
+        "bcrypt_rounds": args.bcrypt_rounds,
+        "groq_latency_ms": args.groq_latency_ms,
+        "groq_error_rate": args.groq_error_rate,
+        "mix": mix,
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+    }
+    report = build_report(recorder, elapsed, before, after, meta)
+    print_report(report)
+    if server is not None:
+        print(f"\nServer log: {log_path}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.fail_on_regression or 0.0)
+        if args.fail_on_regression is not None and regressions:
+            print("\nRegressions: " + "; ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
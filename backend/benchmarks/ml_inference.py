@@ -0,0 +1,311 @@
+"""
+ML Inference Benchmark
+Measures the cost of every available prediction engine on the same
+synthetic workload, so a predictor change or a replacement engine can be
+judged before deploy.
+
+Engines (whichever can be built from the model version's artifacts):
+    rules          the hand-written RuleEngine
+    forest         pickled RandomForest, one predict_proba per request
+    forest_flat    flat .npy forest (exported to a temp dir when the version has none)
+    distilled      distilled lookup table
+    batched        forest predict_proba over whole batches (per-item cost)
+    predictor_*    DiseasePredictor.predict end to end, cache hit and miss
+
+The workload is drawn from feature_names.json with realistic skew: a few
+symptoms dominate (Zipf), most requests carry 2-4 symptoms, and a share of
+requests repeat popular combinations.
+
+Reported per engine: ns/op, peak transient allocation per call
+(tracemalloc), agreement with the forest, and batch-size scaling curves.
+
+    python -m benchmarks.ml_inference
+    python -m benchmarks.ml_inference --version v3 --samples 5000 --batch-sizes 1,8,64,512 --output ml.json
+    pytest benchmarks/test_ml_inference.py --benchmark-only
+"""
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Sequence
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ML_SRC_DIR = os.path.join(BACKEND_DIR, "..", "ml-model", "src")
+
+SYMPTOM_COUNTS = (1, 2, 3, 4, 5, 6)
+SYMPTOM_COUNT_WEIGHTS = (0.15, 0.30, 0.25, 0.15, 0.10, 0.05)
+DEFAULT_BATCH_SIZES = (1, 8, 64, 256, 1024)
+
+
+def synthetic_workload(feature_names: Sequence[str], samples: int = 2000, seed: int = 0, skew: float = 1.1,
+                       repeat_share: float = 0.5, popular_pool: int = 50) -> List[List[str]]:
+    """Symptom lists (API spelling, spaces instead of underscores) with Zipf-skewed symptoms and repeats"""
+    rng = random.Random(seed)
+    names = [name.replace("_", " ") for name in feature_names]
+    rng.shuffle(names)
+    weights = [1.0 / (rank + 1) ** skew for rank in range(len(names))]
+
+    def draw() -> List[str]:
+        count = min(len(names), rng.choices(SYMPTOM_COUNTS, weights=SYMPTOM_COUNT_WEIGHTS)[0])
+        chosen = set()
+        while len(chosen) < count:
+            chosen.add(rng.choices(names, weights=weights)[0])
+        symptoms = list(chosen)
+        rng.shuffle(symptoms)
+        return symptoms
+
+    popular = [draw() for _ in range(popular_pool)]
+    popular_weights = [1.0 / (rank + 1) for rank in range(popular_pool)]
+    return [
+        list(rng.choices(popular, weights=popular_weights)[0]) if rng.random() < repeat_share else draw()
+        for _ in range(samples)
+    ]
+
+
+class BatchedEngine:
+    """Scores many requests with one predict_proba call"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.version = engine.version
+
+    def vectorize(self, batch: List[List[str]]) -> np.ndarray:
+        matrix = np.zeros((len(batch), len(self.engine.feature_names)), dtype=np.float32)
+        index = self.engine.feature_index
+        key = self.engine.feature_key
+        for row, symptoms in enumerate(batch):
+            for symptom in symptoms:
+                column = index.get(key(symptom))
+                if column is not None:
+                    matrix[row, column] = 1.0
+        return matrix
+
+    def predict_batch(self, batch: List[List[str]]) -> List[tuple]:
+        probabilities = self.engine.model.predict_proba(self.vectorize(batch))
+        best = probabilities.argmax(axis=1)
+        labels = self.engine.labels
+        return [(labels[b], round(float(p[b]), 4)) for b, p in zip(best.tolist(), probabilities)]
+
+    def predict(self, symptoms: List[str]) -> tuple:
+        return self.predict_batch([symptoms])[0]
+
+
+def _export_flat_forest(model, directory: str) -> Optional[str]:
+    # The exporter lives with the training code
+    if ML_SRC_DIR not in sys.path:
+        sys.path.insert(0, ML_SRC_DIR)
+    try:
+        from artifacts import export_flat_forest
+    except ImportError:
+        return None
+    export_flat_forest(model, directory)
+    return directory
+
+
+def load_engines(version: Optional[str] = None, export_flat: bool = True) -> Dict:
+    """name -> engine for everything that can be built; missing artifacts are skipped"""
+    from app.core.config import settings
+    from app.services.ml_service import RuleEngine
+    from app.services.model_registry import DistilledEngine, ModelEngine, ModelRegistry, LEGACY_VERSION
+    from app.services.flat_forest import has_flat_forest, load_flat_forest
+
+    engines: Dict = {"rules": RuleEngine()}
+    plain = ModelRegistry(settings.MODEL_REGISTRY_DIR, legacy_model_path=settings.MODEL_PATH,
+                          artifact_mode="pickle", use_distilled=False)
+    version = version or plain.latest_version() or LEGACY_VERSION
+    try:
+        forest = plain.load_engine(version)
+    except Exception as e:
+        print(f"No trained model for version {version} ({e}); benchmarking rules only", file=sys.stderr)
+        return engines
+    engines["forest"] = forest
+
+    directory = plain._version_dir(version)
+    flat_dir = directory if has_flat_forest(directory) else None
+    if flat_dir is None and export_flat:
+        flat_dir = _export_flat_forest(forest.model, tempfile.mkdtemp(prefix="flat-forest-"))
+    if flat_dir is not None:
+        engines["forest_flat"] = ModelEngine(version, load_flat_forest(flat_dir, mmap=True),
+                                             SimpleNamespace(classes_=forest.labels),
+                                             forest.feature_names, forest.metadata)
+
+    # min_fidelity=0: benchmark the table even when the registry would not serve it
+    distilled = ModelRegistry(settings.MODEL_REGISTRY_DIR, legacy_model_path=settings.MODEL_PATH,
+                              artifact_mode="pickle", use_distilled=True, min_fidelity=0.0)
+    try:
+        engine = distilled.load_engine(version)
+        if isinstance(engine, DistilledEngine):
+            engines["distilled"] = engine
+    except Exception as e:
+        print(f"Distilled engine unavailable: {e}", file=sys.stderr)
+
+    engines["batched"] = BatchedEngine(forest)
+    return engines
+
+
+def served_engine(engines: Dict):
+    """The engine the registry would serve by default"""
+    return engines.get("distilled") or engines.get("forest_flat") or engines.get("forest") or engines["rules"]
+
+
+def predictor_for(engine, cache_size: int):
+    """A DiseasePredictor pinned to `engine` with its own cache and no shadow scoring"""
+    from app.services.ml_service import DiseasePredictor, _PredictionCache
+
+    predictor = DiseasePredictor()
+    predictor.registry = SimpleNamespace(active=engine)
+    predictor.shadow = SimpleNamespace(active=False)
+    predictor.cache = _PredictionCache(cache_size)
+    return predictor
+
+
+def ns_per_op(fn: Callable, inputs: Sequence, min_seconds: float = 0.2, repeats: int = 3) -> float:
+    """Best-of-repeats mean time per call over `inputs`, cycling until min_seconds"""
+    best = float("inf")
+    for _ in range(repeats):
+        calls = 0
+        started = time.perf_counter_ns()
+        while True:
+            for item in inputs:
+                fn(item)
+            calls += len(inputs)
+            elapsed = time.perf_counter_ns() - started
+            if elapsed >= min_seconds * 1e9:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+
+def alloc_bytes_per_op(fn: Callable, inputs: Sequence, calls: int = 200) -> float:
+    """Mean peak transient allocation of a call (tracemalloc; timed separately, it is slow)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        total = 0
+        for item in list(inputs)[:calls]:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            fn(item)
+            total += tracemalloc.get_traced_memory()[1] - before
+        return total / min(calls, len(inputs))
+    finally:
+        tracemalloc.stop()
+
+
+def batch_scaling(engine: BatchedEngine, workload: List[List[str]], sizes: Sequence[int],
+                  min_seconds: float = 0.2) -> List[Dict]:
+    curve = []
+    for size in sizes:
+        batches = [workload[start:start + size] for start in range(0, max(len(workload) - size + 1, 1), size)]
+        batches = [batch for batch in batches if len(batch) == size] or [(workload * size)[:size]]
+        per_batch = ns_per_op(engine.predict_batch, batches[:64], min_seconds=min_seconds)
+        curve.append({"batch_size": size, "ns_per_batch": round(per_batch), "ns_per_item": round(per_batch / size)})
+    return curve
+
+
+def agreement(engines: Dict, workload: List[List[str]], reference: str = "forest") -> Dict[str, float]:
+    """Share of the workload on which each engine predicts the reference's disease"""
+    if reference not in engines:
+        reference = "rules"
+    expected = [engines[reference].predict(symptoms)[0] for symptoms in workload]
+    result = {}
+    for name, engine in engines.items():
+        predicted = [engine.predict(symptoms)[0] for symptoms in workload]
+        result[name] = round(sum(p == e for p, e in zip(predicted, expected)) / len(workload), 4)
+    return result
+
+
+def run(version: Optional[str] = None, samples: int = 2000, seed: int = 0,
+        batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES, min_seconds: float = 0.2, export_flat: bool = True) -> Dict:
+    engines = load_engines(version, export_flat=export_flat)
+    feature_names = engines["forest"].feature_names if "forest" in engines else None
+    if feature_names is None:
+        from app.services.ml_service import predictor
+        feature_names = [name.replace(" ", "_") for name in predictor.symptom_names]
+    workload = synthetic_workload(feature_names, samples=samples, seed=seed)
+    unique = len({frozenset(symptoms) for symptoms in workload})
+
+    serving = served_engine(engines)
+    predictors = {
+        "predictor_miss": predictor_for(serving, cache_size=0),
+        "predictor_hit": predictor_for(serving, cache_size=4096),
+    }
+    for symptoms in workload:
+        predictors["predictor_hit"].predict(symptoms)
+
+    results = {}
+    for name, engine in list(engines.items()) + list(predictors.items()):
+        fn = engine.predict
+        for symptoms in workload[:32]:
+            fn(symptoms)  # warm up
+        results[name] = {
+            "ns_per_op": round(ns_per_op(fn, workload, min_seconds=min_seconds)),
+            "alloc_bytes_per_op": round(alloc_bytes_per_op(fn, workload)),
+        }
+
+    for name, share in agreement(engines, workload).items():
+        results[name]["agreement"] = share
+
+    report = {
+        "meta": {
+            "version": getattr(engines.get("forest"), "version", "rules"),
+            "serving_engine": next(name for name, engine in engines.items() if engine is serving),
+            "samples": samples,
+            "unique_inputs": unique,
+            "seed": seed,
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+        },
+        "engines": results,
+    }
+    if "batched" in engines:
+        report["batch_scaling"] = {"batched": batch_scaling(engines["batched"], workload, batch_sizes, min_seconds)}
+        if "forest_flat" in engines:
+            report["batch_scaling"]["batched_flat"] = batch_scaling(
+                BatchedEngine(engines["forest_flat"]), workload, batch_sizes, min_seconds
+            )
+    return report
+
+
+def print_report(report: Dict):
+    meta = report["meta"]
+    print(f"Model {meta['version']} (serving: {meta['serving_engine']}), "
+          f"{meta['samples']} requests, {meta['unique_inputs']} unique symptom sets")
+    print(f"{'engine':<18} {'ns/op':>12} {'alloc B/op':>12} {'agreement':>10}")
+    for name, row in report["engines"].items():
+        agreement_share = row.get("agreement")
+        print(f"{name:<18} {row['ns_per_op']:>12,} {row['alloc_bytes_per_op']:>12,} "
+              f"{'' if agreement_share is None else f'{agreement_share:.2%}':>10}")
+    for name, curve in report.get("batch_scaling", {}).items():
+        print(f"\n{name}: " + ", ".join(f"{point['batch_size']}: {point['ns_per_item']:,} ns/item" for point in curve))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark prediction engines on a synthetic workload")
+    parser.add_argument("--version", default=None, help="Model version (default: latest, then legacy)")
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-sizes", default=",".join(str(size) for size in DEFAULT_BATCH_SIZES))
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="Minimum timed duration per measurement")
+    parser.add_argument("--no-export", action="store_true", help="Skip the temporary flat-forest export")
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    args = parser.parse_args()
+
+    result = run(
+        version=args.version, samples=args.samples, seed=args.seed,
+        batch_sizes=[int(size) for size in args.batch_sizes.split(",") if size.strip()],
+        min_seconds=args.min_seconds, export_flat=not args.no_export
+    )
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nReport written to {args.output}")
@@ -0,0 +1,76 @@
+"""
+pytest-benchmark suite over the same engines and workload as
+benchmarks.ml_inference (run from the backend directory):
+    pytest benchmarks/test_ml_inference.py --benchmark-only
+    pytest benchmarks/test_ml_inference.py --benchmark-only --benchmark-autosave --benchmark-compare
+"""
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from benchmarks.ml_inference import (
+    BatchedEngine, agreement, load_engines, predictor_for, served_engine, synthetic_workload
+)
+
+ENGINES = ("rules", "forest", "forest_flat", "distilled")
+BATCH_SIZES = (1, 8, 64, 512)
+
+
+@pytest.fixture(scope="module")
+def engines():
+    return load_engines()
+
+
+@pytest.fixture(scope="module")
+def workload(engines):
+    if "forest" not in engines:
+        pytest.skip("No trained model to benchmark")
+    return synthetic_workload(engines["forest"].feature_names, samples=1000, seed=0)
+
+
+def _cycle(fn, workload):
+    items = iter(())
+
+    def call():
+        nonlocal items
+        try:
+            symptoms = next(items)
+        except StopIteration:
+            items = iter(workload)
+            symptoms = next(items)
+        return fn(symptoms)
+
+    return call
+
+
+@pytest.mark.parametrize("name", ENGINES)
+def test_engine_predict(benchmark, engines, workload, name):
+    if name not in engines:
+        pytest.skip(f"{name} engine unavailable")
+    benchmark.group = "engine"
+    disease, confidence = benchmark(_cycle(engines[name].predict, workload))
+    assert disease in engines["forest"].labels and 0.0 <= confidence <= 1.0
+
+
+@pytest.mark.parametrize("size", BATCH_SIZES)
+def test_batched_predict(benchmark, engines, workload, size):
+    benchmark.group = "batch"
+    benchmark.extra_info["batch_size"] = size
+    batch = (workload * (size // len(workload) + 1))[:size]
+    assert len(benchmark(BatchedEngine(engines["forest"]).predict_batch, batch)) == size
+
+
+@pytest.mark.parametrize("cache_size", (0, 4096), ids=("miss", "hit"))
+def test_predictor(benchmark, engines, workload, cache_size):
+    benchmark.group = "predictor"
+    predictor = predictor_for(served_engine(engines), cache_size=cache_size)
+    for symptoms in workload:
+        predictor.predict(symptoms)
+    result = benchmark(_cycle(predictor.predict, workload))
+    assert result["model_version"] == engines["forest"].version
+
+
+def test_engines_agree_with_forest(engines, workload):
+    shares = agreement({name: engine for name, engine in engines.items() if name != "rules"}, workload)
+    for name, share in shares.items():
+        assert share >= 0.95, f"{name} agrees with the forest on only {share:.1%} of the workload"
@@ -0,0 +1,344 @@
+"""
+PostgreSQL -> PostgreSQL migration tool
+Replaces migrate_to_supabase.py / migrate_final.py / migrate_improved.py.
+
+- Rows are streamed with COPY ... TO STDOUT / COPY ... FROM STDIN in
+  primary-key ordered batches. Text format is used, so compatible column
+  types convert. Each batch is spooled through a bounded temporary file,
+  so memory stays flat regardless of table size.
+- Tables are copied in foreign-key order; tables at the same dependency
+  level are copied in parallel (--workers).
+- Every batch is committed on the target, and the target's MAX(primary key)
+  is the checkpoint: re-running the same command resumes where it stopped.
+- Finishes with a per-table row count + checksum comparison and resets
+  every serial/identity sequence on the target to MAX(column).
+
+The target schema must already exist. Pass --create-schema to run the
+models' create_all against the target (then `alembic stamp head`), or load
+database/init.sql first. init.sql only has the core tables; follow it with
+`alembic upgrade head`. Alembic cannot build an empty target on its own:
+its revisions only add indexes and tables on top of the base schema.
+Use a direct/session connection for the target, not a transaction pooler.
+
+Usage (from the backend directory):
+    python migrate_db.py --source postgresql://... --target postgresql://...
+    python migrate_db.py --tables users,predictions --workers 2
+    python migrate_db.py --verify-only
+Defaults come from SOURCE_DATABASE_URL / TARGET_DATABASE_URL.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import psycopg2
+from psycopg2 import sql
+from dotenv import load_dotenv
+
+logger = logging.getLogger("migrate_db")
+
+BATCH_ROWS = 50000
+SPOOL_BYTES = 32 * 1024 * 1024  # batches larger than this spill to a temp file
+SKIP_TABLES = {"alembic_version"}
+
+
+class TableInfo:
+    def __init__(self, name: str, columns: List[str], primary_key: List[str]):
+        self.name = name
+        self.columns = columns
+        self.primary_key = primary_key
+
+    @property
+    def resumable(self) -> bool:
+        """Batched, resumable copy needs a single-column primary key"""
+        return len(self.primary_key) == 1
+
+
+def connect(dsn: str):
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = False
+    return conn
+
+
+def list_tables(conn) -> List[str]:
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT table_name FROM information_schema.tables
+            WHERE table_schema = 'public' AND table_type = 'BASE TABLE'
+            ORDER BY table_name
+        """)
+        return [row[0] for row in cur.fetchall() if row[0] not in SKIP_TABLES]
+
+
+def describe_table(conn, table: str) -> TableInfo:
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = %s
+            ORDER BY ordinal_position
+        """, (table,))
+        columns = [row[0] for row in cur.fetchall()]
+        cur.execute("""
+            SELECT a.attname
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = %s::regclass AND i.indisprimary
+            ORDER BY array_position(i.indkey, a.attnum)
+        """, (f'public."{table}"',))
+        primary_key = [row[0] for row in cur.fetchall()]
+    return TableInfo(table, columns, primary_key)
+
+
+def dependency_levels(conn, tables: List[str]) -> List[List[str]]:
+    """Group tables so every table's FK parents are in an earlier level"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT child.relname, parent.relname
+            FROM pg_constraint c
+            JOIN pg_class child ON child.oid = c.conrelid
+            JOIN pg_class parent ON parent.oid = c.confrelid
+            JOIN pg_namespace n ON n.oid = child.relnamespace
+            WHERE c.contype = 'f' AND n.nspname = 'public'
+        """)
+        edges = cur.fetchall()
+    parents: Dict[str, set] = {table: set() for table in tables}
+    for child, parent in edges:
+        if child in parents and parent in parents and child != parent:
+            parents[child].add(parent)
+
+    levels = []
+    done: set = set()
+    while len(done) < len(tables):
+        level = sorted(t for t in tables if t not in done and parents[t] <= done)
+        if not level:  # FK cycle: copy the rest together and let the checks report problems
+            level = sorted(t for t in tables if t not in done)
+        levels.append(level)
+        done.update(level)
+    return levels
+
+
+class TableCopier:
+    def __init__(self, source_dsn: str, target_dsn: str, batch_rows: int = BATCH_ROWS):
+        self.source_dsn = source_dsn
+        self.target_dsn = target_dsn
+        self.batch_rows = batch_rows
+
+    def _scalar(self, conn, query, params=None):
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            return cur.fetchone()[0]
+
+    def _copy_batch(self, source, target, select_query, table_ident, column_idents) -> int:
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES, mode="w+b") as spool:
+            with source.cursor() as cur:
+                cur.copy_expert(
+                    sql.SQL("COPY ({}) TO STDOUT").format(select_query), spool
+                )
+            spool.seek(0)
+            with target.cursor() as cur:
+                cur.copy_expert(sql.SQL("COPY {} ({}) FROM STDIN").format(table_ident, column_idents), spool)
+                rows = cur.rowcount
+        target.commit()
+        return rows
+
+    def copy(self, info: TableInfo, target_columns: List[str]) -> Dict:
+        started = time.perf_counter()
+        columns = [c for c in info.columns if c in set(target_columns)]
+        dropped = [c for c in info.columns if c not in set(target_columns)]
+        if dropped:
+            logger.warning(f"{info.name}: source columns missing on target are skipped: {dropped}")
+        table_ident = sql.Identifier(info.name)
+        column_idents = sql.SQL(", ").join(sql.Identifier(c) for c in columns)
+
+        source = connect(self.source_dsn)
+        target = connect(self.target_dsn)
+        copied = 0
+        try:
+            # REPEATABLE READ: every batch of this table sees the same snapshot
+            source.set_session(isolation_level="REPEATABLE READ", readonly=True)
+            total = self._scalar(source, sql.SQL("SELECT count(*) FROM {}").format(table_ident))
+
+            if not info.resumable:
+                existing = self._scalar(target, sql.SQL("SELECT count(*) FROM {}").format(table_ident))
+                if existing:
+                    logger.info(f"{info.name}: target already has {existing} rows and no single-column key; skipped")
+                    return {"table": info.name, "copied": 0, "source_rows": total, "skipped": True}
+                select_query = sql.SQL("SELECT {} FROM {}").format(column_idents, table_ident)
+                copied = self._copy_batch(source, target, select_query, table_ident, column_idents)
+            else:
+                pk = sql.Identifier(info.primary_key[0])
+                last = self._scalar(target, sql.SQL("SELECT max({}) FROM {}").format(pk, table_ident))
+                if last is not None:
+                    logger.info(f"{info.name}: resuming after {info.primary_key[0]}={last}")
+                while True:
+                    where = sql.SQL("WHERE {} > %s").format(pk) if last is not None else sql.SQL("")
+                    params = (last,) if last is not None else None
+                    batch_end = self._scalar(source, sql.SQL(
+                        "SELECT max({pk}) FROM (SELECT {pk} FROM {t} {where} ORDER BY {pk} LIMIT {n}) AS batch"
+                    ).format(pk=pk, t=table_ident, where=where, n=sql.Literal(self.batch_rows)), params)
+                    if batch_end is None:
+                        break
+                    bounds = sql.SQL("{pk} <= {end}").format(pk=pk, end=sql.Literal(batch_end))
+                    if last is not None:
+                        bounds = sql.SQL("{pk} > {start} AND ").format(pk=pk, start=sql.Literal(last)) + bounds
+                    select_query = sql.SQL("SELECT {} FROM {} WHERE {} ORDER BY {}").format(
+                        column_idents, table_ident, bounds, pk
+                    )
+                    copied += self._copy_batch(source, target, select_query, table_ident, column_idents)
+                    last = batch_end
+                    logger.info(f"{info.name}: {copied} rows copied this run ({info.primary_key[0]} <= {last}, source has {total})")
+        finally:
+            source.close()
+            target.close()
+
+        seconds = time.perf_counter() - started
+        logger.info(f"{info.name}: done, {copied} rows in {seconds:.1f}s")
+        return {"table": info.name, "copied": copied, "source_rows": total, "seconds": round(seconds, 2)}
+
+
+def table_checksum(conn, info: TableInfo, columns: List[str]) -> Dict:
+    """Row count and an order-independent sum of per-row md5s over the given columns"""
+    row = sql.SQL("ROW({})::text").format(sql.SQL(", ").join(sql.Identifier(c) for c in columns))
+    query = sql.SQL(
+        "SELECT count(*), COALESCE(sum(('x' || substr(md5({row}), 1, 15))::bit(60)::bigint::numeric), 0) FROM {t}"
+    ).format(row=row, t=sql.Identifier(info.name))
+    with conn.cursor() as cur:
+        cur.execute(query)
+        count, checksum = cur.fetchone()
+    conn.rollback()
+    return {"rows": count, "checksum": str(checksum)}
+
+
+def reset_sequences(conn, tables: List[str]) -> List[str]:
+    """Point every serial/identity sequence at MAX(column) so new inserts do not collide"""
+    reset = []
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT table_name, column_name, pg_get_serial_sequence(quote_ident(table_name), column_name)
+            FROM information_schema.columns
+            WHERE table_schema = 'public'
+              AND pg_get_serial_sequence(quote_ident(table_name), column_name) IS NOT NULL
+        """)
+        for table, column, sequence in cur.fetchall():
+            if table not in tables:
+                continue
+            cur.execute(sql.SQL("SELECT setval(%s, COALESCE(max({c}), 1), max({c}) IS NOT NULL) FROM {t}").format(
+                c=sql.Identifier(column), t=sql.Identifier(table)
+            ), (sequence,))
+            reset.append(f"{sequence} -> {cur.fetchone()[0]}")
+    conn.commit()
+    return reset
+
+
+def create_schema(target_dsn: str):
+    from sqlalchemy import create_engine
+    from app.core.database import Base
+    import app.models.models  # noqa: F401 - register tables on Base.metadata
+    import app.models.notification  # noqa: F401
+    import app.models.chat_session  # noqa: F401
+    import app.models.stats  # noqa: F401
+    import app.models.refresh_token  # noqa: F401
+    # Same driver as the copy itself
+    engine = create_engine(target_dsn.replace("postgresql://", "postgresql+psycopg2://", 1))
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+
+def migrate(source_dsn: str, target_dsn: str, tables: Optional[List[str]] = None, workers: int = 4,
+            batch_rows: int = BATCH_ROWS, verify: bool = True, copy_rows: bool = True) -> Dict:
+    source = connect(source_dsn)
+    target = connect(target_dsn)
+    try:
+        available = list_tables(source)
+        target_tables = set(list_tables(target))
+        tables = tables or available
+        unknown = [t for t in tables if t not in available]
+        if unknown:
+            raise ValueError(f"Tables not found on source: {unknown}")
+        missing = [t for t in tables if t not in target_tables]
+        if missing:
+            raise ValueError(f"Tables missing on target (create the schema first): {missing}")
+
+        infos = {t: describe_table(source, t) for t in tables}
+        target_columns = {t: describe_table(target, t).columns for t in tables}
+        levels = dependency_levels(source, tables)
+        source.rollback()
+        target.rollback()
+    finally:
+        source.close()
+
+    report: Dict = {"tables": {}, "levels": levels}
+    started = time.perf_counter()
+    try:
+        if copy_rows:
+            copier = TableCopier(source_dsn, target_dsn, batch_rows=batch_rows)
+            for level in levels:
+                logger.info(f"Copying {', '.join(level)}")
+                with ThreadPoolExecutor(max_workers=max(1, min(workers, len(level)))) as pool:
+                    futures = [pool.submit(copier.copy, infos[t], target_columns[t]) for t in level]
+                    for future in futures:
+                        result = future.result()
+                        report["tables"][result["table"]] = result
+
+        if verify:
+            source = connect(source_dsn)
+            try:
+                for table in tables:
+                    columns = [c for c in infos[table].columns if c in set(target_columns[table])]
+                    expected = table_checksum(source, infos[table], columns)
+                    actual = table_checksum(target, infos[table], columns)
+                    entry = report["tables"].setdefault(table, {"table": table})
+                    entry.update({"source": expected, "target": actual, "verified": expected == actual})
+                    if expected != actual:
+                        logger.error(f"{table}: verification failed (source {expected}, target {actual})")
+            finally:
+                source.close()
+            report["verified"] = all(entry.get("verified") for entry in report["tables"].values())
+
+        report["sequences"] = reset_sequences(target, tables)
+    finally:
+        target.close()
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    return report
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Streamed, parallel, resumable PostgreSQL-to-PostgreSQL migration")
+    parser.add_argument("--source", default=os.getenv("SOURCE_DATABASE_URL"), help="Source DSN (SOURCE_DATABASE_URL)")
+    parser.add_argument("--target", default=os.getenv("TARGET_DATABASE_URL"), help="Target DSN (TARGET_DATABASE_URL)")
+    parser.add_argument("--tables", default=None, help="Comma-separated tables (default: all public tables)")
+    parser.add_argument("--workers", type=int, default=4, help="Tables copied in parallel per dependency level")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS, help="Rows per COPY batch / checkpoint")
+    parser.add_argument("--create-schema", action="store_true", help="Create missing tables on the target from the models first")
+    parser.add_argument("--verify-only", action="store_true", help="Only compare checksums and reset sequences")
+    parser.add_argument("--no-verify", action="store_true", help="Skip the checksum comparison")
+    parser.add_argument("--report", default=None, help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] [%(levelname)s] %(message)s")
+    if not args.source or not args.target:
+        parser.error("--source and --target (or SOURCE_DATABASE_URL / TARGET_DATABASE_URL) are required")
+    if args.create_schema:
+        create_schema(args.target)
+
+    result = migrate(
+        args.source, args.target,
+        tables=[t.strip() for t in args.tables.split(",")] if args.tables else None,
+        workers=args.workers,
+        batch_rows=args.batch_rows,
+        verify=not args.no_verify,
+        copy_rows=not args.verify_only,
+    )
+    output = json.dumps(result, indent=2, default=str)
+    print(output)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(output)
+    sys.exit(0 if result.get("verified", True) else 1)
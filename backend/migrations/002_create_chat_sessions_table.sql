@@ -0,0 +1,15 @@
+-- Create chat_sessions table (server-side chat history)
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    id VARCHAR(32) PRIMARY KEY,
+    messages JSON NOT NULL DEFAULT '[]',
+    turn INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL
+);
+
+-- Expired sessions are purged by range scans on expires_at
+CREATE INDEX IF NOT EXISTS ix_chat_sessions_expires_at ON chat_sessions(expires_at);
+
+COMMENT ON TABLE chat_sessions IS 'Server-side chat history so clients only upload a session id and the new message';
+COMMENT ON COLUMN chat_sessions.messages IS 'Compact list of [role, content] pairs where role is u (user) or a (assistant)';
@@ -0,0 +1,21 @@
+-- Rollup tables for the admin dashboard (maintained incrementally by StatsService)
+CREATE TABLE IF NOT EXISTS stats_daily_disease (
+    day DATE NOT NULL,
+    disease VARCHAR NOT NULL,
+    predictions INTEGER NOT NULL DEFAULT 0,
+    confidence_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    confidence_count INTEGER NOT NULL DEFAULT 0,
+    feedback INTEGER NOT NULL DEFAULT 0,
+    accurate_feedback INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, disease)
+);
+
+CREATE TABLE IF NOT EXISTS stats_rollup_state (
+    name VARCHAR(32) PRIMARY KEY,
+    last_prediction_id INTEGER NOT NULL DEFAULT 0,
+    last_feedback_id INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE stats_daily_disease IS 'Predictions, confidence sums and feedback accuracy per day and predicted disease';
+COMMENT ON TABLE stats_rollup_state IS 'Highest prediction/feedback ids already folded into stats_daily_disease';
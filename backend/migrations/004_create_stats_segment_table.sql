@@ -0,0 +1,11 @@
+-- Daily prediction counts by disease, age band and gender (analytics time series)
+CREATE TABLE IF NOT EXISTS stats_daily_segment (
+    day DATE NOT NULL,
+    disease VARCHAR NOT NULL,
+    age_band VARCHAR(16) NOT NULL,
+    gender VARCHAR(16) NOT NULL,
+    predictions INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, disease, age_band, gender)
+);
+
+COMMENT ON TABLE stats_daily_segment IS 'Predictions per day, predicted disease, age band and gender; maintained by StatsService';
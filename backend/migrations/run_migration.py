@@ -1,10 +1,17 @@
 """
-Migration script to create notifications table in PostgreSQL database
-Run this script to add the notifications table to your database
+Migration script for the PostgreSQL database
+Applies every numbered SQL file in this folder in order (all are idempotent):
+- 001: notifications table
+- 002: chat_sessions table
+- 003: stats_daily_disease / stats_rollup_state rollup tables
+- 004: stats_daily_segment table
+Alembic (`alembic upgrade head`) now covers these tables too, plus every later
+schema change; new migrations go there, not in this folder.
 """
 import psycopg2
 from psycopg2 import sql
 import os
+import glob
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -17,8 +24,8 @@ DATABASE_URL = os.getenv(
 )
 
 def run_migration():
-    """Run the migration to create notifications table"""
-    print("🚀 Starting migration: Create notifications table")
+    """Run all SQL migrations in order"""
+    print("🚀 Starting migrations")
     
     try:
         # Connect to database
@@ -26,15 +33,15 @@ def run_migration():
         conn = psycopg2.connect(DATABASE_URL)
         cursor = conn.cursor()
         
-        # Read SQL migration file
-        migration_file = os.path.join(os.path.dirname(__file__), "001_create_notifications_table.sql")
-        with open(migration_file, 'r') as f:
-            migration_sql = f.read()
-        
-        # Execute migration
-        print("📝 Executing migration SQL...")
-        cursor.execute(migration_sql)
-        conn.commit()
+        # Read and execute SQL migration files in order
+        migration_files = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "[0-9][0-9][0-9]_*.sql")))
+        for migration_file in migration_files:
+            with open(migration_file, 'r') as f:
+                migration_sql = f.read()
+            
+            print(f"📝 Executing {os.path.basename(migration_file)}...")
+            cursor.execute(migration_sql)
+            conn.commit()
         
         # Verify table was created
         cursor.execute("""
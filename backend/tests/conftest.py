@@ -0,0 +1,25 @@
+"""
+Shared fixtures (run from the backend directory: pytest tests).
+Tests use a throwaway SQLite database unless DATABASE_URL is set.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+os.environ.setdefault("DEBUG", "false")
+
+import pytest
+
+from app.core.database import Base, SessionLocal, engine
+import app.models.models  # noqa: F401  (register tables)
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
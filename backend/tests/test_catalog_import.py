@@ -0,0 +1,44 @@
+from app.models.models import Symptom
+from app.services.catalog_import import import_catalog, parse_catalog
+
+
+def _symptom(db, name):
+    db.expire_all()
+    return db.query(Symptom).filter(Symptom.name == name).one()
+
+
+def test_partial_csv_leaves_omitted_columns_unchanged(db):
+    db.add(Symptom(name="fever", description="High temperature", severity_level=3, category="general"))
+    db.commit()
+
+    catalog = parse_catalog(b"name,description\nfever,Raised body temperature\nchills,Feeling cold\n", "csv", "symptoms")
+    report = import_catalog(db, catalog)
+
+    assert (report["inserted"], report["updated"]) == (1, 1)
+    fever = _symptom(db, "fever")
+    assert fever.description == "Raised body temperature"
+    assert (fever.severity_level, fever.category) == (3, "general")
+    chills = _symptom(db, "chills")
+    assert chills.description == "Feeling cold" and chills.severity_level is None
+
+
+def test_rows_with_different_columns_are_upserted_separately(db):
+    db.add(Symptom(name="cough", description="Dry", severity_level=2, category="respiratory"))
+    db.commit()
+
+    report = import_catalog(db, {"symptoms": [
+        {"name": "cough", "severity_level": 4},
+        {"name": "nausea", "description": "Queasy", "category": "digestive"},
+    ]})
+
+    assert (report["inserted"], report["updated"]) == (1, 1)
+    cough = _symptom(db, "cough")
+    assert (cough.description, cough.severity_level, cough.category) == ("Dry", 4, "respiratory")
+    assert _symptom(db, "nausea").category == "digestive"
+
+
+def test_reimport_is_unchanged(db):
+    catalog = parse_catalog(b"name,description\nfever,Hot\n", "csv", "symptoms")
+    import_catalog(db, catalog)
+    report = import_catalog(db, catalog)
+    assert (report["inserted"], report["updated"], report["skipped"]) == (0, 0, 1)
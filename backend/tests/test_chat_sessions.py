@@ -0,0 +1,40 @@
+import pytest
+
+from app.models.models import User
+from app.services.chat_session_service import ChatSessionService, _cache
+
+
+@pytest.fixture
+def users(db):
+    alice = User(email="alice@example.com", hashed_password="x", full_name="Alice")
+    bob = User(email="bob@example.com", hashed_password="x", full_name="Bob")
+    db.add_all([alice, bob])
+    db.commit()
+    return alice, bob
+
+
+@pytest.mark.parametrize("cached", (True, False), ids=("cache", "database"))
+def test_owned_session_is_only_reachable_by_its_owner(db, users, cached):
+    alice, bob = users
+    session_id = ChatSessionService.create_session(db, alice.id).id
+    if not cached:
+        _cache.discard(session_id)
+
+    assert ChatSessionService.load(db, session_id, alice.id) is not None
+    assert ChatSessionService.load(db, session_id, bob.id) is None
+    assert ChatSessionService.load(db, session_id) is None
+    assert ChatSessionService.append_turn(db, session_id, "hi", "hello", bob.id) is None
+    assert not ChatSessionService.delete_session(db, session_id, bob.id)
+
+    turn, _expires_at, messages = ChatSessionService.append_turn(db, session_id, "hi", "hello", alice.id)
+    assert (turn, messages) == (1, [["u", "hi"], ["a", "hello"]])
+    assert ChatSessionService.delete_session(db, session_id, alice.id)
+
+
+def test_anonymous_session_stays_anonymous_when_a_user_appends(db, users):
+    alice, bob = users
+    session_id = ChatSessionService.create_session(db).id
+
+    assert ChatSessionService.append_turn(db, session_id, "hi", "hello", alice.id) is not None
+    assert ChatSessionService.load(db, session_id, bob.id) is not None
+    assert ChatSessionService.load(db, session_id) is not None
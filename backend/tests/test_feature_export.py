@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.models import Feedback, Prediction, User
+
+pytest.importorskip("pyarrow")
+import pyarrow.parquet as pq  # noqa: E402
+
+from app.services.feature_export import FeatureExporter  # noqa: E402
+
+
+def test_day_with_late_feedback_is_exported_again(db, tmp_path):
+    user = User(email="user@example.com", hashed_password="x", full_name="User")
+    db.add(user)
+    db.commit()
+    created = datetime.utcnow() - timedelta(days=2)
+    prediction = Prediction(user_id=user.id, symptoms=["fever"], predicted_disease_name="Flu", created_at=created)
+    db.add(prediction)
+    db.commit()
+
+    exporter = FeatureExporter(str(tmp_path), ["fever"])
+    exporter.run(db)
+    key = created.date().isoformat()
+    assert exporter.load_manifest()["partitions"][key]["complete"]
+
+    db.add(Feedback(prediction_id=prediction.id, is_accurate=True, created_at=datetime.utcnow() - timedelta(minutes=5)))
+    db.commit()
+    summary = exporter.run(db)
+
+    assert summary["reopened_days"] == 1
+    table = pq.read_table(tmp_path / f"date={key}" / "part-0.parquet")
+    assert table.column("disease").to_pylist() == ["Flu"]
+    assert exporter.load_manifest()["partitions"][key]["complete"]
+    assert exporter.run(db)["reopened_days"] == 0
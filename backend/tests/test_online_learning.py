@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.models.models import Feedback, Prediction, User
+from app.services import online_learning
+from app.services.online_learning import OnlineLearner, OnlineState
+from app.services.stats_service import COMMIT_LAG_SECONDS
+
+
+def test_batches_leave_recent_feedback_for_the_next_run(db):
+    user = User(email="user@example.com", hashed_password="x", full_name="User")
+    db.add(user)
+    db.commit()
+    now = datetime.utcnow()
+    ages = [3600, 60, 0]  # seconds; the newest is inside the commit lag
+    for age in ages:
+        prediction = Prediction(user_id=user.id, symptoms=["fever"], predicted_disease_name="Flu")
+        db.add(prediction)
+        db.flush()
+        db.add(Feedback(prediction_id=prediction.id, is_accurate=True,
+                        created_at=now - timedelta(seconds=age)))
+    db.commit()
+    assert ages[-1] < COMMIT_LAG_SECONDS
+
+    state = OnlineState("v1", ["fever"], ["Flu"])
+    learner = OnlineLearner(batch_size=1)
+    rows = [row for batch in learner._batches(db, state) for row in batch]
+    assert [row[0] for row in rows] == [1, 2]
+
+    state.watermark = 2
+    assert list(learner._batches(db, state)) == []
+
+
+def test_new_state_merges_aliased_store_names(monkeypatch):
+    engine = SimpleNamespace(version="v1", feature_names=["fever"], labels=["Flu (Influenza)", "Malaria"])
+    store = SimpleNamespace(names=lambda: ["Flu", "Malaria", "Typhoid"])
+    monkeypatch.setattr(online_learning.model_registry, "active", engine)
+    monkeypatch.setattr(online_learning, "disease_store", SimpleNamespace(current=store))
+
+    state = OnlineLearner()._new_state()
+    assert state.classes == ["Flu (Influenza)", "Malaria", "Typhoid"]
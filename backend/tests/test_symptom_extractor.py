@@ -0,0 +1,40 @@
+from app.core.config import settings
+from app.services.symptom_extractor import extract_symptoms
+
+
+def test_english_negator_only_negates_the_following_symptom():
+    result = extract_symptoms("I have fever, no cough")
+    assert result.symptoms == ["fever"]
+    assert result.negated == ["cough"]
+
+
+def test_hinglish_and_hindi_negators_follow_the_symptom():
+    result = extract_symptoms("3 din se bukhar, khansi nahi")
+    assert (result.symptoms, result.negated, result.duration_days) == (["fever"], ["cough"], 3)
+
+    result = extract_symptoms("बुखार नहीं, सिर दर्द है")
+    assert (result.symptoms, result.negated) == (["headache"], ["fever"])
+
+
+def test_negated_severity_is_ignored():
+    result = extract_symptoms("chest pain not severe")
+    assert result.symptoms == ["chest pain"]
+    assert result.severity is None
+
+    assert extract_symptoms("severe chest pain").severity == "severe"
+
+
+def test_negator_before_severity_negates_the_symptom():
+    result = extract_symptoms("no severe headache")
+    assert (result.symptoms, result.negated, result.severity) == ([], ["headache"], None)
+
+
+def test_negated_red_flags_are_dropped():
+    assert extract_symptoms("no blood in vomit").red_flags == []
+    assert extract_symptoms("khoon nahi").red_flags == []
+    assert extract_symptoms("blood in vomit").red_flags == ["blood"]
+
+
+def test_negation_keeps_confidence_below_the_local_threshold():
+    assert extract_symptoms("I have fever, no cough").confidence < settings.LOCAL_EXTRACTOR_MIN_CONFIDENCE
+    assert extract_symptoms("I have fever and cough").confidence == 1.0
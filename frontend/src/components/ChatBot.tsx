@@ -1,5 +1,5 @@
 import React, { useState, useRef, useEffect } from 'react'
-import { generateHealthResponse, ChatMessage } from '../services/backend-chat'
+import { generateHealthResponse, resetChatSession, ChatMessage } from '../services/backend-chat'
 import { translateBotResponse } from '../services/translate'
 import { useTranslation } from 'react-i18next'
 import ReactMarkdown from 'react-markdown'
@@ -20,6 +20,11 @@ export default function ChatBot() {
   const [loading, setLoading] = useState(false)
   const chatEndRef = useRef<HTMLDivElement>(null)
 
+  // A fresh chat starts a fresh server-side session
+  useEffect(() => {
+    resetChatSession()
+  }, [])
+
   // Auto-scroll to bottom when new messages arrive
   useEffect(() => {
     chatEndRef.current?.scrollIntoView({ behavior: 'smooth' })
@@ -3,6 +3,9 @@ import { useState, useEffect } from 'react'
 import { useTranslation } from 'react-i18next'
 import LanguageSwitcher from './LanguageSwitcher'
 import NotificationBell from './NotificationBell'
+import { logout } from '../lib/auth'
+import { resetChatSession } from '../services/backend-chat'
+import { fetchWithAuth } from '../lib/api-config'
 
 export default function Layout() {
   const navigate = useNavigate()
@@ -43,9 +46,8 @@ export default function Layout() {
   const apiUrl = (import.meta.env.VITE_API_URL && import.meta.env.VITE_API_URL.trim()) || 'https://health-symptom-predictor.onrender.com'
       console.log('🔍 Checking admin status with token:', authToken?.substring(0, 20) + '...')
       console.log('🌐 API URL:', apiUrl)
-      const response = await fetch(`${apiUrl}/api/auth/me`, {
-        headers: { 'Authorization': `Bearer ${authToken}` }
-      })
+      // No redirect here: public pages render this layout too
+      const response = await fetchWithAuth(`${apiUrl}/api/auth/me`, {}, { redirectOnFailure: false })
       console.log('📡 Response status:', response.status)
       if (response.ok) {
         const user = await response.json()
@@ -73,7 +75,8 @@ export default function Layout() {
   }
   
   const onLogout = () => { 
-    localStorage.removeItem('token')
+    logout()
+    resetChatSession()
     setToken(null)
     setIsAdmin(false)
     setMobileMenuOpen(false)
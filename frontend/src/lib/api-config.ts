@@ -1,4 +1,6 @@
 // API Configuration
+import { clearTokens, refreshAccessToken } from './auth';
+
 // Prefer environment-provided API URL; fall back to production backend on Render
 export const API_BASE_URL =
   import.meta.env.VITE_API_URL?.trim() || 'https://health-symptom-predictor.onrender.com';
@@ -9,6 +11,8 @@ export const API_ENDPOINTS = {
     LOGIN: `${API_BASE_URL}/api/auth/login`,
     REGISTER: `${API_BASE_URL}/api/auth/register`,
     ME: `${API_BASE_URL}/api/auth/me`,
+    REFRESH: `${API_BASE_URL}/api/auth/refresh`,
+    LOGOUT: `${API_BASE_URL}/api/auth/logout`,
     PROFILE: `${API_BASE_URL}/api/user/profile`,
   },
   PREDICTIONS: {
@@ -21,38 +25,47 @@ export const API_ENDPOINTS = {
   },
 };
 
-// Helper function for authenticated requests
-export async function fetchWithAuth(url: string, options: RequestInit = {}) {
-  const token = localStorage.getItem('token');
-  
-  if (!token) {
-    console.error('No authentication token found');
-    localStorage.removeItem('token');
-    window.location.href = '/login';
-    throw new Error('Not authenticated. Please log in.');
-  }
-  
-  const headers = {
-    'Content-Type': 'application/json',
-    ...options.headers,
-    Authorization: `Bearer ${token}`,
+// Helper function for authenticated requests.
+// All authenticated calls go through here: on a 401 the access token is
+// refreshed once (lib/auth.ts) and the request retried; only when that fails
+// are the tokens cleared and the user sent to the login page.
+export async function fetchWithAuth(
+  url: string,
+  options: RequestInit = {},
+  { redirectOnFailure = true }: { redirectOnFailure?: boolean } = {}
+) {
+  const signOut = (message: string): never => {
+    clearTokens();
+    if (redirectOnFailure) window.location.href = '/login';
+    throw new Error(message);
   };
 
-  console.log('Making request to:', url);
-  console.log('With headers:', headers);
-
-  try {
-    const response = await fetch(url, {
+  const send = (token: string) =>
+    fetch(url, {
       ...options,
-      headers,
+      headers: {
+        'Content-Type': 'application/json',
+        ...options.headers,
+        Authorization: `Bearer ${token}`,
+      },
     });
 
-    console.log('Response status:', response.status);
+  const token = localStorage.getItem('token') || (await refreshAccessToken());
+  if (!token) {
+    return signOut('Not authenticated. Please log in.');
+  }
+
+  try {
+    let response = await send(token);
 
     if (response.status === 401) {
-      localStorage.removeItem('token');
-      window.location.href = '/login';
-      throw new Error('Unauthorized - please log in again');
+      const refreshed = await refreshAccessToken();
+      if (refreshed) {
+        response = await send(refreshed);
+      }
+      if (response.status === 401) {
+        return signOut('Unauthorized - please log in again');
+      }
     }
 
     return response;
@@ -1,4 +1,59 @@
+import { API_ENDPOINTS } from './api-config'
+
 export const getToken = () => (typeof window !== 'undefined' ? localStorage.getItem('token') : null)
 export const setToken = (t: string) => localStorage.setItem('token', t)
 export const removeToken = () => localStorage.removeItem('token')
 export const isAuthenticated = () => !!getToken()
+
+export const getRefreshToken = () => (typeof window !== 'undefined' ? localStorage.getItem('refresh_token') : null)
+
+export const setTokens = (data: { access_token: string; refresh_token?: string | null }) => {
+  setToken(data.access_token)
+  if (data.refresh_token) localStorage.setItem('refresh_token', data.refresh_token)
+}
+
+export const clearTokens = () => {
+  removeToken()
+  localStorage.removeItem('refresh_token')
+}
+
+// Concurrent 401s share one refresh: the server rotates the refresh token on every call
+let pendingRefresh: Promise<string | null> | null = null
+
+export const refreshAccessToken = (): Promise<string | null> => {
+  const refreshToken = getRefreshToken()
+  if (!refreshToken) return Promise.resolve(null)
+  if (!pendingRefresh) {
+    pendingRefresh = fetch(API_ENDPOINTS.AUTH.REFRESH, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ refresh_token: refreshToken }),
+    })
+      .then(async (response) => {
+        if (!response.ok) {
+          if (response.status === 401) clearTokens()
+          return null
+        }
+        const data = await response.json()
+        setTokens(data)
+        return data.access_token as string
+      })
+      .catch(() => null)
+      .finally(() => {
+        pendingRefresh = null
+      })
+  }
+  return pendingRefresh
+}
+
+export const logout = async () => {
+  const refreshToken = getRefreshToken()
+  clearTokens()
+  if (refreshToken) {
+    await fetch(API_ENDPOINTS.AUTH.LOGOUT, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ refresh_token: refreshToken }),
+    }).catch(() => undefined)
+  }
+}
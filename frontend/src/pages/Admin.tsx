@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
 import AdminNotifications from '../components/AdminNotifications';
+import { fetchWithAuth } from '../lib/api-config';
 
 interface Stats {
   total_users: number;
@@ -23,15 +24,13 @@ export default function Admin() {
       navigate('/login');
       return;
     }
-    fetchStats(token);
+    fetchStats();
   }, [navigate]);
 
-  const fetchStats = async (token: string) => {
+  const fetchStats = async () => {
     try {
   const apiUrl = (import.meta.env.VITE_API_URL && import.meta.env.VITE_API_URL.trim()) || 'https://health-symptom-predictor.onrender.com';
-      const response = await fetch(`${apiUrl}/api/admin/stats`, {
-        headers: { 'Authorization': `Bearer ${token}` }
-      });
+      const response = await fetchWithAuth(`${apiUrl}/api/admin/stats`);
 
       if (!response.ok) {
         if (response.status === 403) {
@@ -39,11 +38,6 @@ export default function Admin() {
           navigate('/');
           return;
         }
-        if (response.status === 401) {
-          localStorage.removeItem('token');
-          navigate('/login');
-          return;
-        }
         throw new Error('Failed to load stats');
       }
 
@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
+import { fetchWithAuth } from '../lib/api-config';
 
 interface Feedback {
   id: number;
@@ -24,15 +25,13 @@ export default function AdminFeedback() {
       navigate('/login');
       return;
     }
-    fetchFeedback(token);
+    fetchFeedback();
   }, [navigate]);
 
-  const fetchFeedback = async (token: string) => {
+  const fetchFeedback = async () => {
     try {
   const apiUrl = (import.meta.env.VITE_API_URL && import.meta.env.VITE_API_URL.trim()) || 'https://health-symptom-predictor.onrender.com';
-      const response = await fetch(`${apiUrl}/api/admin/feedback`, {
-        headers: { 'Authorization': `Bearer ${token}` }
-      });
+      const response = await fetchWithAuth(`${apiUrl}/api/admin/feedback`);
 
       if (!response.ok) {
         if (response.status === 403) {
@@ -40,11 +39,6 @@ export default function AdminFeedback() {
           navigate('/admin');
           return;
         }
-        if (response.status === 401) {
-          localStorage.removeItem('token');
-          navigate('/login');
-          return;
-        }
         throw new Error('Failed to load feedback');
       }
 
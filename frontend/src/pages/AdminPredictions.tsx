@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
+import { fetchWithAuth } from '../lib/api-config';
 
 interface Prediction {
   id: number;
@@ -24,15 +25,13 @@ export default function AdminPredictions() {
       navigate('/login');
       return;
     }
-    fetchPredictions(token);
+    fetchPredictions();
   }, [navigate]);
 
-  const fetchPredictions = async (token: string) => {
+  const fetchPredictions = async () => {
     try {
   const apiUrl = (import.meta.env.VITE_API_URL && import.meta.env.VITE_API_URL.trim()) || 'https://health-symptom-predictor.onrender.com';
-      const response = await fetch(`${apiUrl}/api/admin/predictions`, {
-        headers: { 'Authorization': `Bearer ${token}` }
-      });
+      const response = await fetchWithAuth(`${apiUrl}/api/admin/predictions`);
 
       if (!response.ok) {
         if (response.status === 403) {
@@ -40,11 +39,6 @@ export default function AdminPredictions() {
           navigate('/admin');
           return;
         }
-        if (response.status === 401) {
-          localStorage.removeItem('token');
-          navigate('/login');
-          return;
-        }
         throw new Error('Failed to load predictions');
       }
 
@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
+import { fetchWithAuth } from '../lib/api-config';
 
 interface User {
   id: number;
@@ -38,15 +39,13 @@ export default function AdminUsers() {
       navigate('/login');
       return;
     }
-    fetchUsers(token);
+    fetchUsers();
   }, [navigate]);
 
-  const fetchUsers = async (token: string) => {
+  const fetchUsers = async () => {
     try {
       const apiUrl = (import.meta.env.VITE_API_URL && import.meta.env.VITE_API_URL.trim()) || 'https://health-symptom-predictor.onrender.com';
-      const response = await fetch(`${apiUrl}/api/admin/users`, {
-        headers: { 'Authorization': `Bearer ${token}` }
-      });
+      const response = await fetchWithAuth(`${apiUrl}/api/admin/users`);
 
       if (!response.ok) {
         if (response.status === 403) {
@@ -54,11 +53,6 @@ export default function AdminUsers() {
           navigate('/admin');
           return;
         }
-        if (response.status === 401) {
-          localStorage.removeItem('token');
-          navigate('/login');
-          return;
-        }
         throw new Error('Failed to load users');
       }
 
@@ -77,9 +71,8 @@ export default function AdminUsers() {
 
     try {
       const apiUrl = (import.meta.env.VITE_API_URL && import.meta.env.VITE_API_URL.trim()) || 'https://health-symptom-predictor.onrender.com';
-      const response = await fetch(`${apiUrl}/api/admin/users/${userId}/toggle-admin`, {
-        method: 'PATCH',
-        headers: { 'Authorization': `Bearer ${token}` }
+      const response = await fetchWithAuth(`${apiUrl}/api/admin/users/${userId}/toggle-admin`, {
+        method: 'PATCH'
       });
 
       if (!response.ok) {
@@ -88,7 +81,7 @@ export default function AdminUsers() {
       }
 
       // Refresh the list
-      fetchUsers(token);
+      fetchUsers();
     } catch (error) {
       alert((error as Error).message);
     }
@@ -100,9 +93,8 @@ export default function AdminUsers() {
 
     try {
       const apiUrl = (import.meta.env.VITE_API_URL && import.meta.env.VITE_API_URL.trim()) || 'https://health-symptom-predictor.onrender.com';
-      const response = await fetch(`${apiUrl}/api/admin/users/${userId}/toggle-active`, {
-        method: 'PATCH',
-        headers: { 'Authorization': `Bearer ${token}` }
+      const response = await fetchWithAuth(`${apiUrl}/api/admin/users/${userId}/toggle-active`, {
+        method: 'PATCH'
       });
 
       if (!response.ok) {
@@ -111,7 +103,7 @@ export default function AdminUsers() {
       }
 
       // Refresh the list
-      fetchUsers(token);
+      fetchUsers();
     } catch (error) {
       alert((error as Error).message);
     }
@@ -127,9 +119,7 @@ export default function AdminUsers() {
     if (!token) return;
     try {
       const apiUrl = (import.meta.env.VITE_API_URL && import.meta.env.VITE_API_URL.trim()) || 'https://health-symptom-predictor.onrender.com';
-      const response = await fetch(`${apiUrl}/api/admin/users/${userId}`, {
-        headers: { 'Authorization': `Bearer ${token}` }
-      });
+      const response = await fetchWithAuth(`${apiUrl}/api/admin/users/${userId}`);
       if (!response.ok) {
         setProfileError('Failed to load profile');
         setProfileLoading(false);
@@ -1,6 +1,7 @@
 import { useState } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import { API_ENDPOINTS } from '../lib/api-config';
+import { setTokens } from '../lib/auth';
 
 export default function Login() {
   const navigate = useNavigate();
@@ -34,7 +35,7 @@ export default function Login() {
       }
       
       const data = await response.json();
-      localStorage.setItem('token', data.access_token);
+      setTokens(data);
       
       // Trigger storage event for Layout to detect login
       window.dispatchEvent(new Event('storage'));
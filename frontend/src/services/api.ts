@@ -1,4 +1,5 @@
 import axios from 'axios';
+import { clearTokens, refreshAccessToken } from '../lib/auth';
 
 const API_URL = (import.meta.env.VITE_API_URL && import.meta.env.VITE_API_URL.trim()) || 'https://health-symptom-predictor.onrender.com';
 
@@ -23,12 +24,19 @@ api.interceptors.request.use(
   }
 );
 
-// Response interceptor to handle errors
+// Response interceptor: on 401 try one silent refresh, then fall back to the login page
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
-    if (error.response?.status === 401) {
-      localStorage.removeItem('token');
+  async (error) => {
+    const original = error.config;
+    if (error.response?.status === 401 && original && !original._retried) {
+      original._retried = true;
+      const token = await refreshAccessToken();
+      if (token) {
+        original.headers.Authorization = `Bearer ${token}`;
+        return api(original);
+      }
+      clearTokens();
       window.location.href = '/login';
     }
     return Promise.reject(error);
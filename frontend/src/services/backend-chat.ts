@@ -3,6 +3,8 @@
  * All AI requests go through backend for security
  */
 
+import { getToken } from '../lib/auth';
+
 export interface ChatMessage {
   type: 'user' | 'bot';
   text: string;
@@ -22,13 +24,58 @@ interface BackendChatResponse {
   status: string;
 }
 
+interface BackendChatSession {
+  session_id: string;
+  expires_at: string;
+}
+
 const ENV_BASE = (import.meta.env.VITE_API_URL || '').trim();
 const API_BASE_URL = `${(ENV_BASE || 'https://health-symptom-predictor.onrender.com')}/api`;
 
+// Server-side chat session: history lives on the backend, so each turn
+// only uploads the session id and the new message
+let chatSessionId: string | null = null;
+
+// Sessions started while logged in belong to that user on the server
+const authHeaders = (): Record<string, string> => {
+  const token = getToken();
+  return token ? { Authorization: `Bearer ${token}` } : {};
+};
+
+// Returns null when the backend does not support sessions (older deployments)
+const createChatSession = async (): Promise<string | null> => {
+  const response = await fetch(`${API_BASE_URL}/chat/sessions`, {
+    method: 'POST',
+    headers: authHeaders(),
+  });
+  if (response.status === 404 || response.status === 405) {
+    console.warn('⚠️ Chat sessions unavailable, sending full history instead');
+    return null;
+  }
+  if (!response.ok) {
+    throw new Error(`Server error: ${response.status} ${response.statusText}`);
+  }
+  const data: BackendChatSession = await response.json();
+  chatSessionId = data.session_id;
+  return data.session_id;
+};
+
+const sendSessionMessage = (sessionId: string, userMessage: string): Promise<Response> =>
+  fetch(`${API_BASE_URL}/chat/sessions/${encodeURIComponent(sessionId)}/messages`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...authHeaders(),
+    },
+    body: JSON.stringify({ message: userMessage }),
+  });
+
 /**
  * Sends a message to the backend chat API and returns AI response
+ * Uses a server-side chat session; falls back to uploading history if
+ * the backend does not support sessions
  * @param userMessage - User's message
- * @param chatHistory - Optional chat history for context
+ * @param chatHistory - Optional chat history for context (fallback only)
  * @returns AI-generated response
  */
 export const generateHealthResponse = async (
@@ -38,6 +85,30 @@ export const generateHealthResponse = async (
   try {
     console.log('📤 Sending message to backend API:', userMessage.substring(0, 50) + '...');
     
+    const sessionId = chatSessionId ?? await createChatSession();
+    if (sessionId) {
+      let response = await sendSessionMessage(sessionId, userMessage);
+      
+      // Session expired, was purged or belongs to another login - start a new one and retry once
+      if (response.status === 404) {
+        const newSessionId = await createChatSession();
+        if (newSessionId) {
+          response = await sendSessionMessage(newSessionId, userMessage);
+        }
+      }
+      
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(
+          errorData.detail || `Server error: ${response.status} ${response.statusText}`
+        );
+      }
+      
+      const data: BackendChatResponse = await response.json();
+      console.log('📥 Received response from backend (session)');
+      return data.response;
+    }
+    
     // Convert chat history to backend format if provided
     const history = chatHistory
       ?.filter(msg => msg.type !== 'bot' || msg.text) // Filter out empty messages
@@ -110,7 +181,16 @@ export const checkChatHealth = async (): Promise<{
   }
 };
 
+/**
+ * Forget the current chat session so the next message starts a new conversation
+ * (called when the chat opens and on logout)
+ */
+export const resetChatSession = (): void => {
+  chatSessionId = null;
+};
+
 export default {
   generateHealthResponse,
+  resetChatSession,
   checkChatHealth,
 };
@@ -0,0 +1,114 @@
+"""
+Model Artifact Export
+
+Writes a trained RandomForestClassifier as flat tree arrays, one .npy file
+per array, plus a manifest. The backend loads them with
+`np.load(mmap_mode='r')` (see backend/app/services/flat_forest.py). Every
+uvicorn worker then maps the same page-cache pages instead of unpickling
+its own copy of the trees.
+
+Layout:
+    forest/manifest.json
+    forest/feature.npy     int32    split feature per node (-1 for leaves)
+    forest/threshold.npy   float64  split threshold per node
+    forest/left.npy        int32    global index of the left child (-1 for leaves)
+    forest/right.npy       int32    global index of the right child (-1 for leaves)
+    forest/value.npy       float32  class probabilities per node (n_nodes x n_classes)
+    forest/roots.npy       int32    global index of each tree's root
+
+Distilled artifacts (distill.py) record source_checksum() of the model they
+were built from; the backend ignores them once the model is rewritten.
+"""
+
+import hashlib
+import json
+import os
+
+import joblib
+import numpy as np
+
+FLAT_FORMAT = 1
+FOREST_DIR = 'forest'
+SOURCE_FILES = ('disease_predictor.pkl', 'label_encoder.pkl')
+DISTILLED_FILES = ('distilled.npz', 'distilled.json')
+
+
+def export_flat_forest(model, directory):
+    """
+    Flatten every tree of a fitted forest into shared arrays.
+    Child indices are offset so they index the concatenated arrays directly.
+    """
+    forest_dir = os.path.join(directory, FOREST_DIR)
+    os.makedirs(forest_dir, exist_ok=True)
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left == -1
+        roots.append(offset)
+        features.append(np.where(is_leaf, -1, tree.feature).astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        lefts.append(np.where(is_leaf, -1, tree.children_left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, -1, tree.children_right + offset).astype(np.int32))
+        # Same normalisation as DecisionTreeClassifier.predict_proba
+        value = tree.value[:, 0, :].astype(np.float64)
+        totals = value.sum(axis=1, keepdims=True)
+        totals[totals == 0] = 1.0
+        values.append((value / totals).astype(np.float32))
+        max_depth = max(max_depth, int(tree.max_depth))
+        offset += tree.node_count
+
+    arrays = {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'value': np.ascontiguousarray(np.concatenate(values)),
+        'roots': np.asarray(roots, dtype=np.int32),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(forest_dir, f'{name}.npy'), array, allow_pickle=False)
+
+    with open(os.path.join(forest_dir, 'manifest.json'), 'w') as f:
+        json.dump({
+            'format': FLAT_FORMAT,
+            'n_features': int(model.n_features_in_),
+            'n_classes': int(len(model.classes_)),
+            'n_trees': len(model.estimators_),
+            'n_nodes': int(offset),
+            'max_depth': max_depth,
+        }, f, indent=2)
+    return forest_dir
+
+
+def save_model(model, path, compress=3):
+    """Pickle with zlib compression: several times smaller on disk for deep forests"""
+    joblib.dump(model, path, compress=compress)
+    return path
+
+
+def directory_size(path):
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def source_checksum(directory):
+    """sha256 over the model pickle and label encoder a derived artifact was built from"""
+    digest = hashlib.sha256()
+    for name in SOURCE_FILES:
+        with open(os.path.join(directory, name), 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def remove_distilled(directory):
+    """Drop distilled artifacts built from a model that is being replaced"""
+    for name in DISTILLED_FILES:
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            os.remove(path)
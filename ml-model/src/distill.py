@@ -0,0 +1,210 @@
+"""
+Forest Distillation
+
+Replaces walking 100 trees per request with a table lookup keyed by the
+symptom bitmask (bit i = feature i of feature_names.json).
+
+- Up to MAX_EXHAUSTIVE_FEATURES symptoms, every possible combination is
+  scored by the forest once: the table answers every request exactly.
+- Beyond that, the most frequent combinations in the training data go in
+  the table. Everything else falls back to a logistic-regression scorer
+  trained to imitate the forest, which is a single dense row sum.
+
+The result is written next to the model as distilled.npz/distilled.json,
+together with a fidelity report (how often the distilled model picks the
+same disease as the forest) and the checksum of the model it was built from. The backend only serves it when the fidelity is
+at least DISTILLED_MIN_FIDELITY.
+
+Usage:
+    python distill.py --version 20240601-120000
+    python distill.py --version big --data symptoms.csv --table-size 50000 --min-fidelity 0.98
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+
+from artifacts import source_checksum
+from train import MODEL_DIR, load_split
+
+DISTILLED_FORMAT = 1
+MAX_EXHAUSTIVE_FEATURES = 18
+
+
+def _version_dir(version):
+    if version == 'legacy':
+        return MODEL_DIR
+    return os.path.join(MODEL_DIR, 'registry', version)
+
+
+def load_forest(version):
+    path = _version_dir(version)
+    model = joblib.load(os.path.join(path, 'disease_predictor.pkl'))
+    with open(os.path.join(path, 'feature_names.json'), 'r') as f:
+        feature_names = json.load(f)
+    return path, model, feature_names
+
+
+def forest_predict(model, X, feature_names, batch_size=65536):
+    """(label index, confidence) for each row, in label-encoder order"""
+    labels = np.empty(X.shape[0], dtype=np.int32)
+    confidence = np.empty(X.shape[0], dtype=np.float32)
+    for start in range(0, X.shape[0], batch_size):
+        batch = X[start:start + batch_size]
+        if getattr(model, 'feature_names_in_', None) is not None:
+            batch = pd.DataFrame(batch, columns=feature_names)
+        proba = model.predict_proba(batch)
+        best = proba.argmax(axis=1)
+        labels[start:start + batch_size] = model.classes_[best]
+        confidence[start:start + batch_size] = proba[np.arange(len(best)), best]
+    return labels, confidence
+
+
+def all_combinations(n_features):
+    masks = np.arange(1 << n_features, dtype=np.int64)
+    return ((masks[:, None] >> np.arange(n_features)) & 1).astype(np.uint8)
+
+
+def pack_masks(X):
+    """Row bitmasks as little-endian bytes, so bit i of the int is feature i"""
+    return np.packbits(np.asarray(X, dtype=np.uint8), axis=1, bitorder='little')
+
+
+def _linear_predict(W, b, X):
+    scores = np.asarray(X, dtype=np.float32) @ W + b
+    scores -= scores.max(axis=1, keepdims=True)
+    proba = np.exp(scores)
+    proba /= proba.sum(axis=1, keepdims=True)
+    best = proba.argmax(axis=1)
+    return best.astype(np.int32), proba[np.arange(len(best)), best]
+
+
+def fit_linear(X, forest_labels, n_classes):
+    """Logistic regression on the forest's own predictions (not the ground truth)"""
+    present = np.unique(forest_labels)
+    W = np.zeros((X.shape[1], n_classes), dtype=np.float32)
+    b = np.full(n_classes, -1e4, dtype=np.float32)
+    if len(present) == 1:
+        b[present[0]] = 0.0
+        return W, b
+    clf = LogisticRegression(max_iter=1000)
+    clf.fit(np.asarray(X, dtype=np.float32), forest_labels)
+    coef = clf.coef_.T if len(present) > 2 else np.hstack([-clf.coef_.T, clf.coef_.T]) / 2
+    intercept = clf.intercept_ if len(present) > 2 else np.array([-clf.intercept_[0], clf.intercept_[0]]) / 2
+    W[:, present] = coef
+    b[present] = intercept
+    return W, b
+
+
+def _training_rows(data_path):
+    split = load_split(data_path)
+    X_train, X_test = split['X_train'], split['X_test']
+    if hasattr(X_train, 'toarray'):
+        X_train, X_test = X_train.toarray(), X_test.toarray()
+    return split['feature_names'], X_train.astype(np.uint8), X_test.astype(np.uint8)
+
+
+def distill(version, data_path=None, table_size=100000, min_fidelity=0.99):
+    """Build the distilled artifact for a registry version and return its report"""
+    path, model, feature_names = load_forest(version)
+    n_features = len(feature_names)
+    n_classes = int(model.classes_.max()) + 1
+    report = {
+        'version': version,
+        'n_features': n_features,
+        'source_checksum': source_checksum(path),
+        'created_at': datetime.utcnow().isoformat(),
+    }
+
+    X_train = X_test = None
+    if data_path or n_features > MAX_EXHAUSTIVE_FEATURES:
+        data_features, X_train, X_test = _training_rows(data_path)
+        if data_features != feature_names:
+            raise ValueError("Training data columns do not match the model's feature_names.json")
+
+    started = time.perf_counter()
+    if n_features <= MAX_EXHAUSTIVE_FEATURES:
+        mode = 'exhaustive'
+        X_table = all_combinations(n_features)
+        table_labels, table_confidence = forest_predict(model, X_table, feature_names)
+        linear_fit_rows = X_table
+        linear_fit_labels = table_labels
+        payload = {'labels': table_labels.astype(np.uint16), 'confidence': table_confidence}
+    else:
+        mode = 'frequent+linear'
+        keys, first_index, counts = np.unique(pack_masks(X_train), axis=0, return_index=True, return_counts=True)
+        top = np.argsort(-counts, kind='stable')[:table_size]
+        X_table = X_train[first_index[top]]
+        table_labels, table_confidence = forest_predict(model, X_table, feature_names)
+        linear_fit_rows = X_train
+        linear_fit_labels = forest_predict(model, X_train, feature_names)[0]
+        payload = {
+            'keys': keys[top],
+            'labels': table_labels.astype(np.uint16),
+            'confidence': table_confidence,
+        }
+        report['table_coverage_train'] = round(float(counts[top].sum() / counts.sum()), 4)
+
+    W, b = fit_linear(linear_fit_rows, linear_fit_labels, n_classes)
+    payload.update({'W': W, 'b': b})
+    report.update({
+        'mode': mode,
+        'table_entries': int(len(table_labels)),
+        'build_seconds': round(time.perf_counter() - started, 2),
+    })
+
+    # Fidelity: agreement with the forest's top disease
+    if mode == 'exhaustive':
+        report['fidelity_all_inputs'] = 1.0
+        report['linear_only_fidelity_all_inputs'] = round(float(
+            (_linear_predict(W, b, X_table)[0] == table_labels).mean()), 4)
+    if X_test is not None:
+        forest_labels, _ = forest_predict(model, X_test, feature_names)
+        linear_labels, _ = _linear_predict(W, b, X_test)
+        if mode == 'exhaustive':
+            masks = (X_test.astype(np.int64) << np.arange(n_features)).sum(axis=1)
+            distilled_labels = table_labels[masks]
+            hits = np.ones(len(masks), dtype=bool)
+        else:
+            lookup = {key.tobytes(): i for i, key in enumerate(payload['keys'])}
+            index = np.array([lookup.get(key.tobytes(), -1) for key in pack_masks(X_test)])
+            hits = index >= 0
+            distilled_labels = np.where(hits, table_labels[np.maximum(index, 0)], linear_labels)
+        report['test_rows'] = int(len(X_test))
+        report['table_hit_rate_test'] = round(float(hits.mean()), 4)
+        report['fidelity_test'] = round(float((distilled_labels == forest_labels).mean()), 4)
+        report['linear_only_fidelity_test'] = round(float((linear_labels == forest_labels).mean()), 4)
+
+    report['fidelity'] = report.get('fidelity_test', report.get('fidelity_all_inputs'))
+    report['min_fidelity'] = min_fidelity
+    report['accepted'] = report['fidelity'] is not None and report['fidelity'] >= min_fidelity
+
+    if report['accepted']:
+        np.savez(os.path.join(path, 'distilled.npz'), **payload)
+        with open(os.path.join(path, 'distilled.json'), 'w') as f:
+            json.dump({'format': DISTILLED_FORMAT, **report}, f, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Distill a trained forest into a lookup table + linear scorer')
+    parser.add_argument('--version', required=True, help="Registry version to distill ('legacy' for models/)")
+    parser.add_argument('--data', default=None, help='Training CSV, used for frequent combinations and the fidelity test')
+    parser.add_argument('--table-size', type=int, default=100000, help='Max lookup entries for large feature sets')
+    parser.add_argument('--min-fidelity', type=float, default=0.99,
+                        help='Only write the artifact if it agrees with the forest at least this often')
+    args = parser.parse_args()
+
+    result = distill(args.version, args.data, table_size=args.table_size, min_fidelity=args.min_fidelity)
+    print(json.dumps(result, indent=2))
+    if not result['accepted']:
+        print(f"Fidelity {result['fidelity']} is below {args.min_fidelity}; distilled artifact not written")
+        sys.exit(1)
@@ -2,17 +2,47 @@
 Disease Prediction Model Training Script
 
 This script trains a machine learning model to predict diseases based on symptoms.
+
+Large datasets (100k+ rows, 130+ symptom columns) are streamed in chunks into
+compact uint8 (or sparse) matrices, trees are fitted on all cores, and the
+train/test split is cached so repeated runs skip CSV parsing entirely.
+
+Usage:
+    python train.py --data symptoms.csv --version 2024-06-01
+    python train.py --data symptoms.csv --sparse --n-jobs 8
+    python train.py --synthetic 150000 --benchmark
 """
 
 import pandas as pd
 import numpy as np
+from scipy import sparse as sp
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import joblib
 import os
+import sys
 import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from datetime import datetime
+
+from artifacts import export_flat_forest, save_model, directory_size, remove_distilled
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'models')
+CACHE_DIR = os.path.join(MODEL_DIR, 'cache')
+TARGET_COLUMNS = ('disease', 'prognosis')
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
 
 
 def create_sample_dataset():
@@ -45,50 +75,181 @@ def create_sample_dataset():
     return pd.DataFrame(data)
 
 
-def train_model(data_path=None):
+def create_synthetic_dataset(path, n_rows=100000, n_symptoms=130, n_diseases=40, seed=0, chunksize=50000):
+    """
+    Write a synthetic symptom CSV of the size we expect from public datasets.
+    Each disease has a handful of characteristic symptoms plus random noise.
+    """
+    rng = np.random.default_rng(seed)
+    symptoms = [f'symptom_{i}' for i in range(n_symptoms)]
+    diseases = [f'Disease {i}' for i in range(n_diseases)]
+    profiles = rng.random((n_diseases, n_symptoms)) < (6 / n_symptoms)
+
+    written = 0
+    header = True
+    while written < n_rows:
+        rows = min(chunksize, n_rows - written)
+        labels = rng.integers(0, n_diseases, rows)
+        keep = rng.random((rows, n_symptoms)) < 0.85
+        noise = rng.random((rows, n_symptoms)) < 0.02
+        X = ((profiles[labels] & keep) | noise).astype(np.uint8)
+        chunk = pd.DataFrame(X, columns=symptoms)
+        chunk['disease'] = [diseases[i] for i in labels]
+        chunk.to_csv(path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+        written += rows
+    return path
+
+
+def _read_header(data_path):
+    columns = [str(c).strip() for c in pd.read_csv(data_path, nrows=0).columns]
+    target = next((c for c in TARGET_COLUMNS if c in columns), None)
+    if target is None:
+        raise ValueError(f"No target column found, expected one of {TARGET_COLUMNS}")
+    # Public datasets often carry empty trailing "Unnamed: N" columns
+    features = [c for c in columns if c != target and not c.startswith('Unnamed:')]
+    return features, target
+
+
+def load_dataset(data_path=None, chunksize=20000, use_sparse=False):
+    """
+    Stream a symptom CSV into a compact feature matrix.
+
+    Features are parsed chunk by chunk straight into uint8 (1 byte per cell
+    instead of 8 for pandas' default int64), or into a CSR matrix when
+    `use_sparse` is set - most rows have only a few symptoms present.
+
+    Returns:
+        (X, labels, feature_names)
+    """
+    if not data_path or not os.path.exists(data_path):
+        print("Using sample dataset for demonstration...")
+        df = create_sample_dataset()
+        feature_names = [c for c in df.columns if c != 'disease']
+        X = df[feature_names].to_numpy(dtype=np.uint8)
+        return (sp.csr_matrix(X) if use_sparse else X), df['disease'].to_numpy(dtype=object), feature_names
+
+    feature_names, target = _read_header(data_path)
+    dtypes = {name: np.uint8 for name in feature_names}
+    dtypes[target] = str
+
+    blocks, labels = [], []
+    reader = pd.read_csv(
+        data_path,
+        usecols=lambda c: str(c).strip() in dtypes,
+        dtype=dtypes,
+        chunksize=chunksize
+    )
+    for chunk in reader:
+        chunk.columns = [str(c).strip() for c in chunk.columns]
+        chunk = chunk.dropna(subset=[target])
+        values = chunk[feature_names].fillna(0).to_numpy(dtype=np.uint8)
+        blocks.append(sp.csr_matrix(values) if use_sparse else values)
+        labels.append(chunk[target].str.strip().to_numpy(dtype=object))
+
+    X = sp.vstack(blocks, format='csr') if use_sparse else np.concatenate(blocks)
+    return X, np.concatenate(labels), feature_names
+
+
+def _cache_path(data_path, use_sparse, test_size, random_state):
+    if data_path and os.path.exists(data_path):
+        stat = os.stat(data_path)
+        source = f"{os.path.abspath(data_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    else:
+        source = 'sample'
+    key = f"{source}:{'sparse' if use_sparse else 'dense'}:{test_size}:{random_state}"
+    return os.path.join(CACHE_DIR, f"split-{hashlib.sha1(key.encode()).hexdigest()[:16]}.joblib")
+
+
+def load_split(data_path=None, use_sparse=False, use_cache=True, chunksize=20000,
+               test_size=TEST_SIZE, random_state=RANDOM_STATE):
+    """
+    Load the dataset and split it into train/test sets.
+    The split is cached under models/cache, keyed by the file's path, size and
+    mtime, so the same data is only parsed once and every run (and benchmark
+    configuration) evaluates on identical rows.
+
+    Returns:
+        dict with X_train, X_test, y_train, y_test, label_encoder, feature_names, n_samples
+    """
+    cache_path = _cache_path(data_path, use_sparse, test_size, random_state)
+    if use_cache and os.path.exists(cache_path):
+        print(f"Using cached train/test split {cache_path}")
+        return joblib.load(cache_path)
+
+    X, labels, feature_names = load_dataset(data_path, chunksize=chunksize, use_sparse=use_sparse)
+
+    label_encoder = LabelEncoder()
+    y = label_encoder.fit_transform(labels).astype(np.int32)
+
+    # Stratify when every class can appear on both sides of the split
+    counts = np.bincount(y)
+    stratify = y if counts.min() >= 2 and len(counts) <= test_size * len(y) else None
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state, stratify=stratify
+    )
+
+    split = {
+        'X_train': X_train,
+        'X_test': X_test,
+        'y_train': y_train,
+        'y_test': y_test,
+        'label_encoder': label_encoder,
+        'feature_names': feature_names,
+        'n_samples': int(len(y)),
+    }
+    if use_cache:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        joblib.dump(split, tmp_path)
+        os.replace(tmp_path, cache_path)
+    return split
+
+
+def build_model(n_jobs=-1, n_estimators=100, max_depth=10):
+    return RandomForestClassifier(
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+        random_state=RANDOM_STATE,
+        class_weight='balanced',
+        n_jobs=n_jobs
+    )
+
+
+def train_model(data_path=None, version=None, use_sparse=False, n_jobs=-1, use_cache=True, chunksize=20000):
     """
     Train the disease prediction model.
     
     Args:
         data_path: Path to training data CSV file (optional)
+        version: Model registry version name (defaults to a UTC timestamp)
+        use_sparse: Train on a sparse CSR matrix instead of dense uint8
+        n_jobs: Cores used to fit the forest (-1 = all)
+        use_cache: Reuse/store the train/test split under models/cache
+        chunksize: Rows parsed per CSV chunk
     """
     print("Loading dataset...")
+    started = time.perf_counter()
+    split = load_split(data_path, use_sparse=use_sparse, use_cache=use_cache, chunksize=chunksize)
+    X_train, X_test = split['X_train'], split['X_test']
+    y_train, y_test = split['y_train'], split['y_test']
+    label_encoder = split['label_encoder']
+    feature_names = split['feature_names']
     
-    if data_path and os.path.exists(data_path):
-        df = pd.read_csv(data_path)
-    else:
-        print("Using sample dataset for demonstration...")
-        df = create_sample_dataset()
-    
-    print(f"Dataset shape: {df.shape}")
-    print(f"Diseases: {df['disease'].unique()}")
-    
-    # Prepare features and target
-    X = df.drop('disease', axis=1)
-    y = df['disease']
+    print(f"Dataset: {split['n_samples']} rows x {len(feature_names)} symptoms "
+          f"({'sparse' if use_sparse else 'uint8'}) loaded in {time.perf_counter() - started:.1f}s")
+    print(f"Diseases: {len(label_encoder.classes_)}")
     
-    # Encode target labels
-    label_encoder = LabelEncoder()
-    y_encoded = label_encoder.fit_transform(y)
-    
-    # Split data
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y_encoded, test_size=0.2, random_state=42
-    )
-    
-    print(f"\nTraining set size: {len(X_train)}")
-    print(f"Testing set size: {len(X_test)}")
+    print(f"\nTraining set size: {X_train.shape[0]}")
+    print(f"Testing set size: {X_test.shape[0]}")
     
     # Train Random Forest model
-    print("\nTraining Random Forest Classifier...")
-    model = RandomForestClassifier(
-        n_estimators=100,
-        max_depth=10,
-        random_state=42,
-        class_weight='balanced'
-    )
+    print(f"\nTraining Random Forest Classifier (n_jobs={n_jobs})...")
+    model = build_model(n_jobs=n_jobs)
     
+    started = time.perf_counter()
     model.fit(X_train, y_train)
+    print(f"Trained in {time.perf_counter() - started:.1f}s")
     
     # Make predictions
     y_pred = model.predict(X_test)
@@ -102,6 +263,7 @@ def train_model(data_path=None):
     try:
         print(classification_report(
             y_test, y_pred,
+            labels=np.arange(len(label_encoder.classes_)),
             target_names=label_encoder.classes_,
             zero_division=0
         ))
@@ -110,37 +272,182 @@ def train_model(data_path=None):
     
     # Feature importance
     feature_importance = pd.DataFrame({
-        'feature': X.columns,
+        'feature': feature_names,
         'importance': model.feature_importances_
     }).sort_values('importance', ascending=False)
     
     print("\nTop 5 Most Important Features:")
     print(feature_importance.head())
     
+    # Inference runs single-row in the API; don't spin up a thread pool per request
+    model.set_params(n_jobs=None)
+    
     # Save model and encoders
-    model_dir = os.path.join(os.path.dirname(__file__), '..', 'models')
-    os.makedirs(model_dir, exist_ok=True)
+    os.makedirs(MODEL_DIR, exist_ok=True)
     
-    model_path = os.path.join(model_dir, 'disease_predictor.pkl')
-    encoder_path = os.path.join(model_dir, 'label_encoder.pkl')
-    feature_names_path = os.path.join(model_dir, 'feature_names.json')
+    model_path = os.path.join(MODEL_DIR, 'disease_predictor.pkl')
+    encoder_path = os.path.join(MODEL_DIR, 'label_encoder.pkl')
+    feature_names_path = os.path.join(MODEL_DIR, 'feature_names.json')
     
     print(f"\nSaving model to {model_path}...")
-    joblib.dump(model, model_path)
+    # A distilled table of the previous model would otherwise keep being served
+    remove_distilled(MODEL_DIR)
+    save_model(model, model_path)
     joblib.dump(label_encoder, encoder_path)
     
     # Save feature names
     with open(feature_names_path, 'w') as f:
-        json.dump(list(X.columns), f)
+        json.dump(feature_names, f)
+    
+    # Publish a versioned copy to the model registry so the backend can
+    # hot-load it without a redeploy (POST /api/admin/models/{version}/load)
+    version = version or datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+    version_dir = os.path.join(MODEL_DIR, 'registry', version)
+    os.makedirs(version_dir, exist_ok=True)
+    remove_distilled(version_dir)
     
+    save_model(model, os.path.join(version_dir, 'disease_predictor.pkl'))
+    forest_dir = export_flat_forest(model, version_dir)
+    joblib.dump(label_encoder, os.path.join(version_dir, 'label_encoder.pkl'))
+    with open(os.path.join(version_dir, 'feature_names.json'), 'w') as f:
+        json.dump(feature_names, f)
+    with open(os.path.join(version_dir, 'metadata.json'), 'w') as f:
+        json.dump({
+            'version': version,
+            'created_at': datetime.utcnow().isoformat(),
+            'accuracy': float(accuracy),
+            'n_samples': split['n_samples'],
+            'classes': list(label_encoder.classes_),
+            'data_path': data_path
+        }, f, indent=2)
+    
+    print(f"Registered model version {version} in {version_dir}")
+    print(f"  compressed pickle: {os.path.getsize(model_path) / 1024:.0f} KB")
+    print(f"  flat forest (mmap): {directory_size(forest_dir) / 1024:.0f} KB")
+    print(f"Distilled lookup tables are rebuilt with: python distill.py --version {version}")
     print("Model training complete!")
     
-    return model, label_encoder, list(X.columns)
+    return model, label_encoder, feature_names
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+BENCHMARK_CONFIGS = [
+    # Previous pipeline: whole CSV through pandas as int64, single core
+    {'name': 'pandas-int64-1core', 'loader': 'pandas', 'n_jobs': 1},
+    {'name': 'uint8-1core', 'loader': 'uint8', 'n_jobs': 1},
+    {'name': 'uint8-all-cores', 'loader': 'uint8', 'n_jobs': -1},
+    {'name': 'sparse-all-cores', 'loader': 'sparse', 'n_jobs': -1},
+    {'name': 'uint8-cached-split', 'loader': 'cached', 'n_jobs': -1},
+]
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def _run_benchmark_config(config, data_path, chunksize):
+    """Runs in a fresh process so peak RSS belongs to this configuration only"""
+    started = time.perf_counter()
+    if config['loader'] == 'pandas':
+        if data_path and os.path.exists(data_path):
+            df = pd.read_csv(data_path)
+            df.columns = [str(c).strip() for c in df.columns]
+            target = next(c for c in TARGET_COLUMNS if c in df.columns)
+            df = df.drop(columns=[c for c in df.columns if c.startswith('Unnamed:')])
+        else:
+            df, target = create_sample_dataset(), 'disease'
+        X = df.drop(target, axis=1)
+        y = LabelEncoder().fit_transform(df[target])
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
+        )
+    else:
+        split = load_split(
+            data_path,
+            use_sparse=config['loader'] == 'sparse',
+            use_cache=config['loader'] == 'cached',
+            chunksize=chunksize
+        )
+        X_train, X_test = split['X_train'], split['X_test']
+        y_train, y_test = split['y_train'], split['y_test']
+    load_seconds = time.perf_counter() - started
+
+    model = build_model(n_jobs=config['n_jobs'])
+    fit_started = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - fit_started
+    accuracy = accuracy_score(y_test, model.predict(X_test))
+
+    return {
+        'config': config['name'],
+        'load_s': round(load_seconds, 2),
+        'fit_s': round(fit_seconds, 2),
+        'wall_s': round(time.perf_counter() - started, 2),
+        'peak_rss_mb': _peak_rss_mb(),
+        'accuracy': round(float(accuracy), 4),
+    }
+
+
+def run_benchmark(data_path=None, chunksize=20000, configs=None):
+    """Train every configuration in its own process and report time, memory and accuracy"""
+    configs = configs or BENCHMARK_CONFIGS
+    if any(config['loader'] == 'cached' for config in configs):
+        # Populate the split cache up front so the cached configuration measures a warm run
+        load_split(data_path, use_cache=True, chunksize=chunksize)
+
+    results = []
+    context = get_context('spawn')
+    for config in configs:
+        print(f"Benchmarking {config['name']}...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results.append(executor.submit(_run_benchmark_config, config, data_path, chunksize).result())
+
+    print(f"\n{'config':<22}{'load s':>9}{'fit s':>9}{'wall s':>9}{'peak MB':>10}{'accuracy':>10}")
+    for r in results:
+        print(f"{r['config']:<22}{r['load_s']:>9}{r['fit_s']:>9}{r['wall_s']:>9}"
+              f"{str(r['peak_rss_mb']):>10}{r['accuracy']:>10.2%}")
+    return results
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train the disease prediction model')
+    parser.add_argument('--data', default=None, help='Training data CSV (defaults to the sample dataset)')
+    parser.add_argument('--version', default=None, help='Model registry version name (defaults to a UTC timestamp)')
+    parser.add_argument('--sparse', action='store_true', help='Train on a sparse matrix instead of dense uint8')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='Cores used for training (-1 = all)')
+    parser.add_argument('--chunksize', type=int, default=20000, help='Rows parsed per CSV chunk')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the cached train/test split')
+    parser.add_argument('--synthetic', type=int, default=None, metavar='ROWS',
+                        help='Generate a synthetic dataset with this many rows (written to --data or models/cache)')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Compare loading/training configurations instead of training a model')
+    args = parser.parse_args()
+    
+    if args.synthetic:
+        args.data = args.data or os.path.join(CACHE_DIR, f'synthetic-{args.synthetic}.csv')
+        os.makedirs(os.path.dirname(os.path.abspath(args.data)), exist_ok=True)
+        print(f"Writing {args.synthetic} synthetic rows to {args.data}...")
+        create_synthetic_dataset(args.data, n_rows=args.synthetic)
+    
+    if args.benchmark:
+        run_benchmark(args.data, chunksize=args.chunksize)
+        sys.exit(0)
+    
     # Train the model
-    model, encoder, features = train_model()
+    model, encoder, features = train_model(
+        args.data, args.version,
+        use_sparse=args.sparse,
+        n_jobs=args.n_jobs,
+        use_cache=not args.no_cache,
+        chunksize=args.chunksize
+    )
     
     print("\n" + "="*50)
     print("Model is ready for deployment!")